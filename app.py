@@ -1,77 +1,79 @@
 from flask import Flask, render_template, request, send_file
 from flaskwebgui import FlaskUI
-import os
-import json
-import requests
-from io import BytesIO
 from urllib.parse import quote
 from routes import create_routes
+from utils.image_cache import ImageCacheConfig, ImageFetchError
+from utils.warmup import warmup
 
-app = Flask(__name__)
-# 创建 DataManager 实例
-from utils.data_manager import DataManager
-
-data_manager = DataManager()
-
-# 注册蓝图
-create_routes(app, data_manager)
-
-
-@app.route('/')
-@app.route('/introduction')
-def introduction():
-    """加载项目介绍页面"""
-    # 加载联系人列表数据
-    if os.path.exists('data/contacts.json'):
-        with open('data/contacts.json', 'r', encoding='utf-8') as f:
-            contacts = json.load(f)
-    else:
-        contacts = []
-
-    return render_template('introduction.html', contacts=contacts)
-
-
-@app.route('/index')
-def index():
-    """首页"""
-    if os.path.exists('data/contacts.json'):
-        with open('data/contacts.json', 'r', encoding='utf-8') as f:
-            contacts = json.load(f)
-    else:
-        contacts = []
-    return render_template('index.html', contacts=contacts)
-
-
-@app.route('/proxy/image')
-def proxy_image():
-    """图片代理"""
-    url = request.args.get('url')
-    if not url:
-        return '缺少图片URL', 400
-
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Referer': 'https://wx.qq.com/'
-        }
-        response = requests.get(url, headers=headers)
-        return send_file(
-            BytesIO(response.content),
-            mimetype=response.headers.get('content-type', 'image/jpeg')
-        )
-    except Exception as e:
-        print(f"Error proxying image: {str(e)}")
-        return '获取图片失败', 500
-
-
-@app.template_filter('urlencode')
-def urlencode_filter(s):
-    """URL编码过滤器"""
-    if isinstance(s, str):
-        return quote(s)
-    return ''
+
+def create_app() -> Flask:
+    """创建应用
+
+    数据迁移、撤销上次中断的导入等一次性启动步骤在此执行，而不是在导入模块时：
+    以 spawn 方式启动的进程池工作进程会重新导入主模块，不能重复执行这些步骤。
+    """
+    app = Flask(__name__)
+    # 创建 DataManager 实例
+    from utils.data_manager import DataManager
+
+    data_manager = DataManager()
+    data_manager.run_startup_maintenance()
+
+    # 注册蓝图
+    create_routes(app, data_manager)
+
+    @app.before_request
+    def start_warmup():
+        """收到第一个请求（界面已显示）后，在后台预先加载 jieba、SnowNLP 等分析依赖"""
+        warmup.start()
+
+    @app.route('/')
+    @app.route('/introduction')
+    def introduction():
+        """加载项目介绍页面"""
+        # 加载联系人列表数据
+        contacts = data_manager.contacts.list_contacts()
+
+        return render_template('introduction.html', contacts=contacts)
+
+    @app.route('/index')
+    def index():
+        """首页"""
+        contacts = data_manager.contacts.list_contacts()
+        return render_template('index.html', contacts=contacts)
+
+    @app.route('/proxy/image')
+    def proxy_image():
+        """图片代理（经磁盘缓存，图片内容的哈希用作 ETag）"""
+        url = request.args.get('url')
+        if not url:
+            return '缺少图片URL', 400
+
+        try:
+            image, image_file = data_manager.images.open(url)
+        except ValueError as e:
+            return str(e), 400
+        except ImageFetchError as e:
+            print(f"Error proxying image: {str(e)}")
+            return '获取图片失败', 502
+
+        # 发送已打开的文件，响应期间图片被淘汰也不影响本次读取
+        response = send_file(image_file, mimetype=image.content_type, etag=image.content_hash,
+                             max_age=ImageCacheConfig.MAX_AGE, conditional=True)
+        response.cache_control.public = True
+        return response
+
+    @app.template_filter('urlencode')
+    def urlencode_filter(s):
+        """URL编码过滤器"""
+        if isinstance(s, str):
+            return quote(s)
+        return ''
+
+    return app
 
 
 if __name__ == '__main__':
+    app = create_app()
     # app.run(debug=True)  # 浏览器
     FlaskUI(app=app, server="flask").run()  # 桌面app
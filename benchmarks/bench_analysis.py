@@ -0,0 +1,312 @@
+"""导入、分析和接口的分规模性能基准
+
+为每个规模生成确定性的合成导出数据（见 benchmarks.synthetic），在独立的子进程中依次测量
+读取、ChatAnalyzer 各项分析、消息长度统计和主要接口，记录每个阶段的耗时和峰值内存（RSS），
+结果保存为 JSON，可与之前（其他提交）的结果对比，耗时明显增加时以非零状态退出。
+
+用法（在项目根目录执行）：
+    python -m benchmarks.bench_analysis                                  # 1万/10万/100万/500万条消息
+    python -m benchmarks.bench_analysis --messages 10k 100k --output before.json
+    python -m benchmarks.bench_analysis --messages 10k 100k --baseline before.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import psutil  # 可选依赖，用于统计含工作进程在内的内存
+except ImportError:
+    psutil = None
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_SCALES = ['10k', '100k', '1m', '5m']
+
+
+@dataclass
+class BenchConfig:
+    """基准配置"""
+    SEMANTIC_MAX_MESSAGES: int = 100_000  # 语义分析（分词、情感打分）较慢，只在不多于此数量的规模上测量
+    RSS_SAMPLE_INTERVAL: float = 0.01  # 峰值内存的采样间隔（秒）
+    REGRESSION_TOLERANCE: float = 1.25  # 与基准结果对比时允许的耗时倍数
+    MIN_REGRESSION_SECONDS: float = 0.05  # 耗时增加少于此值时视为计时误差
+
+
+def parse_scale(value: str) -> int:
+    """解析消息数量，支持 10k、1m 等写法"""
+    units = {'k': 1_000, 'm': 1_000_000}
+    value = value.strip().lower()
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def current_rss() -> int:
+    """当前内存占用（字节）；安装了 psutil 时包括进程池的工作进程"""
+    if psutil is not None:
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return total
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class StageRecorder:
+    """逐阶段记录耗时和峰值内存"""
+
+    def __init__(self):
+        self.stages: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        before = current_rss()
+        peak = before
+        stop = threading.Event()
+
+        def sample():
+            nonlocal peak
+            while not stop.wait(BenchConfig.RSS_SAMPLE_INTERVAL):
+                peak = max(peak, current_rss())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            stop.set()
+            sampler.join()
+            peak = max(peak, current_rss())
+            self.stages.append({
+                'stage': name,
+                'seconds': round(seconds, 4),
+                'peak_rss_mb': round(peak / 2 ** 20, 1),
+                'rss_delta_mb': round((peak - before) / 2 ** 20, 1)
+            })
+            print(f"  {name:<52} {seconds:9.3f}s  峰值 {peak / 2 ** 20:8.1f}MB", flush=True)
+
+    def skip(self, name: str, reason: str) -> None:
+        self.stages.append({'stage': name, 'skipped': reason})
+
+
+def _wait_for_job(client, job: Dict) -> Dict:
+    while True:
+        job = client.get(f"/api/jobs/{job['id']}").get_json()
+        if job['status'] not in ('queued', 'running'):
+            if job['status'] != 'succeeded':
+                raise RuntimeError(f"导入任务失败: {job['error']}")
+            return job
+        time.sleep(0.05)
+
+
+def run_scale(n_messages: int, workdir: Path, semantic: bool) -> List[Dict]:
+    """在当前进程中测量一个规模的各阶段（由 main 在独立子进程中调用）"""
+    from benchmarks.synthetic import generate_export
+    from utils.analyzer import AnalysisConfig, ChatAnalyzer, aggregate_messages
+    from utils.analyzers.message_length import analyze_message_length
+    from utils.analyzers.tokens import TokenStore
+    from utils.chat_reader import ChatReader
+
+    recorder = StageRecorder()
+    export_dir = workdir / 'export'
+    # 在空的工作目录中运行，数据目录（分词缓存、应用数据）与真实使用时一致且不影响项目目录
+    app_dir = workdir / 'app'
+    app_dir.mkdir()
+    os.chdir(app_dir)
+    semantic_stages = ['ChatAnalyzer.analyze_keywords', 'ChatAnalyzer.analyze_topics',
+                       'ChatAnalyzer._analyze_sentiment', 'ChatAnalyzer._analyze_tag_trends']
+
+    with recorder.stage('synthetic.generate_export'):
+        generate_export(export_dir, n_messages)
+
+    with recorder.stage('ChatReader.read_chat_data'):
+        chat_data = ChatReader(str(export_dir)).read_chat_data().to_dict()
+    with recorder.stage('ChatAnalyzer.__init__'):
+        analyzer = ChatAnalyzer(chat_data)
+    with recorder.stage('ChatAnalyzer.aggregates'):
+        analyzer.aggregates
+    with recorder.stage('ChatAnalyzer.analyze_basic_stats'):
+        analyzer.analyze_basic_stats()
+    with recorder.stage('ChatAnalyzer.analyze_interactive_patterns'):
+        analyzer.analyze_interactive_patterns()
+    with recorder.stage('ChatAnalyzer.analyze_sessions'):
+        analyzer.analyze_sessions(AnalysisConfig.SESSION_IDLE_GAP)
+    with recorder.stage('ChatAnalyzer.analyze_gap_distribution'):
+        for by in (None, 'sender', 'year'):
+            analyzer.analyze_gap_distribution(by=by)
+    with recorder.stage('aggregate_messages'):
+        aggregate_messages(chat_data['messages'])
+    with recorder.stage('analyze_message_length'):
+        analyze_message_length(chat_data['messages'])
+
+    if semantic:
+        token_store = TokenStore()
+        with recorder.stage('ChatAnalyzer.analyze_keywords'):  # 含分词
+            analyzer.analyze_keywords(token_store)
+        with recorder.stage('ChatAnalyzer.analyze_topics'):
+            analyzer.analyze_topics(token_store)
+        with recorder.stage('ChatAnalyzer._analyze_sentiment'):
+            analyzer._analyze_sentiment(analyzer.text_messages)
+        with recorder.stage('ChatAnalyzer._analyze_tag_trends'):
+            analyzer._analyze_tag_trends(analyzer.messages_df, granularity='month')
+    else:
+        for name in semantic_stages:
+            recorder.skip(name, f'消息数超过 {BenchConfig.SEMANTIC_MAX_MESSAGES}')
+
+    del analyzer, chat_data
+    gc.collect()
+
+    # 无图形界面时 flaskwebgui 导入时找不到浏览器，基准不打开窗口
+    os.environ.setdefault('BROWSER', 'true')
+    with recorder.stage('import app'):
+        import app as app_module
+        application = app_module.create_app()
+    client = application.test_client()
+
+    with recorder.stage('POST /api/contacts/new（导入任务）'):
+        response = client.post('/api/contacts/new', data={'name': '合成联系人', 'path': str(export_dir)})
+        contact_id = response.get_json()['id']
+        _wait_for_job(client, response.get_json()['job'])
+
+    stats_url = f'/api/contacts/{contact_id}/basic/stats'
+    requests = [
+        ('GET /', '/', {}),
+        ('GET /index', '/index', {}),
+        ('GET /api/dashboard/stats', '/api/dashboard/stats', {}),
+        ('GET /api/contacts', '/api/contacts?page=1', {}),
+        ('GET /contact/<id>/basic', f'/contact/{contact_id}/basic', {}),
+        ('GET /api/contacts/<id>/basic/stats（首次）', stats_url, {}),
+        ('GET /api/contacts/<id>/basic/stats（已生成）', stats_url, {'Accept-Encoding': 'gzip'}),
+        # 基础分析页面实际发出的请求：首次降采样并保存，之后读取保存的响应体
+        ('GET /api/contacts/<id>/basic/stats?max_points=400（首次）', f'{stats_url}?max_points=400', {}),
+        ('GET /api/contacts/<id>/basic/stats?max_points=400（已生成）', f'{stats_url}?max_points=400',
+         {'Accept-Encoding': 'gzip'}),
+        ('GET /api/contacts/<id>/interactive/stats', f'/api/contacts/{contact_id}/interactive/stats', {}),
+    ]
+    if semantic:
+        requests += [(f'GET /api/contacts/<id>/semantic/generate/{name}',
+                      f'/api/contacts/{contact_id}/semantic/generate/{name}', {})
+                     for name in ('keywords', 'topics', 'sentiment', 'tags')]
+    for name, url, headers in requests:
+        with recorder.stage(name):
+            response = client.get(url, headers=headers)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{url} 返回 {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+    etag = client.get(stats_url).headers.get('ETag')
+    with recorder.stage('GET /api/contacts/<id>/basic/stats（304）'):
+        client.get(stats_url, headers={'If-None-Match': etag})
+
+    return recorder.stages
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def find_regressions(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """对比两次结果中同一规模、同一阶段的耗时"""
+    regressions = []
+    for scale, result in report['scales'].items():
+        previous = {stage['stage']: stage for stage in baseline.get('scales', {}).get(scale, {}).get('stages', [])}
+        for stage in result['stages']:
+            old = previous.get(stage['stage'])
+            if 'seconds' not in stage or not old or 'seconds' not in old:
+                continue
+            if (stage['seconds'] > old['seconds'] * tolerance and
+                    stage['seconds'] - old['seconds'] > BenchConfig.MIN_REGRESSION_SECONDS):
+                regressions.append(f"{scale} 条消息 {stage['stage']}: "
+                                   f"{old['seconds']:.3f}s -> {stage['seconds']:.3f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导入、分析和接口的分规模性能基准')
+    parser.add_argument('--messages', nargs='+', default=DEFAULT_SCALES,
+                        help='消息数量，可指定多个，支持 10k、1m 等写法')
+    parser.add_argument('--semantic-max-messages', type=int, default=BenchConfig.SEMANTIC_MAX_MESSAGES,
+                        help='测量语义分析的最大消息数')
+    parser.add_argument('--output', help='将结果保存为 JSON 文件，未指定时输出到标准输出')
+    parser.add_argument('--baseline', help='之前保存的结果，耗时超出容差时以非零状态退出')
+    parser.add_argument('--tolerance', type=float, default=BenchConfig.REGRESSION_TOLERANCE,
+                        help='允许的耗时倍数')
+    # 以下参数供子进程使用
+    parser.add_argument('--run-scale', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    parser.add_argument('--semantic', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scale is not None:
+        stages = run_scale(args.run_scale, Path(args.workdir), args.semantic)
+        Path(args.result_file).write_text(json.dumps(stages, ensure_ascii=False), encoding='utf-8')
+        # 跳过应用后台线程和进程池的退出清理
+        os._exit(0)
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'rss_includes_workers': psutil is not None,
+        'scales': {}
+    }
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    for n_messages in map(parse_scale, args.messages):
+        print(f"{n_messages} 条消息:", flush=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            result_file = Path(tmp) / 'result.json'
+            command = [sys.executable, '-m', 'benchmarks.bench_analysis', '--run-scale', str(n_messages),
+                       '--workdir', tmp, '--result-file', str(result_file)]
+            if n_messages <= args.semantic_max_messages:
+                command.append('--semantic')
+            subprocess.run(command, cwd=PROJECT_ROOT, env=env, check=True)
+            stages = json.loads(result_file.read_text(encoding='utf-8'))
+        report['scales'][str(n_messages)] = {
+            'messages': n_messages,
+            'peak_rss_mb': max(stage.get('peak_rss_mb', 0) for stage in stages),
+            'stages': stages
+        }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding='utf-8')
+    else:
+        print(output)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"耗时增加: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
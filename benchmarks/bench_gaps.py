@@ -0,0 +1,89 @@
+"""对话间隔分析的回归基准
+
+将向量化实现与原先逐行 iloc 循环的实现在同一份数据上对比，
+结果不一致或加速比低于阈值时以非零状态退出。
+
+用法（在项目根目录执行）：
+    python -m benchmarks.bench_gaps --messages 1000000
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from utils.analyzer import ChatAnalyzer, GAP_BINS, GAP_LABELS
+
+
+def legacy_conversation_gaps(df: pd.DataFrame) -> dict:
+    """原先基于 iloc 循环的实现，仅作为对照"""
+    df = df.sort_values('CreateTime')
+    time_diffs = []
+    for i in range(1, len(df)):
+        time_diffs.append((df.iloc[i]['CreateTime'] - df.iloc[i - 1]['CreateTime']).total_seconds() / 3600)
+
+    distribution = {label: 0 for label in GAP_LABELS}
+    distribution.update(pd.cut(pd.Series(time_diffs), bins=GAP_BINS, labels=GAP_LABELS,
+                               include_lowest=True).value_counts().to_dict())
+    return {
+        'count': len(time_diffs),
+        'avg_gap': round(np.mean(time_diffs), 1),
+        'max_gap': round(max(time_diffs), 1),
+        'distribution': distribution
+    }
+
+
+def make_chat_data(n_messages: int, seed: int = 0) -> dict:
+    """生成只包含间隔分析所需字段的合成聊天数据"""
+    rng = np.random.default_rng(seed)
+    gaps = rng.exponential(1800, n_messages).astype(np.int64)
+    times = np.datetime64('2018-01-01T00:00:00') + np.cumsum(gaps).astype('timedelta64[s]')
+    messages = pd.DataFrame({
+        'CreateTime': times.astype('datetime64[ns]'),
+        'is_sender': rng.integers(0, 2, n_messages),
+        'type_name': '文本',
+        'msg': ''
+    })
+    return {'users': {}, 'messages': messages, 'stats': {}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对话间隔分析回归基准')
+    parser.add_argument('--messages', type=int, default=1_000_000, help='向量化实现的消息数量')
+    parser.add_argument('--legacy-messages', type=int, default=20_000, help='对照实现的消息数量')
+    parser.add_argument('--min-speedup', type=float, default=50.0, help='要求的最小加速比')
+    args = parser.parse_args()
+
+    sample = make_chat_data(args.legacy_messages)
+    analyzer = ChatAnalyzer(sample)
+
+    start = time.perf_counter()
+    expected = legacy_conversation_gaps(analyzer.messages_df)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = analyzer.analyze_gap_distribution()
+    vectorized_seconds = time.perf_counter() - start
+
+    if actual != expected:
+        print(f"结果不一致:\n  对照: {expected}\n  向量化: {actual}")
+        sys.exit(1)
+
+    speedup = legacy_seconds / max(vectorized_seconds, 1e-9)
+    print(f"{args.legacy_messages} 条消息: 对照 {legacy_seconds:.3f}s, "
+          f"向量化 {vectorized_seconds:.4f}s, 加速 {speedup:.0f}x")
+
+    analyzer = ChatAnalyzer(make_chat_data(args.messages))
+    start = time.perf_counter()
+    analyzer.analyze_gap_distribution()
+    analyzer.analyze_gap_distribution(by='sender')
+    analyzer.analyze_gap_distribution(by='year')
+    print(f"{args.messages} 条消息（整体/按发送方/按年份）: {time.perf_counter() - start:.3f}s")
+
+    if speedup < args.min_speedup:
+        print(f"加速比低于阈值 {args.min_speedup}x")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""冷启动耗时基准
+
+在空的临时工作目录中启动子进程，用 -X importtime 记录 `import app` 的各模块导入耗时和创建应用的耗时，
+并测量首个页面的响应时间和后台预热耗时。连续启动两次：第一次生成 jieba 词典缓存，
+第二次读取已持久化的缓存。超出启动预算或启动时导入了应延迟加载的模块时以非零状态退出。
+
+用法（在项目根目录执行）：
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# 在子进程中执行：导入应用、请求首页、等待后台预热完成，结果以 JSON 输出到 stdout
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+application = app.create_app()
+imported = time.perf_counter()
+loaded = [name for name in {lazy_modules!r} if name in sys.modules]
+response = application.test_client().get('/')
+first_page = time.perf_counter()
+from utils.warmup import warmup
+warmup.wait()
+print(json.dumps({{
+    'import_seconds': imported - start,
+    'first_page_seconds': first_page - start,
+    'first_page_status': response.status_code,
+    'loaded_at_import': loaded,
+    'warmup_seconds': warmup.timings,
+    'warmup_errors': warmup.errors
+}}))
+"""
+
+
+@dataclass
+class StartupBudget:
+    """启动预算"""
+    IMPORT_SECONDS: float = 1.0  # import app 并创建应用（含创建 DataManager、注册蓝图）
+    FIRST_PAGE_SECONDS: float = 1.0  # 从开始导入到首页响应
+    LAZY_MODULES: tuple = ('jieba', 'jieba.analyse', 'snownlp', 'requests')  # 不应在启动时导入的模块
+
+
+def parse_importtime(stderr: str, top: int):
+    """解析 -X importtime 输出，返回 import app 期间累计耗时最长的顶层导入 [(模块, 累计毫秒)]"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # 模块名前的缩进表示嵌套层级，只统计 app 及其直接导入的模块
+        depth = len(name) - len(name.lstrip())
+        if depth <= 3:
+            entries.append((name.strip(), int(cumulative) / 1000))
+        # app 的记录在其全部依赖之后输出，之后的导入来自首个请求和后台预热
+        if depth == 1 and name.strip() == 'app':
+            break
+    return sorted(entries, key=lambda entry: entry[1], reverse=True)[:top]
+
+
+def run_probe(workdir: Path) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT))
+    # 无图形界面时 flaskwebgui 导入时找不到浏览器，基准不打开窗口
+    env.setdefault('BROWSER', 'true')
+    probe = PROBE.format(lazy_modules=StartupBudget.LAZY_MODULES)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['stderr'] = result.stderr
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='冷启动耗时基准')
+    parser.add_argument('--top', type=int, default=10, help='列出导入耗时最长的模块数')
+    parser.add_argument('--output', help='将结果保存为 JSON 文件')
+    args = parser.parse_args()
+
+    failures, runs = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ('首次启动（生成词典缓存）', '再次启动（读取词典缓存）'):
+            report = run_probe(Path(tmp))
+            modules = parse_importtime(report.pop('stderr'), args.top)
+            runs.append({'run': label, **report, 'top_imports_ms': modules})
+
+            print(f"{label}:")
+            print(f"  import app: {report['import_seconds']:.3f}s, 首页: {report['first_page_seconds']:.3f}s "
+                  f"(HTTP {report['first_page_status']})")
+            for name, milliseconds in modules:
+                print(f"    {name:<40} {milliseconds:8.1f}ms")
+            print('  后台预热: ' + ', '.join(f"{name} {seconds:.2f}s"
+                                         for name, seconds in report['warmup_seconds'].items()))
+
+            if report['import_seconds'] > StartupBudget.IMPORT_SECONDS:
+                failures.append(f"{label}: import app 超出预算 {StartupBudget.IMPORT_SECONDS}s")
+            if report['first_page_seconds'] > StartupBudget.FIRST_PAGE_SECONDS:
+                failures.append(f"{label}: 首页响应超出预算 {StartupBudget.FIRST_PAGE_SECONDS}s")
+            if report['loaded_at_import']:
+                failures.append(f"{label}: 启动时导入了应延迟加载的模块 {report['loaded_at_import']}")
+            if report['warmup_errors']:
+                failures.append(f"{label}: 预热失败 {report['warmup_errors']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            'budget': {'import_seconds': StartupBudget.IMPORT_SECONDS,
+                       'first_page_seconds': StartupBudget.FIRST_PAGE_SECONDS,
+                       'lazy_modules': list(StartupBudget.LAZY_MODULES)},
+            'runs': runs
+        }, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""合成微信聊天导出数据，用于性能基准测试"""
+from pathlib import Path
+import json
+import numpy as np
+import pandas as pd
+
+# 导出文件的列顺序与 PyWxDump 保持一致
+CSV_COLUMNS = ['id', 'MsgSvrID', 'type_name', 'is_sender', 'talker', 'room_name',
+               'msg', 'src', 'extra', 'CreateTime']
+
+WORDS = ['今天', '吃饭', '工作', '开心', '难过', '电影', '旅游', '哈哈', '好的', '晚安',
+         '加班', '周末', '学习', '考试', '下班', '回家', '早上好', '想你', '一起', '明天',
+         '我们', '的', '了', '吗', '你', '我', '就是', '还是', '感觉', '真的']
+PUNCTUATION = ['', '', '', '，', '。', '！', '？', '~', '[微笑]', '[捂脸]']
+
+# 消息类型及占比，参照常见的私聊导出
+MESSAGE_TYPES = {
+    '文本': 0.715, '引用回复': 0.03, '图片': 0.07, '语音': 0.06, '表情': 0.05, '视频': 0.015,
+    '文件': 0.005, '位置': 0.005, '语音通话': 0.02, '系统通知': 0.03
+}
+# 未接通的语音通话
+CALL_FAILURES = ['已取消', '对方已拒绝', '对方无应答']
+SYSTEM_NOTICES = ['"合成联系人" 拍了拍我', '你撤回了一条消息', '"合成联系人" 撤回了一条消息']
+
+
+def _random_text(rng: np.random.Generator, n: int) -> pd.Series:
+    """由常用词拼成的文本，词数近似服从几何分布（多数消息很短，少数较长），夹杂标点和表情"""
+    words = np.array(WORDS)
+    punctuation = np.array(PUNCTUATION)
+    text = pd.Series(words[rng.integers(0, len(words), n)])
+    for _ in range(8):
+        extra = pd.Series(words[rng.integers(0, len(words), n)])
+        tail = pd.Series(punctuation[rng.integers(0, len(punctuation), n)])
+        text = text.where(rng.random(n) < 0.55, text + tail + extra)
+    return text
+
+
+def _generate_chunk(rng: np.random.Generator, start: int, n: int, start_time: np.datetime64,
+                    talker: str) -> pd.DataFrame:
+    """生成一个CSV文件的消息，时间从 start_time 之后开始"""
+    # 消息间隔服从指数分布，均值10分钟
+    gaps = rng.exponential(600, n).astype(np.int64)
+    times = start_time + np.cumsum(gaps).astype('timedelta64[s]')
+
+    types = rng.choice(list(MESSAGE_TYPES), n, p=list(MESSAGE_TYPES.values()))
+    text = _random_text(rng, n)
+    voice = pd.Series(rng.integers(1, 60, n)).map('语音时长：{}秒'.format)
+    minutes = pd.Series(np.minimum(rng.exponential(8, n).astype(np.int64), 180)).map('{:02d}'.format)
+    seconds = pd.Series(rng.integers(0, 60, n)).map('{:02d}'.format)
+    call = ('通话时长 ' + minutes + ':' + seconds).where(
+        rng.random(n) < 0.75, pd.Series(np.array(CALL_FAILURES)[rng.integers(0, len(CALL_FAILURES), n)]))
+    notice = pd.Series(np.array(SYSTEM_NOTICES)[rng.integers(0, len(SYSTEM_NOTICES), n)])
+    file_name = pd.Series(rng.integers(1, 1000, n)).map('资料{}.pdf'.format)
+
+    msg = np.select(
+        [np.isin(types, ['文本', '引用回复']), types == '语音', types == '语音通话', types == '系统通知',
+         types == '文件', types == '图片', types == '视频', types == '位置'],
+        [text, voice, call, notice, file_name, '[图片]', '[视频]', '[位置]'],
+        default='[动画表情]')
+
+    return pd.DataFrame({
+        'id': np.arange(start, start + n),
+        'MsgSvrID': np.arange(start, start + n, dtype=np.int64) + 10 ** 15,
+        'type_name': types,
+        'is_sender': rng.integers(0, 2, n),
+        'talker': talker,
+        'room_name': '',
+        'msg': msg,
+        'src': '',
+        'extra': '',
+        'CreateTime': pd.to_datetime(times).strftime('%Y-%m-%d %H:%M:%S')
+    }, columns=CSV_COLUMNS)
+
+
+def generate_export(out_dir, n_messages: int, chunk_size: int = 50000, seed: int = 0,
+                    talker: str = 'wxid_synthetic') -> Path:
+    """生成合成导出目录（users.json + 分块的 *_start_end.csv）
+
+    逐个CSV文件生成并写入，内存占用只与 chunk_size 有关；相同参数生成的数据完全相同。
+    Args:
+        out_dir: 输出目录
+        n_messages: 消息总数
+        chunk_size: 每个CSV文件的消息数
+        seed: 随机种子，保证结果可复现
+        talker: 联系人 wxid
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    users = {talker: {
+        'wxid': talker,
+        'nickname': '合成联系人',
+        'remark': '合成联系人',
+        'headImgUrl': '',
+        'ExtraBuf': {}
+    }}
+    (out_dir / 'users.json').write_text(json.dumps(users, ensure_ascii=False), encoding='utf-8')
+
+    last_time = np.datetime64('2018-01-01T00:00:00')
+    for start in range(0, n_messages, chunk_size):
+        end = min(start + chunk_size, n_messages)
+        df = _generate_chunk(rng, start, end - start, last_time, talker)
+        df.to_csv(out_dir / f'{talker}_{start}_{end}.csv', index=False)
+        last_time = np.datetime64(df['CreateTime'].iloc[-1])
+
+    return out_dir
@@ -4,6 +4,8 @@ from typing import Dict, Optional, Tuple
 import json
 from dataclasses import dataclass
 
+from utils.message_index import MessageIndex
+
 
 @dataclass
 class UserInfo:
@@ -39,18 +41,14 @@ class AnalysisService:
 
     def __init__(self, data_manager):
         self.data_manager = data_manager
-        self.contacts_file = Path('data/contacts.json')
 
     def load_contacts(self) -> list:
         """加载联系人列表"""
-        if self.contacts_file.exists():
-            return json.loads(self.contacts_file.read_text(encoding='utf-8'))
-        return []
+        return self.data_manager.contacts.list_contacts()
 
     def get_contact(self, contact_id: int) -> Optional[Dict]:
         """获取指定联系人信息"""
-        contacts = self.load_contacts()
-        return next((c for c in contacts if c['id'] == contact_id), None)
+        return self.data_manager.contacts.get(contact_id)
 
     @staticmethod
     def load_user_info(contact_path: Path) -> Optional[UserInfo]:
@@ -69,12 +67,16 @@ class AnalysisService:
             return None
 
     @staticmethod
-    def calculate_stats(messages: list, stats: Dict) -> Dict:
-        """计算统计指标"""
+    def calculate_stats(message_index: Optional[MessageIndex], stats: Dict) -> Dict:
+        """计算统计指标
+        Args:
+            message_index: 联系人的消息索引
+            stats: 消息类型统计
+        """
         total_messages = sum(stats['type_counts'].values()) if stats else 0
 
         # 计算消息比例
-        sender_messages = sum(1 for msg in messages if msg.get('is_sender', False))
+        sender_messages = message_index.sender_count if message_index else 0
         receiver_messages = total_messages - sender_messages
 
         return {
@@ -126,8 +128,7 @@ def create_blueprint(data_manager):
         # 加载数据
         try:
             user_info = service.load_user_info(Path(contact['path']))
-            raw_data = data_manager.load_raw_data(contact_id)
-            messages = raw_data.get('messages', []) if raw_data else []
+            message_index = data_manager.load_message_index(contact_id)
 
             # 加载分析数据
             stats = data_manager.load_analysis_data(contact_id, 'basic', 'message_stats')
@@ -135,7 +136,7 @@ def create_blueprint(data_manager):
             daily_stats = data_manager.load_analysis_data(contact_id, 'basic', 'daily_stats')
 
             # 计算统计指标
-            basic_stats = service.calculate_stats(messages, stats)
+            basic_stats = service.calculate_stats(message_index, stats)
             most_active_hour, most_active_day, avg_daily_messages = service.get_activity_stats(time_stats)
 
             # 准备模板数据
@@ -1,5 +1,8 @@
-from flask import Blueprint, jsonify
-from utils.analyzers.message_length import analyze_message_length
+from flask import Blueprint, jsonify, request
+from routes.responses import cached_json_response
+from utils.analyzers.series import SeriesQuery
+
+BASIC_DATA_TYPES = ['message_stats', 'time_stats', 'daily_stats', 'message_length']
 
 
 def create_blueprint(data_manager):
@@ -7,20 +10,23 @@ def create_blueprint(data_manager):
 
     @bp.route('/api/contacts/<int:contact_id>/basic/stats')
     def get_basic_stats(contact_id):
+        """获取基础统计数据，每日统计可按 start/end/granularity/max_points 截取和降采样"""
         try:
-            raw_data = data_manager.load_raw_data(contact_id)
-            if not raw_data:
-                return jsonify({'error': '数据不存在'}), 404
+            query = SeriesQuery.from_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-            messages = raw_data.get('messages', [])
-            message_length_stats = analyze_message_length(messages)
+        def build():
+            data = {data_type: data_manager.load_analysis_data(contact_id, 'basic', data_type)
+                    for data_type in BASIC_DATA_TYPES}
+            return data if data['message_length'] is not None else None
 
-            return jsonify({
-                'message_stats': data_manager.load_analysis_data(contact_id, 'basic', 'message_stats'),
-                'time_stats': data_manager.load_analysis_data(contact_id, 'basic', 'time_stats'),
-                'daily_stats': data_manager.load_analysis_data(contact_id, 'basic', 'daily_stats'),
-                'message_length': message_length_stats
-            })
+        try:
+            # 消息长度统计在导入时计算，升级前导入的联系人在此补算一次
+            data_manager.backfill_message_length(contact_id)
+            return cached_json_response(data_manager.get_response_dir(contact_id), 'basic_stats',
+                                        data_manager.analysis_sources(contact_id, 'basic', BASIC_DATA_TYPES),
+                                        build, query)
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -1,19 +1,28 @@
 import shutil
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 import json
 from flask import Blueprint, jsonify, request, render_template, current_app
 from dataclasses import dataclass
 from datetime import datetime
 
-from utils.chat_reader import read_chat_data
+import numpy as np
+import pandas as pd
+
+from utils.chat_reader import ChatReader, IngestConfig, UnorderedExportError, has_message_ids, message_keys
+from utils.message_table import MessageTable
 from utils.analyzer import (
-    analyze_basic_stats,
-    analyze_interactive_patterns,
-    analyze_semantic_content,
+    aggregate_messages,
+    AnalysisConfig,
     ChatAnalyzer
 )
-import pandas as pd
+from utils.analyzers.aggregates import ChatAggregates
+from utils.analyzers.message_length import MessageLengthStats
+from utils.analyzers.sentiment import SentimentEngine, SentimentProgress
+from utils.analyzers.series import SeriesConfig, SeriesQuery
+from utils.analyzers.tokens import TokenStore
+from utils.job_queue import JobConfig, JobContext, JobQueue, NullJobContext
+from routes.responses import cached_json_response
 
 
 @dataclass
@@ -22,89 +31,275 @@ class ContactInfo:
     id: int
     name: str
     path: str
+    total_messages: int = 0
+    first_time: Optional[str] = None
+    last_time: Optional[str] = None
+    last_analyzed: Optional[str] = None
+    avatar_url: str = ''
 
     @classmethod
     def from_dict(cls, data: Dict) -> 'ContactInfo':
         return cls(
             id=data['id'],
             name=data['name'],
-            path=data['path']
+            path=data['path'],
+            total_messages=data.get('total_messages', 0),
+            first_time=data.get('first_time'),
+            last_time=data.get('last_time'),
+            last_analyzed=data.get('last_analyzed'),
+            avatar_url=data.get('avatar_url') or ''
         )
 
     def to_dict(self) -> Dict:
         return {
             'id': self.id,
             'name': self.name,
-            'path': self.path
+            'path': self.path,
+            'total_messages': self.total_messages,
+            'first_time': self.first_time,
+            'last_time': self.last_time,
+            'last_analyzed': self.last_analyzed,
+            'avatar_url': self.avatar_url
         }
 
 
 class ContactService:
     """联系人服务类"""
 
-    def __init__(self, data_manager):
+    def __init__(self, data_manager, jobs: Optional[JobQueue] = None):
+        """
+        Args:
+            data_manager: 数据管理器
+            jobs: 后台任务队列，None 表示新建、更新联系人时直接执行
+        """
         self.data_manager = data_manager
+        self.jobs = jobs
+
+    def recover_interrupted_imports(self) -> None:
+        """将上次运行时未完成的任务标记为失败，并删除首次导入未完成的联系人（数据不完整）
+
+        只应在服务启动时调用一次：此时没有正在执行的导入任务。
+        """
+        if self.jobs is not None:
+            self.jobs.fail_interrupted()
+        for contact in self.data_manager.contacts.list_contacts(include_pending=True):
+            if contact['status'] == 'importing':
+                self.delete_contact(contact['id'])
+
+    def _submit(self, kind: str, contact_id: int, fn: Callable[[JobContext], Dict],
+                on_cancel: Optional[Callable[[], None]] = None) -> Dict:
+        """提交后台任务；未配置任务队列时直接执行并返回已完成的任务信息"""
+        if self.jobs is None:
+            return {'kind': kind, 'contact_id': contact_id, 'status': 'succeeded', 'result': fn(NullJobContext())}
+        return self.jobs.submit(kind, contact_id, fn, on_cancel)
 
     def load_contacts(self) -> List[ContactInfo]:
         """加载联系人列表"""
-        contacts_file = self.data_manager.paths.CONTACTS_FILE
-        if contacts_file.exists():
-            data = json.loads(contacts_file.read_text(encoding='utf-8'))
-            return [ContactInfo.from_dict(c) for c in data]
-        return []
-
-    def save_contacts(self, contacts: List[ContactInfo]) -> None:
-        """保存联系人列表"""
-        data = [c.to_dict() for c in contacts]
-        self.data_manager.paths.CONTACTS_FILE.write_text(
-            json.dumps(data, ensure_ascii=False, indent=2)
-        )
+        return [ContactInfo.from_dict(c) for c in self.data_manager.contacts.list_contacts()]
+
+    def list_page(self, page: int, per_page: int) -> Tuple[List[ContactInfo], int]:
+        """分页加载联系人列表，返回 (本页联系人, 联系人总数)"""
+        contacts, total = self.data_manager.contacts.page((page - 1) * per_page, per_page)
+        return [ContactInfo.from_dict(c) for c in contacts], total
+
+    def recent_contacts(self, limit: int) -> List[ContactInfo]:
+        """最近创建的联系人"""
+        return [ContactInfo.from_dict(c) for c in self.data_manager.contacts.recent(limit)]
+
+    def get_contact(self, contact_id: int) -> Optional[ContactInfo]:
+        """获取指定联系人，不存在时返回 None"""
+        contact = self.data_manager.contacts.get(contact_id)
+        return ContactInfo.from_dict(contact) if contact else None
 
     def analyze_and_save_data(self, contact_id: int, chat_data: Dict) -> None:
-        """分析并保存数据"""
-        # 基础分析
-        basic_stats = analyze_basic_stats(chat_data)
-        for data_type, data in basic_stats.items():
-            self.data_manager.save_analysis_data(contact_id, 'basic', data_type, data)
-
-        # 交互分析
-        interactive_stats = analyze_interactive_patterns(chat_data)
-        for data_type, data in interactive_stats.items():
-            self.data_manager.save_analysis_data(contact_id, 'interactive', data_type, data)
-
-    def create_contact(self, name: str, path: str) -> Optional[ContactInfo]:
-        """创建新联系人"""
+        """分析并保存数据（基础分析、交互分析的中间结果按时间分片并行计算，另计算消息长度统计）"""
+        messages = MessageTable.of(chat_data['messages'])
+        self.data_manager.save_aggregates(contact_id, aggregate_messages(messages))
+        self.data_manager.save_message_length(contact_id, MessageLengthStats.from_frame(messages.frame))
+
+    def import_chat_data(self, contact_id: int, path: str, job: Optional[JobContext] = None) -> Dict:
+        """导入聊天记录
+
+        首次导入读取全部CSV文件；之后只解析清单中没有的新文件，按消息键去重后
+        并入已保存的消息。新消息全部晚于已有消息时，将其分析结果与已保存的
+        中间结果合并，否则（补录了更早的消息、已导入的文件内容有变化等）重新分析全部消息。
+        CSV 总大小较大时，首次导入按块流式进行，见 _stream_import。
+        Args:
+            contact_id: 联系人ID
+            path: 聊天记录目录
+            job: 后台任务上下文，用于登记阶段进度；开始写入数据前可被取消
+        Returns:
+            导入概要 {'mode': 'full' | 'incremental' | 'unchanged', 'new_files': int, 'new_messages': int}
+        """
+        job = job or NullJobContext()
+        job.stage('read')
+        reader = ChatReader(path)
+        chat_files = reader.find_chat_files()
+        manifest = {entry['name']: entry for entry in self.data_manager.load_ingest_manifest(contact_id)}
+        known_hashes = {entry['hash'] for entry in manifest.values()}
+        aggregates = self.data_manager.load_aggregates(contact_id)
+
+        # 对比文件清单：大小和修改时间都未变的文件视为已导入，否则比较内容哈希
+        fingerprints, new_files, modified = [], [], False
+        for file in chat_files:
+            entry = manifest.get(file.name)
+            stat = file.stat()
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                fingerprints.append(entry)
+                continue
+            fingerprint = reader.fingerprint(file)
+            fingerprints.append(fingerprint)
+            if entry and entry['hash'] != fingerprint['hash']:
+                modified = True
+            elif fingerprint['hash'] not in known_hashes:
+                new_files.append(file)
+
+        stored = (self.data_manager.load_messages(contact_id)
+                  if manifest and aggregates is not None and not modified else None)
+        if stored is None:
+            total_messages = self._full_import(contact_id, reader, chat_files, job)
+            self.data_manager.save_ingest_manifest(contact_id, fingerprints)
+            self.data_manager.update_contact_summary(contact_id)
+            return {'mode': 'full', 'new_files': len(chat_files), 'new_messages': total_messages}
+
+        new_messages = (reader.read_messages(new_files).frame if new_files else stored.frame.iloc[:0])
+        by_id = has_message_ids(stored.frame) and has_message_ids(new_messages)
+        new_messages = MessageTable.from_frame(
+            new_messages[~np.isin(message_keys(new_messages, by_id), message_keys(stored.frame, by_id))])
+
+        if len(new_messages):
+            job.commit()
+            job.stage('save')
+            messages = MessageTable.concat([stored, new_messages])
+            if not messages.frame['CreateTime'].is_monotonic_increasing:
+                messages = MessageTable.from_frame(messages.frame.sort_values('CreateTime', kind='stable'))
+            chat_data = {
+                'users': reader.read_users(),
+                'messages': messages,
+                'stats': ChatReader._calculate_stats(messages.frame)
+            }
+            self.data_manager.save_raw_data(contact_id, chat_data)
+
+            job.stage('analyze')
+            appended = (new_messages.frame['CreateTime'].min().value >= aggregates.last_time and
+                        aggregates.session_idle_gap == AnalysisConfig.SESSION_IDLE_GAP)
+            length_stats = self.data_manager.load_message_length(contact_id)
+            if appended and length_stats is not None:
+                self.data_manager.save_aggregates(contact_id, aggregates.merge(aggregate_messages(new_messages)))
+                self.data_manager.save_message_length(
+                    contact_id, length_stats.merge(MessageLengthStats.from_frame(new_messages.frame)))
+            else:
+                self.analyze_and_save_data(contact_id, chat_data)
+
+        self.data_manager.save_ingest_manifest(contact_id, fingerprints)
+        self.data_manager.update_contact_summary(contact_id)
+        return {
+            'mode': 'incremental' if len(new_messages) else 'unchanged',
+            'new_files': len(new_files),
+            'new_messages': len(new_messages)
+        }
+
+    def _full_import(self, contact_id: int, reader: ChatReader, chat_files: List[Path],
+                     job: JobContext) -> int:
+        """读取全部CSV文件、保存并重新分析，返回消息总数"""
+        if sum(file.stat().st_size for file in chat_files) >= IngestConfig.STREAMING_MIN_BYTES:
+            try:
+                return self._stream_import(contact_id, reader, chat_files, job)
+            except UnorderedExportError as e:
+                print(f"警告：{str(e)}，改为一次性导入")
+
+        chat = reader.read_chat_data()
+        chat_data = chat.to_dict()
+        job.commit()
+        job.stage('save')
+        self.data_manager.save_raw_data(contact_id, chat_data)
+        job.stage('analyze')
+        self.analyze_and_save_data(contact_id, chat_data)
+        return chat.stats['total_messages']
+
+    def _stream_import(self, contact_id: int, reader: ChatReader, chat_files: List[Path],
+                       job: JobContext) -> int:
+        """流式导入：按 IngestConfig.CHUNK_SIZE 分块读取，每块直接写入消息存储，
+        并与之前各块的中间结果合并，内存占用只与块大小有关。返回消息总数
+        （读取、保存和分析逐块交替进行，统一登记为保存阶段）
+        """
+        users = reader.read_users()
+        job.commit()
+        job.stage('save')
+        aggregates = ChatAggregates(session_idle_gap=AnalysisConfig.SESSION_IDLE_GAP)
+        length_stats = MessageLengthStats()
+        with self.data_manager.open_message_writer(contact_id) as writer:
+            for chunk in reader.iter_messages(chat_files, IngestConfig.CHUNK_SIZE):
+                chunk = writer.append(chunk)
+                aggregates = aggregates.merge(aggregate_messages(chunk))
+                length_stats = length_stats.merge(MessageLengthStats.from_frame(chunk.frame))
+            if aggregates.message_count == 0:
+                raise Exception("没有成功读取任何聊天记录文件")
+
+        job.stage('analyze')
+        self.data_manager.save_raw_meta(contact_id, users, {
+            'total_messages': aggregates.message_count,
+            'start_time': pd.Timestamp(aggregates.first_time).strftime('%Y-%m-%d %H:%M:%S'),
+            'end_time': pd.Timestamp(aggregates.last_time).strftime('%Y-%m-%d %H:%M:%S'),
+            'message_types': aggregates.type_counts.to_dict(by_count=True)
+        })
+        self.data_manager.save_aggregates(contact_id, aggregates)
+        self.data_manager.save_message_length(contact_id, length_stats)
+        return aggregates.message_count
+
+    def presegment_text(self, contact_id: int) -> int:
+        """预先对文本消息分词并写入分词缓存，返回新分词的消息数"""
+        messages = self.data_manager.load_messages(contact_id, columns=['type_name', 'msg']).frame
+        token_store = TokenStore(cache_path=self.data_manager.get_cache_path(contact_id, 'tokens.parquet'))
+        return token_store.warm(messages.loc[messages['type_name'] == '文本', 'msg'])
+
+    def _run_import(self, contact_id: int, path: str, job: JobContext) -> Dict:
+        """导入任务：读取、保存、分析聊天记录，在后台预取头像等图片，有新消息时预先分词"""
+        summary = self.import_chat_data(contact_id, path, job)
+        self.data_manager.images.prefetch(self.data_manager.contact_image_urls(contact_id))
+        if JobConfig.PRESEGMENT_TEXT and summary['mode'] != 'unchanged':
+            job.stage('semantic')
+            self.presegment_text(contact_id)
+        return summary
+
+    def create_contact(self, name: str, path: str) -> Tuple[ContactInfo, Dict]:
+        """创建新联系人，聊天记录在后台任务中导入
+        Returns:
+            (联系人, 导入任务)
+        """
         if not name or not path:
             raise ValueError('缺少必要参数')
 
         if not Path(path).exists():
             raise ValueError('聊天记录路径不存在')
 
-        contacts = self.load_contacts()
-        contact_id = len(contacts) + 1
-
-        new_contact = ContactInfo(id=contact_id, name=name, path=path)
+        # 由注册表分配ID，导入完成前联系人不出现在列表中
+        contact_id = self.data_manager.contacts.create(name, path)
 
         # 初始化数据目录
         self.data_manager.init_contact_directory(contact_id)
 
-        # 读取并保存聊天记录
-        chat_data = read_chat_data(path)
-        self.data_manager.save_raw_data(contact_id, chat_data)
-
-        # 分析数据
-        self.analyze_and_save_data(contact_id, chat_data)
+        def run(job: JobContext) -> Dict:
+            # 读取、保存并分析聊天记录，失败或取消时撤销新建的联系人
+            try:
+                summary = self._run_import(contact_id, path, job)
+            except Exception:
+                self.delete_contact(contact_id)
+                raise
+            self.data_manager.contacts.mark_ready(contact_id)
+            return summary
 
-        contacts.append(new_contact)
-        self.save_contacts(contacts)
+        job = self._submit('create', contact_id, run, on_cancel=lambda: self.delete_contact(contact_id))
+        return self.get_contact(contact_id), job
 
-        return new_contact
+    def update_contact_data(self, contact: ContactInfo) -> Dict:
+        """在后台任务中导入联系人新增的聊天记录并更新分析结果，返回任务信息"""
+        return self._submit('update', contact.id, lambda job: self._run_import(contact.id, contact.path, job))
 
     def delete_contact(self, contact_id: int) -> None:
         """删除联系人"""
-        contacts = self.load_contacts()
-        contacts = [c for c in contacts if c.id != contact_id]
-        self.save_contacts(contacts)
+        self.data_manager.contacts.delete(contact_id)
+        SentimentProgress.remove(contact_id)
 
         # 删除数据目录
         contact_dir = self.data_manager._get_contact_dir(contact_id)
@@ -113,26 +308,20 @@ class ContactService:
 
     def update_contact(self, contact_id: int, name: str) -> Optional[ContactInfo]:
         """更新联系人信息"""
-        contacts = self.load_contacts()
-        contact = next((c for c in contacts if c.id == contact_id), None)
-
-        if not contact:
+        if not self.data_manager.contacts.rename(contact_id, name):
             return None
-
-        contact.name = name
-        self.save_contacts(contacts)
-        return contact
+        return self.get_contact(contact_id)
 
 
 def create_blueprint(data_manager):
     bp = Blueprint('contacts', __name__)
-    service = ContactService(data_manager)
+    service = ContactService(data_manager, jobs=JobQueue(data_manager.paths.JOBS_DB))
+    service.recover_interrupted_imports()
 
     @bp.route('/contact/<int:contact_id>/<analysis_type>')
     def show_analysis(contact_id, analysis_type):
         """显示分析页面"""
-        contacts = service.load_contacts()
-        contact = next((c for c in contacts if c.id == contact_id), None)
+        contact = service.get_contact(contact_id)
 
         if not contact:
             return '联系人不存在', 404
@@ -153,14 +342,13 @@ def create_blueprint(data_manager):
                 if user_info.get('headImgUrl', '').startswith('http://'):
                     user_info['headImgUrl'] = user_info['headImgUrl'].replace('http://', 'https://')
 
-            # 读取原始消息数据
-            raw_data = data_manager.load_raw_data(contact_id)
-            messages = raw_data.get('messages', []) if raw_data else []
+            # 读取消息索引
+            message_index = data_manager.load_message_index(contact_id)
 
         except Exception as e:
             print(f"Error loading data: {str(e)}")
             user_info = {}
-            messages = []
+            message_index = None
 
         # 加载分析数据
         stats = data_manager.load_analysis_data(contact_id, 'basic', 'message_stats')
@@ -189,7 +377,7 @@ def create_blueprint(data_manager):
         most_active_day = weekday_map.get(most_active_day, most_active_day)
 
         # 计算双方消息占比
-        sender_messages = sum(1 for msg in messages if msg.get('is_sender', False))
+        sender_messages = message_index.sender_count if message_index else 0
         receiver_messages = total_messages - sender_messages
         message_ratio = {
             'sender': {
@@ -204,7 +392,7 @@ def create_blueprint(data_manager):
 
         template_data = {
             'contact': contact.to_dict(),
-            'contacts': [c.to_dict() for c in contacts],
+            'contacts': [c.to_dict() for c in service.load_contacts()],
             'total_messages': total_messages,
             'message_ratio': message_ratio,
             'most_active_hour': most_active_hour,
@@ -214,7 +402,8 @@ def create_blueprint(data_manager):
         }
 
         if analysis_type == 'basic':
-            return render_template('analysis/basic.html', **template_data)
+            return render_template('analysis/basic.html', daily_max_points=SeriesConfig.DEFAULT_MAX_POINTS,
+                                   **template_data)
         elif analysis_type == 'interactive':
             return render_template('analysis/interactive.html', **template_data)
         elif analysis_type == 'semantic':
@@ -222,37 +411,28 @@ def create_blueprint(data_manager):
         else:
             return '分析类型不存在', 404
 
-    @bp.route('/api/contacts/<int:contact_id>/basic/stats')
-    def get_basic_stats(contact_id):
-        """获取基础统计数据"""
+    def stats_response(contact_id: int, analysis_type: str, data_types: List[str]):
+        """分析数据接口的响应：预先生成、压缩并以 ETag 缓存，见 cached_json_response。
+        每日统计和热力图可按 start/end/granularity/max_points 截取和降采样，见 SeriesQuery
+        """
         try:
-            stats = data_manager.load_analysis_data(contact_id, 'basic', 'message_stats')
-            time_stats = data_manager.load_analysis_data(contact_id, 'basic', 'time_stats')
-            daily_stats = data_manager.load_analysis_data(contact_id, 'basic', 'daily_stats')
+            query = SeriesQuery.from_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-            return jsonify({
-                'message_stats': stats,
-                'time_stats': time_stats,
-                'daily_stats': daily_stats
-            })
-        except Exception as e:
-            return jsonify({'error': str(e)}), 500
+        def build():
+            return {data_type: data_manager.load_analysis_data(contact_id, analysis_type, data_type)
+                    for data_type in data_types}
+
+        return cached_json_response(data_manager.get_response_dir(contact_id), f'{analysis_type}_stats',
+                                    data_manager.analysis_sources(contact_id, analysis_type, data_types), build,
+                                    query)
 
     @bp.route('/api/contacts/<int:contact_id>/interactive/stats')
     def get_interactive_stats(contact_id):
         """获取交互统计数据"""
         try:
-            chat_pattern = data_manager.load_analysis_data(contact_id, 'interactive', 'chat_pattern')
-            response_time = data_manager.load_analysis_data(contact_id, 'interactive', 'response_time')
-            heatmap = data_manager.load_analysis_data(contact_id, 'interactive', 'heatmap')
-            interaction = data_manager.load_analysis_data(contact_id, 'interactive', 'interaction')
-
-            return jsonify({
-                'chat_pattern': chat_pattern,
-                'response_time': response_time,
-                'heatmap': heatmap,
-                'interaction': interaction
-            })
+            return stats_response(contact_id, 'interactive', ['chat_pattern', 'response_time', 'heatmap', 'interaction'])
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -260,17 +440,7 @@ def create_blueprint(data_manager):
     def get_semantic_stats(contact_id):
         """获取语义统计数据"""
         try:
-            keywords = data_manager.load_analysis_data(contact_id, 'semantic', 'keywords')
-            topics = data_manager.load_analysis_data(contact_id, 'semantic', 'topics')
-            sentiment = data_manager.load_analysis_data(contact_id, 'semantic', 'sentiment')
-            tags = data_manager.load_analysis_data(contact_id, 'semantic', 'tags')
-
-            return jsonify({
-                'keywords': keywords,
-                'topics': topics,
-                'sentiment': sentiment,
-                'tags': tags
-            })
+            return stats_response(contact_id, 'semantic', ['keywords', 'topics', 'sentiment', 'tags'])
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -278,11 +448,11 @@ def create_blueprint(data_manager):
     def new_contact():
         """创建新联系人"""
         try:
-            contact = service.create_contact(
+            contact, job = service.create_contact(
                 name=request.form.get('name'),
                 path=request.form.get('path')
             )
-            return jsonify(contact.to_dict())
+            return jsonify({**contact.to_dict(), 'job': job}), 202
         except ValueError as e:
             return jsonify({'error': str(e)}), 400
         except Exception as e:
@@ -292,6 +462,8 @@ def create_blueprint(data_manager):
     def delete_contact(contact_id):
         """删除联系人"""
         try:
+            if service.jobs.active_job(contact_id):
+                return jsonify({'error': '联系人有正在执行的导入任务，请等待完成或取消后再删除'}), 409
             service.delete_contact(contact_id)
             return jsonify({'success': True})
         except Exception as e:
@@ -319,35 +491,42 @@ def create_blueprint(data_manager):
         """生成语义分析数据"""
         try:
             # 加载原始聊天数据
-            chat_data = data_manager.load_raw_data(contact_id)
-            if not chat_data:
+            meta = data_manager.load_raw_meta(contact_id)
+            messages = data_manager.load_messages(
+                contact_id, columns=['CreateTime', 'is_sender', 'type_name', 'msg'])
+            if meta is None or messages is None:
                 return jsonify({'error': '找不到聊天记录数据'}), 404
 
             # 创建分析器实例
+            chat_data = {'users': meta['users'], 'messages': messages, 'stats': meta['stats']}
             analyzer = ChatAnalyzer(chat_data)
 
-            # 根据分析类型生成对应的数据
+            token_store = TokenStore(cache_path=data_manager.get_cache_path(contact_id, 'tokens.parquet'))
+
+            # 根据分析类型只生成对应的数据
             if analysis_type == 'keywords':
-                result = analyzer.analyze_semantic_content()['keywords']
+                result = analyzer.analyze_keywords(token_store)
                 data_manager.save_analysis_data(contact_id, 'semantic', 'keywords', result)
                 return jsonify(result)
 
             elif analysis_type == 'topics':
-                result = analyzer.analyze_semantic_content()['topics']
+                result = analyzer.analyze_topics(token_store)
                 data_manager.save_analysis_data(contact_id, 'semantic', 'topics', result)
                 return jsonify(result)
 
             elif analysis_type == 'sentiment':
-                result = analyzer.analyze_semantic_content()['sentiment']
+                engine = SentimentEngine(
+                    cache_path=data_manager.get_cache_path(contact_id, 'sentiment_scores.npz'),
+                    progress_key=contact_id
+                )
+                result = analyzer._analyze_sentiment(analyzer.text_messages, engine=engine)
                 data_manager.save_analysis_data(contact_id, 'semantic', 'sentiment', result)
                 return jsonify(result)
 
             elif analysis_type == 'tags':
                 granularity = request.args.get('granularity', 'month')
-                result = analyzer._analyze_tag_trends(
-                    pd.DataFrame(chat_data['messages']),
-                    granularity=granularity
-                )
+                mode = request.args.get('mode', 'presence')
+                result = analyzer._analyze_tag_trends(messages.frame, granularity=granularity, mode=mode)
                 data_manager.save_analysis_data(contact_id, 'semantic', 'tags', result)
                 return jsonify(result)
 
@@ -357,120 +536,128 @@ def create_blueprint(data_manager):
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    @bp.route('/api/contacts/<int:contact_id>/semantic/progress/sentiment')
+    def get_sentiment_progress(contact_id):
+        """获取情感分析进度"""
+        return jsonify(SentimentProgress.get(contact_id))
+
     @bp.route('/index')
     def index():
         """数据总览页面"""
         contacts = service.load_contacts()
-        recent_contacts = []
-        total_messages = 0
-        earliest_time = None
-        latest_time = None
-
-        for contact in contacts[-6:]:  # 最近6个联系人
-            try:
-                contact_data = _get_contact_overview(contact, data_manager)
-                if contact_data:
-                    recent_contacts.append(contact_data)
-                    total_messages += contact_data['total_messages']
-
-                    if earliest_time is None or contact_data['earliest_time'] < earliest_time:
-                        earliest_time = contact_data['earliest_time']
-                    if latest_time is None or contact_data['latest_time'] > latest_time:
-                        latest_time = contact_data['latest_time']
-
-            except Exception as e:
-                print(f"Error processing contact {contact.name}: {str(e)}")
-                continue
+        # 最近6个联系人的概览和全部联系人的汇总均取自注册表，不读取聊天数据
+        recent_contacts = [overview for overview in map(_get_contact_overview, service.recent_contacts(6))
+                           if overview]
 
-        date_range = _format_date_range(earliest_time, latest_time)
+        totals = data_manager.contacts.totals()
+        date_range = _format_date_range(_parse_time(totals['first_time']), _parse_time(totals['last_time']))
 
         return render_template('index.html',
                                contacts=[c.to_dict() for c in contacts],
+                               contact_count=totals['contact_count'],
                                recent_contacts=recent_contacts,
-                               total_messages=total_messages,
+                               total_messages=totals['total_messages'],
                                date_range=date_range)
 
+    @bp.route('/api/contacts')
+    def list_contacts():
+        """分页获取联系人列表及其汇总信息"""
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 500)
+        contacts, total = service.list_page(page, per_page)
+        return jsonify({
+            'contacts': [c.to_dict() for c in contacts],
+            'total': total,
+            'page': page,
+            'per_page': per_page
+        })
+
     @bp.route('/api/dashboard/stats')
     def get_dashboard_stats():
-        """获取数据总览统计数据"""
-        try:
-            contacts = service.load_contacts()
-            message_types = {}
-            active_times = {str(i): 0 for i in range(24)}
-
-            for contact in contacts:
-                # 获取消息类型统计
-                stats = data_manager.load_analysis_data(contact.id, 'basic', 'message_stats')
-                if stats and 'type_counts' in stats:
-                    for msg_type, count in stats['type_counts'].items():
-                        message_types[msg_type] = message_types.get(msg_type, 0) + count
-
-                # 获取活跃时段统计
-                time_stats = data_manager.load_analysis_data(contact.id, 'basic', 'time_stats')
-                if time_stats and 'hourly_counts' in time_stats:
-                    for hour, count in time_stats['hourly_counts'].items():
-                        active_times[str(hour)] = active_times.get(str(hour), 0) + count
+        """获取数据总览统计数据
 
+        读取注册表中预先汇总的计数（导入、更新、删除联系人时增量维护），
+        传入 contact_id 时返回单个联系人的计数。
+        """
+        try:
+            rollups = data_manager.contacts.rollups(request.args.get('contact_id', type=int))
+            message_types = sorted(rollups['type'].items(), key=lambda item: item[1], reverse=True)
             return jsonify({
-                'message_types': message_types,
-                'active_times': active_times
+                'message_types': dict(message_types),
+                'active_times': {str(hour): rollups['hour'].get(str(hour), 0) for hour in range(24)},
+                'daily_counts': rollups['day']
             })
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    @bp.route('/api/jobs')
+    def list_jobs():
+        """列出最近的后台任务，可按联系人和是否未完成筛选"""
+        contact_id = request.args.get('contact_id', type=int)
+        active_only = request.args.get('active') in ('1', 'true')
+        return jsonify(service.jobs.list(contact_id, active_only=active_only))
+
+    @bp.route('/api/jobs/<int:job_id>')
+    def get_job(job_id):
+        """获取后台任务的状态和阶段进度"""
+        job = service.jobs.get(job_id)
+        if not job:
+            return jsonify({'error': '任务不存在'}), 404
+        return jsonify(job)
+
+    @bp.route('/api/jobs/<int:job_id>/cancel', methods=['POST'])
+    def cancel_job(job_id):
+        """取消后台任务（开始写入数据后不再响应取消）"""
+        job = service.jobs.cancel(job_id)
+        if not job:
+            return jsonify({'error': '任务不存在'}), 404
+        return jsonify({'success': job['cancel_requested'], 'job': job})
+
+    @bp.route('/api/cache/stats')
+    def get_cache_stats():
+        """获取数据缓存的命中、未命中、淘汰次数和占用"""
+        return jsonify(data_manager.cache.stats())
+
     @bp.route('/api/contacts/<int:contact_id>/update', methods=['POST'])
     def update_contact_data(contact_id):
         """更新联系人数据"""
         try:
             # 获取联系人信息
-            contacts = service.load_contacts()
-            contact = next((c for c in contacts if c.id == contact_id), None)
+            contact = service.get_contact(contact_id)
             if not contact:
                 return jsonify({'error': '联系人不存在'}), 404
 
-            # 重新读取并分析数据
-            chat_data = read_chat_data(contact.path)
-            service.analyze_and_save_data(contact_id, chat_data)
+            # 在后台任务中只导入新增的聊天记录文件并更新分析结果
+            job = service.update_contact_data(contact)
 
-            return jsonify({'success': True})
+            return jsonify({'success': True, 'job': job}), 202
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
     return bp
 
 
-def _get_contact_overview(contact: ContactInfo, data_manager) -> Optional[Dict]:
-    """获取联系人概览数据"""
-    users_file = Path(contact.path) / 'users.json'
-    if not users_file.exists():
+def _get_contact_overview(contact: ContactInfo) -> Optional[Dict]:
+    """获取联系人概览数据（取自分析时写入注册表的汇总信息）"""
+    if not contact.total_messages:
         return None
 
-    users_data = json.loads(users_file.read_text(encoding='utf-8'))
-    user_info = next(iter(users_data.values()))
-
-    # 处理头像URL
-    avatar_url = user_info.get('headImgUrl', '')
-    if avatar_url.startswith('http://'):
-        avatar_url = avatar_url.replace('http://', 'https://')
-
-    raw_data = data_manager.load_raw_data(contact.id)
-    if not raw_data or not raw_data.get('messages'):
-        return None
-
-    messages = raw_data['messages']
-    msg_times = [datetime.fromisoformat(msg['CreateTime']) for msg in messages]
-
     return {
         'id': contact.id,
         'name': contact.name,
-        'avatar_url': avatar_url,
-        'total_messages': len(messages),
-        'earliest_time': min(msg_times),
-        'latest_time': max(msg_times),
-        'last_analyzed': max(msg_times).strftime('%Y-%m-%d %H:%M')
+        'avatar_url': contact.avatar_url,
+        'total_messages': contact.total_messages,
+        'earliest_time': _parse_time(contact.first_time),
+        'latest_time': _parse_time(contact.last_time),
+        'last_analyzed': contact.last_analyzed[:16] if contact.last_analyzed else ''
     }
 
 
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    """解析注册表中的时间字符串"""
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S') if value else None
+
+
 def _format_date_range(earliest_time: Optional[datetime],
                        latest_time: Optional[datetime]) -> str:
     """格式化日期范围"""
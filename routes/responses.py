@@ -0,0 +1,60 @@
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+import hashlib
+from flask import Response, jsonify, request
+
+from utils.analyzers.series import SeriesQuery, parse_series
+from utils.response_cache import ResponseCache, compress, serialize, source_version
+
+
+def cached_json_response(cache_dir: Path, name: str, sources: Iterable[Path],
+                         build: Callable[[], Optional[Any]], query: Optional[SeriesQuery] = None):
+    """返回预先生成并压缩的 JSON 响应
+
+    以依赖文件的版本作为强 ETag：客户端携带的 If-None-Match 与之相同时直接返回 304；
+    否则按 Accept-Encoding 返回已保存的 br/gzip/未压缩响应体，尚未保存时调用 build 生成。
+    指定了时间范围或降采样参数时，由已保存的完整响应截取（解析后的序列缓存在进程内），
+    ETag 同时包含参数。页面首次加载时的默认视图（见 SeriesQuery.is_page_default）的结果
+    与完整响应一样压缩保存，其他参数的结果按请求计算，不保存。
+    Cache-Control: no-cache 使浏览器每次都携带 ETag 重新验证。
+    Args:
+        cache_dir: 响应体保存目录
+        name: 响应名称
+        sources: 响应所依赖的文件
+        build: 生成响应数据的函数，返回 None 表示数据不存在
+        query: 时间范围和降采样参数
+    """
+    version = source_version(name, sources)
+    etag = version
+    if query is not None and not query.is_default:
+        etag = hashlib.sha1(f'{version}:{query.key()}'.encode('utf-8')).hexdigest()
+
+    def accepts(encoding: str) -> bool:
+        return request.accept_encodings[encoding] > 0
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        cache = ResponseCache(cache_dir)
+        if etag == version:
+            cached = cache.get(name, version, accepts, build)
+        elif query.is_page_default:
+            def build_overview():
+                data = cache.load(name, version, build, parse=parse_series)
+                return query.apply(data) if data is not None else None
+
+            cached = cache.get(f'{name}-{query.granularity}-{query.max_points}', version, accepts, build_overview)
+        else:
+            data = cache.load(name, version, build, parse=parse_series)
+            cached = compress(serialize(query.apply(data)), accepts) if data is not None else None
+        if cached is None:
+            return jsonify({'error': '数据不存在'}), 404
+        body, encoding = cached
+        response = Response(body, mimetype='application/json')
+        if encoding != 'identity':
+            response.content_encoding = encoding
+
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    return response
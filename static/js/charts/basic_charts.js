@@ -184,12 +184,16 @@ function initMessageLengthChart(data) {
             trigger: 'item',
             formatter: function (params) {
                 if (params.seriesName === '通话时长') {
-                    return `平均通话时长<br/>${avgCallMinutes}分钟<br/>通话次数: ${callStats.count}`;
+                    const medianCallMinutes = Math.round((callStats.percentiles?.p50 || 0) / 60 * 10) / 10;
+                    return `平均通话时长<br/>${avgCallMinutes}分钟<br/>中位数: ${medianCallMinutes}分钟<br/>通话次数: ${callStats.count}`;
                 }
                 const stats = params.seriesName === '文字消息' ? textStats : voiceStats;
                 const unit = params.seriesName === '文字消息' ? '字' : '秒';
-                const count = params.name.includes('我的') ? stats.sender_count : stats.receiver_count;
-                return `${params.name}<br/>平均: ${params.value}${unit}<br/>消息数: ${count}`;
+                const isSender = params.name.includes('我的');
+                const count = isSender ? stats.sender_count : stats.receiver_count;
+                const percentiles = (isSender ? stats.sender_percentiles : stats.receiver_percentiles) || {};
+                return `${params.name}<br/>平均: ${params.value}${unit}<br/>中位数: ${percentiles.p50 || 0}${unit}` +
+                    `<br/>90%分位: ${percentiles.p90 || 0}${unit}<br/>消息数: ${count}`;
             }
         },
         legend: {
@@ -102,4 +102,49 @@ function initActiveTimeChart(data) {
     };
 
     chart.setOption(option);
-} 
\ No newline at end of file
+}
+
+// 每日消息趋势图
+function initDailyTrendChart(data) {
+    const chart = echarts.init(document.getElementById('dailyTrendChart'));
+
+    const dates = Object.keys(data);
+
+    const option = {
+        tooltip: {
+            trigger: 'axis'
+        },
+        grid: {
+            left: '3%',
+            right: '4%',
+            bottom: '15%',
+            containLabel: true
+        },
+        xAxis: {
+            type: 'category',
+            data: dates,
+            boundaryGap: false
+        },
+        yAxis: {
+            type: 'value',
+            name: '消息数'
+        },
+        dataZoom: [
+            {type: 'inside'},
+            {type: 'slider'}
+        ],
+        series: [
+            {
+                name: '消息数量',
+                type: 'line',
+                showSymbol: false,
+                data: dates.map(date => data[date]),
+                areaStyle: {
+                    opacity: 0.2
+                }
+            }
+        ]
+    };
+
+    chart.setOption(option);
+}
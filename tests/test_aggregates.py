@@ -0,0 +1,97 @@
+"""可合并的基础分析、交互分析中间结果的测试"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.analyzer import AnalysisConfig, ChatAnalyzer
+from utils.analyzers.aggregates import ChatAggregates
+from utils.message_table import MessageTable
+
+# (时间, is_sender, 类型)：同一天内多个相隔几分钟的会话、跨天和超过 1 小时的间隔
+MESSAGES = [
+    ('2020-01-01 09:00:00', 0, '文本'),
+    ('2020-01-01 09:02:00', 1, '文本'),
+    ('2020-01-01 09:05:00', 1, '图片'),
+    ('2020-01-01 09:07:00', 0, '文本'),  # 切分点 3：同一会话、同一天内
+    ('2020-01-01 11:30:00', 1, '文本'),
+    ('2020-01-01 11:31:00', 0, '表情'),
+    ('2020-01-01 23:59:00', 0, '文本'),
+    ('2020-01-02 00:01:00', 1, '文本'),  # 切分点 7：相隔 2 分钟但跨天
+    ('2020-01-02 00:20:00', 1, '语音'),
+    ('2020-01-05 08:00:00', 0, '文本'),
+    ('2020-01-05 08:10:00', 1, '文本'),
+]
+
+
+def _frame(rows=MESSAGES) -> pd.DataFrame:
+    return pd.DataFrame({
+        'CreateTime': pd.to_datetime([row[0] for row in rows]),
+        'is_sender': np.array([row[1] for row in rows], dtype=np.uint8),
+        'type_name': pd.Categorical([row[2] for row in rows]),
+    })
+
+
+def _aggregates(df: pd.DataFrame) -> ChatAggregates:
+    table = MessageTable.from_frame(df.reset_index(drop=True))
+    return ChatAnalyzer({'users': {}, 'messages': table, 'stats': {}}).aggregates
+
+
+@pytest.mark.parametrize('idle_gap', [None, 1800])
+@pytest.mark.parametrize('cuts', [[3], [7], [3, 7], [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]])
+def test_merge_of_parts_matches_whole(monkeypatch, idle_gap, cuts):
+    monkeypatch.setattr(AnalysisConfig, 'SESSION_IDLE_GAP', idle_gap)
+    df = _frame()
+    whole = _aggregates(df)
+
+    bounds = [0, *cuts, len(df)]
+    merged = ChatAggregates(session_idle_gap=idle_gap)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        merged = merged.merge(_aggregates(df.iloc[start:end]))
+
+    # 衔接处的间隔、响应时间和会话
+    assert merged.gap_stats == whole.gap_stats
+    np.testing.assert_array_equal(merged.gap_histogram.counts, whole.gap_histogram.counts)
+    np.testing.assert_array_equal(merged.response_histogram.counts, whole.response_histogram.counts)
+    assert merged.session_count == whole.session_count
+    np.testing.assert_array_equal(merged.initiator_counts, whole.initiator_counts)
+    np.testing.assert_array_equal(merged.ender_counts, whole.ender_counts)
+    assert (merged.first_session, merged.last_session) == (whole.first_session, whole.last_session)
+    assert (merged.first_response_time, merged.last_response_time) == \
+        (whole.first_response_time, whole.last_response_time)
+    assert merged.to_results() == whole.to_results()
+
+
+def test_sessions_differ_by_idle_gap(monkeypatch):
+    """确认测试数据覆盖两种会话划分：自然日划分与 30 分钟空闲间隔划分的会话数不同"""
+    counts = {}
+    for idle_gap in (None, 1800):
+        monkeypatch.setattr(AnalysisConfig, 'SESSION_IDLE_GAP', idle_gap)
+        counts[idle_gap] = _aggregates(_frame()).session_count
+    assert counts == {None: 3, 1800: 4}
+
+
+def test_merge_rejects_earlier_messages():
+    df = _frame()
+    with pytest.raises(ValueError):
+        _aggregates(df.iloc[5:]).merge(_aggregates(df.iloc[:5]))
+
+
+def test_save_load_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(AnalysisConfig, 'SESSION_IDLE_GAP', 1800)
+    aggregates = _aggregates(_frame())
+    path = tmp_path / 'aggregates.npz'
+    aggregates.save(path)
+    loaded = ChatAggregates.load(path)
+
+    assert loaded.to_results() == aggregates.to_results()
+    for name in ('session_idle_gap', 'session_count', 'first_session', 'last_session', 'message_count',
+                 'first_time', 'last_time', 'first_sender', 'last_sender',
+                 'first_response_time', 'last_response_time', 'gap_stats'):
+        assert getattr(loaded, name) == getattr(aggregates, name), name
+    assert sorted(loaded.daily_types) == sorted(aggregates.daily_types)
+    assert list(tmp_path.iterdir()) == [path]
+
+    # 读回的结果可以继续与之后的消息合并
+    later = _aggregates(_frame([('2020-01-05 08:15:00', 0, '文本')]))
+    assert loaded.merge(later).to_results() == aggregates.merge(later).to_results()
+    assert ChatAggregates.load(tmp_path / 'missing.npz') is None
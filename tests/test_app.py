@@ -0,0 +1,75 @@
+"""应用启动步骤的测试"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.synthetic import generate_export
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# 主模块在模块级导入 app：以 spawn 启动的进程池工作进程会重新导入主模块，也就重新导入 app
+SPAWN_SCRIPT = """
+import json, multiprocessing, sys, time
+import app
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('spawn')
+    client = app.create_app().test_client()
+    response = client.post('/api/contacts/new', data={'name': '合成联系人', 'path': sys.argv[1]})
+    contact_id, job = response.get_json()['id'], response.get_json()['job']
+    while job['status'] in ('queued', 'running'):
+        time.sleep(0.2)
+        job = client.get(f"/api/jobs/{job['id']}").get_json()
+    contacts = client.get('/api/contacts').get_json()['contacts']
+    print(json.dumps({'job': job, 'contact_ids': [c['id'] for c in contacts], 'contact_id': contact_id}))
+"""
+
+
+def test_spawned_workers_do_not_rerun_startup_steps(tmp_path):
+    """导入时读取多个CSV文件会启动进程池；工作进程重新导入 app 不应撤销正在进行的导入"""
+    export_dir = generate_export(tmp_path / 'export', 6000, chunk_size=2000)
+    script = tmp_path / 'main.py'
+    script.write_text(SPAWN_SCRIPT, encoding='utf-8')
+    workdir = tmp_path / 'work'
+    workdir.mkdir()
+
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_ROOT), BROWSER='true')
+    result = subprocess.run([sys.executable, str(script), str(export_dir)], cwd=workdir, env=env,
+                            capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert report['job']['status'] == 'succeeded', report['job']['error']
+    assert report['job']['result']['new_messages'] == 6000
+    assert report['contact_ids'] == [report['contact_id']]
+    assert (workdir / 'data' / 'contacts' / str(report['contact_id']) / 'messages.parquet').exists()
+
+
+def test_create_app_recovers_interrupted_imports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('BROWSER', 'true')
+    from app import create_app
+    from utils.data_manager import DataManager
+    from utils.job_queue import JobQueue
+
+    # 上次运行时中断的首次导入：联系人停留在 importing，任务停留在 running
+    data_manager = DataManager()
+    contact_id = data_manager.contacts.create('中断的导入', str(tmp_path))
+    data_manager.init_contact_directory(contact_id)
+    jobs = JobQueue(data_manager.paths.JOBS_DB)
+    job_id = jobs.store.create('create', contact_id)
+    jobs.store.update(job_id, status='running')
+    jobs.shutdown()
+
+    # 构造对象不执行启动步骤
+    DataManager()
+    JobQueue(data_manager.paths.JOBS_DB).shutdown()
+    assert data_manager.contacts.get(contact_id) is not None
+    assert jobs.get(job_id)['status'] == 'running'
+
+    create_app()
+    assert data_manager.contacts.get(contact_id) is None
+    assert not (data_manager.paths.CONTACTS_DIR / str(contact_id)).exists()
+    assert jobs.get(job_id)['status'] == 'failed'
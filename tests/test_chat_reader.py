@@ -0,0 +1,109 @@
+"""ChatReader 读取导出CSV的测试"""
+import json
+
+import numpy as np
+import pytest
+
+from utils.chat_reader import ChatReader
+
+CSV_HEADER = 'id,MsgSvrID,type_name,is_sender,talker,room_name,msg,src,extra,CreateTime\n'
+
+
+@pytest.fixture
+def export_dir(tmp_path):
+    """is_sender 有空值的导出目录"""
+    (tmp_path / 'users.json').write_text(json.dumps({}), encoding='utf-8')
+    (tmp_path / 'wxid_test_0_3.csv').write_text(
+        CSV_HEADER
+        + '1,101,文本,,wxid_test,,你好,,,2020-01-01 10:00:00\n'
+        + '2,102,文本,1,wxid_test,,在吗,,,2020-01-01 10:01:00\n'
+        + '3,103,图片,,wxid_test,,[图片],,,2020-01-01 10:02:00\n',
+        encoding='utf-8')
+    return tmp_path
+
+
+def test_read_messages_keeps_rows_with_missing_sender(export_dir):
+    reader = ChatReader(str(export_dir))
+    frame = reader.read_messages(reader.find_chat_files(), max_workers=1).frame
+
+    assert len(frame) == 3
+    assert frame['is_sender'].dtype == np.uint8
+    assert frame['is_sender'].tolist() == [0, 1, 0]
+
+
+def test_iter_messages_keeps_rows_with_missing_sender(export_dir):
+    reader = ChatReader(str(export_dir))
+    chunks = list(reader.iter_messages(reader.find_chat_files(), chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert [value for chunk in chunks for value in chunk.frame['is_sender']] == [0, 1, 0]
+
+
+def test_read_messages_merges_overlapping_files(tmp_path):
+    (tmp_path / 'users.json').write_text(json.dumps({}), encoding='utf-8')
+    (tmp_path / 'wxid_test_0_3.csv').write_text(
+        CSV_HEADER
+        + '1,101,文本,0,wxid_test,,a,,,2020-01-01 10:00:00\n'
+        + '2,102,文本,0,wxid_test,,b,,,2020-01-01 10:02:00\n'
+        + '3,103,文本,0,wxid_test,,c,,,2020-01-01 10:04:00\n',
+        encoding='utf-8')
+    (tmp_path / 'wxid_test_3_6.csv').write_text(
+        CSV_HEADER
+        + '4,201,文本,1,wxid_test,,d,,,2020-01-01 10:01:00\n'
+        + '5,202,文本,1,wxid_test,,e,,,2020-01-01 10:02:00\n'
+        + '6,203,文本,1,wxid_test,,f,,,2020-01-01 10:05:00\n',
+        encoding='utf-8')
+    reader = ChatReader(str(tmp_path))
+    frame = reader.read_messages(reader.find_chat_files(), max_workers=1).frame
+
+    # 时间相同的消息保持文件顺序
+    assert frame['msg'].tolist() == ['a', 'd', 'b', 'e', 'c', 'f']
+
+
+
+@pytest.fixture
+def export_with_corrupt_file(tmp_path):
+    """三个导出文件，中间一个第二行有无效的 UTF-8 字节"""
+    export = tmp_path / 'export'
+    export.mkdir()
+    (export / 'users.json').write_text(json.dumps({}), encoding='utf-8')
+    (export / 'wxid_test_0_2.csv').write_text(
+        CSV_HEADER
+        + '1,101,文本,0,wxid_test,,a,,,2020-01-01 10:00:00\n'
+        + '2,102,文本,1,wxid_test,,b,,,2020-01-01 10:01:00\n',
+        encoding='utf-8')
+    (export / 'wxid_test_2_4.csv').write_bytes(
+        (CSV_HEADER + '3,103,文本,0,wxid_test,,c,,,2020-01-02 10:00:00\n').encode('utf-8')
+        + b'4,104,\xff\xfe,0,wxid_test,,d,,,2020-01-02 10:01:00\n')
+    (export / 'wxid_test_4_6.csv').write_text(
+        CSV_HEADER
+        + '5,105,文本,1,wxid_test,,e,,,2020-01-03 10:00:00\n'
+        + '6,106,图片,0,wxid_test,,[图片],,,2020-01-03 10:01:00\n',
+        encoding='utf-8')
+    return export
+
+
+def test_iter_messages_skips_corrupt_file(export_with_corrupt_file):
+    reader = ChatReader(str(export_with_corrupt_file))
+    chunks = list(reader.iter_messages(reader.find_chat_files(), chunk_size=10))
+
+    assert [value for chunk in chunks for value in chunk.frame['msg']] == ['a', 'b', 'e', '[图片]']
+
+
+def test_stream_import_skips_corrupt_file(export_with_corrupt_file, tmp_path, monkeypatch):
+    from routes.contacts import ContactService
+    from utils.chat_reader import IngestConfig
+    from utils.data_manager import DataManager
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(IngestConfig, 'STREAMING_MIN_BYTES', 0)
+    # 出错的文件在流式导入中跳过，不应退回一次性导入
+    monkeypatch.setattr(ChatReader, 'read_chat_data', lambda self: pytest.fail('退回了一次性导入'))
+    data_manager = DataManager()
+    service = ContactService(data_manager)
+    contact, job = service.create_contact('测试', str(export_with_corrupt_file))
+
+    assert job['status'] == 'succeeded'
+    assert job['result'] == {'mode': 'full', 'new_files': 3, 'new_messages': 4}
+    messages = data_manager.load_messages(contact.id, columns=['msg']).frame
+    assert messages['msg'].tolist() == ['a', 'b', 'e', '[图片]']
@@ -0,0 +1,148 @@
+"""联系人注册表的测试：从 contacts.json 迁移、ID 不复用、汇总信息补充和全局计数"""
+import json
+
+import pytest
+
+from utils.contact_registry import ROLLUP_KINDS, ContactRegistry
+
+LEGACY_CONTACTS = [
+    {'id': 3, 'name': '张三', 'path': '/chats/zhangsan'},
+    {'id': 7, 'name': '李四', 'path': '/chats/lisi'},
+]
+
+
+@pytest.fixture
+def legacy_file(tmp_path):
+    path = tmp_path / 'contacts.json'
+    path.write_text(json.dumps(LEGACY_CONTACTS, ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+def test_migrate_json_keeps_original_ids(tmp_path, legacy_file):
+    registry = ContactRegistry(tmp_path / 'contacts.db', legacy_file=legacy_file)
+
+    contacts = registry.list_contacts()
+    assert [(c['id'], c['name'], c['path']) for c in contacts] == [
+        (c['id'], c['name'], c['path']) for c in LEGACY_CONTACTS]
+    assert all(c['status'] == 'ready' and c['last_analyzed'] is None for c in contacts)
+    # 新建的联系人接在迁移来的最大ID之后
+    assert registry.create('王五', '/chats/wangwu') == 8
+
+
+def test_migrate_json_only_on_first_open(tmp_path, legacy_file):
+    db_path = tmp_path / 'contacts.db'
+    ContactRegistry(db_path, legacy_file=legacy_file).delete(3)
+
+    legacy_file.write_text(json.dumps(LEGACY_CONTACTS + [{'id': 9, 'name': '赵六', 'path': '/chats/zhaoliu'}]),
+                           encoding='utf-8')
+    registry = ContactRegistry(db_path, legacy_file=legacy_file)
+    assert [c['id'] for c in registry.list_contacts()] == [7]
+
+
+def test_ids_are_not_reused_after_delete(tmp_path):
+    db_path = tmp_path / 'contacts.db'
+    registry = ContactRegistry(db_path)
+    first = registry.create('张三', '/chats/zhangsan')
+    second = registry.create('李四', '/chats/lisi')
+    registry.delete(second)
+    registry.delete(first)
+
+    assert registry.create('王五', '/chats/wangwu') == second + 1
+    # 重新打开数据库后仍然不复用
+    assert ContactRegistry(db_path).create('赵六', '/chats/zhaoliu') == second + 2
+
+
+def test_backfill_contact_summaries(tmp_path, monkeypatch, legacy_file):
+    from utils.data_manager import DataManager
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    legacy_file.rename(tmp_path / 'data' / 'contacts.json')
+    data_manager = DataManager()
+
+    # 联系人 3 有升级前保存的原始数据和基础分析结果，联系人 7 没有数据
+    data_manager.init_contact_directory(3)
+    data_manager.save_raw_meta(3, {'wxid_zhangsan': {'headImgUrl': 'http://example.com/a.png'}}, {
+        'total_messages': 5, 'start_time': '2024-01-01 08:00:00', 'end_time': '2024-01-02 21:30:00'})
+    data_manager.save_analysis_data(3, 'basic', 'message_stats', {'type_counts': {'文本': 4, '图片': 1}})
+    data_manager.save_analysis_data(3, 'basic', 'time_stats', {'hourly_counts': {'8': 3, '21': 2}})
+    data_manager.save_analysis_data(3, 'basic', 'daily_stats',
+                                    {'daily_counts': {'2024-01-01': 3, '2024-01-02': 2}})
+
+    data_manager.backfill_contact_summaries()
+
+    contact = data_manager.contacts.get(3)
+    assert contact['total_messages'] == 5
+    assert (contact['first_time'], contact['last_time']) == ('2024-01-01 08:00:00', '2024-01-02 21:30:00')
+    assert contact['avatar_url'] == 'https://example.com/a.png'
+    assert contact['last_analyzed'] is not None
+    rollups = {'type': {'图片': 1, '文本': 4}, 'hour': {'21': 2, '8': 3},
+               'day': {'2024-01-01': 3, '2024-01-02': 2}}
+    assert data_manager.contacts.rollups(3) == rollups
+    assert data_manager.contacts.rollups() == rollups
+
+    untouched = data_manager.contacts.get(7)
+    assert untouched['total_messages'] == 0 and untouched['last_analyzed'] is None
+    assert data_manager.contacts.totals()['total_messages'] == 5
+
+    # 已补充的联系人不再重复处理
+    analyzed_at = contact['last_analyzed']
+    data_manager.save_raw_meta(3, {}, {'total_messages': 99})
+    data_manager.backfill_contact_summaries()
+    assert data_manager.contacts.get(3)['last_analyzed'] == analyzed_at
+    assert data_manager.contacts.get(3)['total_messages'] == 5
+
+
+def _summed_rollups(registry):
+    """已完成导入的联系人的计数逐个相加"""
+    total = {kind: {} for kind in ROLLUP_KINDS}
+    for contact in registry.list_contacts():
+        for kind, counts in registry.rollups(contact['id']).items():
+            for key, count in counts.items():
+                total[kind][key] = total[kind].get(key, 0) + count
+    return {kind: dict(sorted(counts.items())) for kind, counts in total.items()}
+
+
+def test_global_rollups_equal_sum_of_ready_contacts(tmp_path):
+    registry = ContactRegistry(tmp_path / 'contacts.db')
+
+    def check():
+        assert registry.rollups() == _summed_rollups(registry)
+
+    # 导入：导入完成前不计入全局计数
+    first = registry.create('张三', '/chats/zhangsan')
+    registry.replace_rollups(first, {'type': {'文本': 3}, 'hour': {'9': 3}, 'day': {'2024-01-01': 3}})
+    assert registry.rollups() == {'type': {}, 'hour': {}, 'day': {}}
+    registry.mark_ready(first)
+    check()
+
+    second = registry.create('李四', '/chats/lisi')
+    registry.replace_rollups(second, {'type': {'文本': 2, '图片': 1}, 'hour': {'9': 1, '22': 2},
+                                      'day': {'2024-01-01': 1, '2024-02-01': 2}})
+    registry.mark_ready(second)
+    check()
+
+    # 首次导入尚未完成的联系人不计入全局计数
+    pending = registry.create('王五', '/chats/wangwu')
+    registry.replace_rollups(pending, {'type': {'文本': 100, '语音': 5}, 'hour': {'9': 105},
+                                       'day': {'2024-03-01': 105}})
+    check()
+    assert '语音' not in registry.rollups()['type']
+
+    # 更新：按差值调整，减为0的键被删除
+    registry.replace_rollups(first, {'type': {'文本': 4, '图片': 1}, 'hour': {'10': 5},
+                                     'day': {'2024-01-01': 3, '2024-01-05': 2}})
+    check()
+    assert '9' in registry.rollups()['hour']
+    registry.replace_rollups(second, {'type': {'文本': 2}, 'hour': {'22': 2}, 'day': {'2024-02-01': 2}})
+    check()
+    assert '9' not in registry.rollups()['hour']
+
+    # 删除
+    registry.delete(pending)
+    check()
+    registry.delete(first)
+    check()
+    assert registry.rollups() == registry.rollups(second)
+    registry.delete(second)
+    assert registry.rollups() == {'type': {}, 'hour': {}, 'day': {}}
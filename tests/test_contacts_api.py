@@ -0,0 +1,66 @@
+"""联系人分页接口的测试"""
+import json
+
+import pytest
+
+CONTACT_COUNT = 520
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """由旧版 contacts.json 迁移出 CONTACT_COUNT 个联系人，另有一个首次导入中的联系人"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('BROWSER', 'true')
+    (tmp_path / 'data').mkdir()
+    contacts = [{'id': i, 'name': f'联系人{i}', 'path': f'/chats/{i}'} for i in range(1, CONTACT_COUNT + 1)]
+    (tmp_path / 'data' / 'contacts.json').write_text(json.dumps(contacts, ensure_ascii=False), encoding='utf-8')
+
+    from app import create_app
+    from utils.data_manager import DataManager
+
+    app = create_app()
+    DataManager().contacts.create('导入中', '/chats/importing')
+    return app.test_client()
+
+
+def test_pages_in_id_order_with_total(client):
+    body = client.get('/api/contacts?page=2&per_page=30').get_json()
+
+    assert (body['page'], body['per_page'], body['total']) == (2, 30, CONTACT_COUNT)
+    assert [c['id'] for c in body['contacts']] == list(range(31, 61))
+    assert body['contacts'][0]['name'] == '联系人31'
+
+
+def test_default_page_size(client):
+    body = client.get('/api/contacts').get_json()
+
+    assert (body['page'], body['per_page'], body['total']) == (1, 50, CONTACT_COUNT)
+    assert [c['id'] for c in body['contacts']] == list(range(1, 51))
+
+
+def test_per_page_is_capped_at_500(client):
+    body = client.get('/api/contacts?per_page=100000').get_json()
+
+    assert body['per_page'] == 500
+    assert len(body['contacts']) == 500
+    assert body['total'] == CONTACT_COUNT
+
+    last = client.get('/api/contacts?page=2&per_page=100000').get_json()
+    assert [c['id'] for c in last['contacts']] == list(range(501, CONTACT_COUNT + 1))
+
+
+@pytest.mark.parametrize('query, page, per_page', [
+    ('page=0&per_page=0', 1, 1),
+    ('page=-3&per_page=-10', 1, 1),
+    ('page=abc&per_page=xyz', 1, 50),
+])
+def test_invalid_paging_is_clamped(client, query, page, per_page):
+    body = client.get(f'/api/contacts?{query}').get_json()
+    assert (body['page'], body['per_page']) == (page, per_page)
+    assert body['contacts'][0]['id'] == 1
+
+
+def test_page_past_end_is_empty(client):
+    body = client.get('/api/contacts?page=100&per_page=50').get_json()
+    assert body['contacts'] == []
+    assert body['total'] == CONTACT_COUNT
@@ -0,0 +1,80 @@
+"""对话间隔分布的测试：按发送方、年份分组及自定义区间"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.analyzer import ChatAnalyzer
+from utils.analyzers.aggregates import GAP_LABELS
+
+# (时间, is_sender)，故意不按时间排序；排序后相邻间隔（小时）及后一条消息为：
+# 0.5 发送方 2023 / 1.0 发送方 2024（跨年）/ 0.5 接收方 2024 / 13.5 发送方 2024 / 48.5 接收方 2024
+MESSAGES = [
+    ('2023-12-31 23:00:00', 0),
+    ('2024-01-01 00:30:00', 1),
+    ('2024-01-01 01:00:00', 0),
+    ('2024-01-01 14:30:00', 1),
+    ('2023-12-31 23:30:00', 1),
+    ('2024-01-03 15:00:00', 0),
+]
+
+
+@pytest.fixture
+def analyzer():
+    df = pd.DataFrame({
+        'CreateTime': pd.to_datetime([row[0] for row in MESSAGES]),
+        'is_sender': np.array([row[1] for row in MESSAGES], dtype=np.uint8),
+        'type_name': pd.Categorical(['文本'] * len(MESSAGES)),
+    })
+    return ChatAnalyzer({'users': {}, 'messages': df, 'stats': {}})
+
+
+def _distribution(**counts):
+    return {label: counts.get(label, 0) for label in GAP_LABELS}
+
+
+def test_ungrouped(analyzer):
+    assert analyzer.analyze_gap_distribution() == {
+        'count': 5, 'avg_gap': 12.8, 'max_gap': 48.5,
+        'distribution': _distribution(**{'1小时内': 3, '12-24小时': 1, '24小时以上': 1})
+    }
+
+
+def test_by_sender(analyzer):
+    assert analyzer.analyze_gap_distribution(by='sender') == {
+        'sender': {'count': 3, 'avg_gap': 5.0, 'max_gap': 13.5,
+                   'distribution': _distribution(**{'1小时内': 2, '12-24小时': 1})},
+        'receiver': {'count': 2, 'avg_gap': 24.5, 'max_gap': 48.5,
+                     'distribution': _distribution(**{'1小时内': 1, '24小时以上': 1})},
+    }
+
+
+def test_by_year_uses_later_message(analyzer):
+    by_year = analyzer.analyze_gap_distribution(by='year')
+    assert list(by_year) == ['2023', '2024']
+    assert by_year['2023'] == {'count': 1, 'avg_gap': 0.5, 'max_gap': 0.5,
+                               'distribution': _distribution(**{'1小时内': 1})}
+    # 跨年的间隔计入后一条消息所在的年份
+    assert by_year['2024'] == {'count': 4, 'avg_gap': 15.9, 'max_gap': 48.5,
+                               'distribution': _distribution(**{'1小时内': 2, '12-24小时': 1, '24小时以上': 1})}
+
+
+@pytest.mark.parametrize('by', ['sender', 'year'])
+def test_groups_add_up_to_whole(analyzer, by):
+    whole = analyzer.analyze_gap_distribution()
+    groups = analyzer.analyze_gap_distribution(by=by).values()
+    assert sum(group['count'] for group in groups) == whole['count']
+    for label in GAP_LABELS:
+        assert sum(group['distribution'][label] for group in groups) == whole['distribution'][label]
+
+
+def test_custom_bins(analyzer):
+    result = analyzer.analyze_gap_distribution(by='sender', bins=[0, 1, 24, float('inf')])
+    assert result['sender']['distribution'] == {'0-1小时': 2, '1-24小时': 1, '24小时以上': 0}
+    assert result['receiver']['distribution'] == {'0-1小时': 1, '1-24小时': 0, '24小时以上': 1}
+
+
+def test_invalid_arguments(analyzer):
+    with pytest.raises(ValueError):
+        analyzer.analyze_gap_distribution(by='month')
+    with pytest.raises(ValueError):
+        analyzer.analyze_gap_distribution(bins=[0, 1, 2], labels=['只有一个'])
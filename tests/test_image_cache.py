@@ -0,0 +1,154 @@
+"""图片代理磁盘缓存的测试（使用本地 http.server 作为上游）"""
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from utils.image_cache import ImageCache, ImageFetchError
+
+
+class _Upstream(BaseHTTPRequestHandler):
+    """/img/<名称>?size=字节数&delay=秒 返回内容各不相同的图片，其他路径返回 404"""
+    protocol_version = 'HTTP/1.1'  # 保持连接，用于检查连接复用
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.hits[url.path] += 1
+        if not url.path.startswith('/img/'):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        query = parse_qs(url.query)
+        time.sleep(float(query.get('delay', ['0'])[0]))
+        size = int(query.get('size', ['64'])[0])
+        body = (url.path.encode() * size)[:size]
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Upstream)
+    server.daemon_threads = True
+    server.hits, server.connections = Counter(), 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ImageCache(tmp_path / 'images')
+
+
+def test_get_downloads_once_and_hits_disk(upstream, tmp_path, cache):
+    url = f'{upstream.url}/img/a'
+    first = cache.get(url)
+    assert first.content_type == 'image/png'
+    assert cache.get(url).content_hash == first.content_hash
+
+    # 新的实例（重启后）直接读取磁盘缓存
+    reopened = ImageCache(tmp_path / 'images')
+    assert reopened.lookup(url).path.read_bytes() == first.path.read_bytes()
+    assert upstream.hits['/img/a'] == 1
+
+
+def test_concurrent_requests_are_coalesced(upstream, cache):
+    url = f'{upstream.url}/img/slow?delay=0.3'
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        images = list(executor.map(lambda _: cache.get(url), range(8)))
+
+    assert upstream.hits['/img/slow'] == 1
+    assert len({image.content_hash for image in images}) == 1
+
+
+def test_connections_are_pooled(upstream, cache):
+    for name in 'abcde':
+        cache.get(f'{upstream.url}/img/{name}')
+    assert upstream.connections == 1
+
+
+def test_least_recently_used_images_are_evicted(upstream, tmp_path):
+    cache = ImageCache(tmp_path / 'images', max_bytes=250)
+    urls = {name: f'{upstream.url}/img/{name}?size=100' for name in 'abc'}
+    for name in 'aba':  # 访问 a 后，b 成为最久未访问的图片
+        cache.get(urls[name])
+        time.sleep(0.01)
+    cache.get(urls['c'])
+
+    assert cache.lookup(urls['b']) is None
+    assert cache.lookup(urls['a']) is not None
+    assert cache.lookup(urls['c']) is not None
+    assert cache.stats() == (2, 200)
+
+
+def test_open_treats_evicted_file_as_miss(upstream, cache):
+    url = f'{upstream.url}/img/a'
+    cache.get(url).path.unlink()  # 模拟查找之后、读取之前被其他请求淘汰
+
+    image, image_file = cache.open(url)
+    with image_file:
+        assert image_file.read() == image.path.read_bytes()
+    assert upstream.hits['/img/a'] == 2
+
+
+def test_rejects_non_http_urls(cache):
+    with pytest.raises(ValueError):
+        cache.get('file:///etc/passwd')
+
+
+def test_upstream_errors_raise_fetch_error(upstream, cache):
+    with pytest.raises(ImageFetchError):
+        cache.get(f'{upstream.url}/missing')
+    assert cache.stats() == (0, 0)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """在临时工作目录中创建应用，数据和图片缓存都在临时目录中"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('BROWSER', 'true')  # 无图形界面时 flaskwebgui 导入时找不到浏览器
+    from utils.warmup import warmup
+    monkeypatch.setattr(warmup, 'start', lambda: None)
+    from app import create_app
+    return create_app().test_client()
+
+
+def test_proxy_serves_cached_image_with_etag(upstream, client):
+    url = f'{upstream.url}/img/a'
+    with client.get('/proxy/image', query_string={'url': url}) as response:
+        assert response.status_code == 200
+        assert response.mimetype == 'image/png'
+        assert response.headers['Cache-Control'].startswith('public')
+        etag = response.headers['ETag']
+
+    with client.get('/proxy/image', query_string={'url': url}, headers={'If-None-Match': etag}) as response:
+        assert response.status_code == 304
+    assert upstream.hits['/img/a'] == 1
+
+
+def test_proxy_rejects_bad_urls(client):
+    assert client.get('/proxy/image').status_code == 400
+    assert client.get('/proxy/image', query_string={'url': 'ftp://example.com/a.png'}).status_code == 400
+
+
+def test_proxy_reports_upstream_failure(upstream, client):
+    assert client.get('/proxy/image', query_string={'url': f'{upstream.url}/missing'}).status_code == 502
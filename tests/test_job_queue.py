@@ -0,0 +1,137 @@
+"""后台任务队列的测试：取消、同一联系人去重和重启后的中断处理"""
+import threading
+
+import pytest
+
+from utils.job_queue import JobQueue
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db')
+    yield queue
+    queue.shutdown()
+
+
+def _wait(queue, job_id):
+    """等待任务结束（线程池只有一个线程，提交一个空任务并等待它执行完）"""
+    done = threading.Event()
+    queue._executor.submit(done.set)
+    assert done.wait(TIMEOUT)
+    return queue.get(job_id)
+
+
+class _BlockingJob:
+    """进入 'read' 阶段后阻塞，直到测试放行；commit_first 时先进入写入阶段"""
+
+    def __init__(self, commit_first=False):
+        self.commit_first = commit_first
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.stages = []
+        self.cancelled = []
+
+    def __call__(self, ctx):
+        ctx.stage('read')
+        self.stages.append('read')
+        if self.commit_first:
+            ctx.commit()
+        self.started.set()
+        assert self.release.wait(TIMEOUT)
+        ctx.stage('save')
+        self.stages.append('save')
+        return {'ok': True}
+
+    def on_cancel(self):
+        self.cancelled.append(True)
+
+
+def test_cancel_queued_job_never_runs(queue):
+    blocker = _BlockingJob()
+    first = queue.submit('create', 1, blocker)
+    assert blocker.started.wait(TIMEOUT)
+
+    job = _BlockingJob()
+    second = queue.submit('create', 2, job, job.on_cancel)
+    assert queue.cancel(second['id'])['cancel_requested']
+    blocker.release.set()
+
+    assert _wait(queue, first['id'])['status'] == 'succeeded'
+    assert queue.get(second['id'])['status'] == 'cancelled'
+    assert job.stages == []
+    assert job.cancelled == [True]
+
+
+def test_cancel_before_commit_stops_at_next_stage(queue):
+    job = _BlockingJob()
+    submitted = queue.submit('create', 1, job, job.on_cancel)
+    assert job.started.wait(TIMEOUT)
+
+    assert queue.cancel(submitted['id'])['cancel_requested']
+    job.release.set()
+
+    finished = _wait(queue, submitted['id'])
+    assert finished['status'] == 'cancelled'
+    assert job.stages == ['read']
+    assert job.cancelled == [True]
+
+
+def test_cancel_after_commit_is_ignored(queue):
+    job = _BlockingJob(commit_first=True)
+    submitted = queue.submit('update', 1, job, job.on_cancel)
+    assert job.started.wait(TIMEOUT)
+
+    after = queue.cancel(submitted['id'])
+    assert not after['cancellable']
+    assert not after['cancel_requested']
+    job.release.set()
+
+    finished = _wait(queue, submitted['id'])
+    assert finished['status'] == 'succeeded'
+    assert finished['result'] == {'ok': True}
+    assert job.stages == ['read', 'save']
+    assert job.cancelled == []
+
+
+def test_submit_dedupes_per_contact(queue):
+    job = _BlockingJob()
+    first = queue.submit('create', 1, job)
+    assert job.started.wait(TIMEOUT)
+
+    assert queue.submit('update', 1, _BlockingJob())['id'] == first['id']
+    other = queue.submit('update', 2, lambda ctx: None)
+    assert other['id'] != first['id']
+    assert queue.active_job(1)['id'] == first['id']
+
+    job.release.set()
+    assert _wait(queue, first['id'])['status'] == 'succeeded'
+    assert queue.get(other['id'])['status'] == 'succeeded'
+    assert queue.active_job(1) is None
+    assert queue.submit('update', 1, lambda ctx: None)['id'] != first['id']
+
+
+def test_fail_interrupted_on_restart(tmp_path):
+    db_path = tmp_path / 'jobs.db'
+    before = JobQueue(db_path)
+    running = before.store.create('create', 1)
+    before.store.update(running, status='running', started_at='2024-01-01 00:00:00')
+    queued = before.store.create('update', 2)
+    done = before.store.create('update', 3)
+    before.store.update(done, status='succeeded')
+    before.shutdown()
+
+    after = JobQueue(db_path)
+    try:
+        interrupted = after.fail_interrupted()
+        assert sorted(job['id'] for job in interrupted) == [running, queued]
+        for job_id in (running, queued):
+            job = after.get(job_id)
+            assert job['status'] == 'failed'
+            assert job['error'] and job['finished_at']
+        assert after.get(done)['status'] == 'succeeded'
+        assert after.active_job(1) is None
+        assert after.fail_interrupted() == []
+    finally:
+        after.shutdown()
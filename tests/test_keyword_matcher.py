@@ -0,0 +1,29 @@
+"""关键词匹配器和标签趋势的测试"""
+import numpy as np
+import pandas as pd
+
+from utils.analyzer import ChatAnalyzer
+from utils.analyzers.keyword_matcher import KeywordMatcher
+
+
+def test_count_and_bitmasks():
+    matcher = KeywordMatcher({'a': ['工作', '加班'], 'b': ['电影'], 'c': ['旅游']})
+    counts = matcher.count(['加班工作', '看电影', '', '加班看电影'])
+    assert counts.tolist() == [[2, 0, 0], [0, 1, 0], [0, 0, 0], [1, 1, 0]]
+    assert matcher.bitmasks(counts).tolist() == [0b001, 0b010, 0, 0b011]
+
+
+def test_tag_trends_presence_matches_counts():
+    df = pd.DataFrame({
+        'CreateTime': pd.to_datetime(['2020-01-03', '2020-01-20', '2020-03-02', '2020-03-05', '2020-04-01']),
+        'type_name': ['文本', '文本', '图片', '文本', '文本'],
+        'msg': ['今天加班好累', '加班加班', '工作', '一起去看电影吧', '晚安'],
+    })
+    presence = ChatAnalyzer._analyze_tag_trends(df, mode='presence')
+    counts = ChatAnalyzer._analyze_tag_trends(df, mode='count')
+
+    assert presence['times'] == ['2020-01', '2020-02', '2020-03', '2020-04']
+    for name in ('basicTopics', 'emotions'):
+        for group, values in counts[name].items():
+            assert presence[name][group] == (np.array(values) > 0).astype(int).tolist()
+    assert any(any(values) for values in presence['basicTopics'].values())
@@ -0,0 +1,141 @@
+"""消息长度中间结果的测试：与逐条解析的旧实现结果一致，分段合并与整体计算一致"""
+import pandas as pd
+import pytest
+
+from utils.analyzers.message_length import MessageLengthStats
+
+ROWS = [
+    # 文本：含空消息和缺失内容
+    ('2024-01-03 09:00:00', 1, '文本', '你好'),
+    ('2024-01-03 09:01:00', 0, '文本', '你好呀，最近怎么样'),
+    ('2024-01-05 10:00:00', 1, '文本', ''),
+    ('2024-01-05 10:01:00', 0, '文本', None),
+    ('2024-02-01 20:00:00', 1, '文本', '周末一起去爬山吧'),
+    ('2024-02-01 20:05:00', 0, '文本', '好'),
+    ('2024-02-11 08:00:00', 0, '文本', '新年快乐'),
+    # 语音：含无法解析的时长
+    ('2024-01-04 12:00:00', 1, '语音', '[语音]语音时长：12秒'),
+    ('2024-01-04 12:01:00', 0, '语音', '[语音]语音时长：3.5秒'),
+    ('2024-02-02 12:00:00', 1, '语音', '[语音]语音时长：未知秒'),
+    ('2024-02-02 12:01:00', 1, '语音', '[语音]'),
+    ('2024-02-03 12:00:00', 0, '语音', '语音时长：60秒'),
+    # 语音通话：含方括号和无法解析的时长
+    ('2024-01-06 21:00:00', 1, '语音通话', '通话时长 05:03'),
+    ('2024-01-07 21:00:00', 0, '语音通话', '通话时长 [00:45]'),
+    ('2024-02-07 21:00:00', 1, '语音通话', '已取消'),
+    ('2024-02-08 21:00:00', 0, '语音通话', '通话时长 12:00'),
+    # 不参与长度统计的类型
+    ('2024-01-08 09:00:00', 1, '图片', '[图片]'),
+    ('2024-02-09 09:00:00', 0, '表情', '[动画表情]'),
+]
+
+
+def _frame(rows=ROWS) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=['CreateTime', 'is_sender', 'type_name', 'msg'])
+
+
+def _baseline(messages):
+    """改为可合并中间结果之前逐条解析的实现（只含旧版输出的字段）"""
+    sender_text_messages = [msg for msg in messages
+                            if msg.get('type_name') == '文本' and msg.get('is_sender')]
+    receiver_text_messages = [msg for msg in messages
+                              if msg.get('type_name') == '文本' and not msg.get('is_sender')]
+    sender_text_lengths = [len(msg.get('msg', '')) for msg in sender_text_messages if msg.get('msg')]
+    receiver_text_lengths = [len(msg.get('msg', '')) for msg in receiver_text_messages if msg.get('msg')]
+
+    def extract_voice_length(msg):
+        content = msg.get('msg', '')
+        if isinstance(content, str) and '语音时长：' in content:
+            try:
+                return float(content.split('语音时长：')[1].split('秒')[0].strip())
+            except (ValueError, IndexError):
+                return 0
+        return 0
+
+    sender_voice_messages = [msg for msg in messages
+                             if msg.get('type_name') == '语音' and msg.get('is_sender')]
+    receiver_voice_messages = [msg for msg in messages
+                               if msg.get('type_name') == '语音' and not msg.get('is_sender')]
+    sender_voice_lengths = [l for l in map(extract_voice_length, sender_voice_messages) if l > 0]
+    receiver_voice_lengths = [l for l in map(extract_voice_length, receiver_voice_messages) if l > 0]
+
+    def extract_call_duration(msg):
+        content = msg.get('msg', '')
+        if isinstance(content, str) and '通话时长' in content:
+            try:
+                duration_str = content.split('通话时长')[1].strip().strip('[]').strip()
+                minutes, seconds = map(int, duration_str.split(':'))
+                return minutes * 60 + seconds
+            except (ValueError, IndexError):
+                return 0
+        return 0
+
+    call_messages = [msg for msg in messages if msg.get('type_name') == '语音通话']
+    call_durations = [d for d in map(extract_call_duration, call_messages) if d > 0]
+
+    def average(values, digits=None):
+        return round(sum(values) / len(values), digits) if values else 0
+
+    return {
+        'text_length': {
+            'sender_average': average(sender_text_lengths),
+            'receiver_average': average(receiver_text_lengths),
+            'sender_count': len(sender_text_messages),
+            'receiver_count': len(receiver_text_messages)
+        },
+        'voice_length': {
+            'sender_average': average(sender_voice_lengths, 1),
+            'receiver_average': average(receiver_voice_lengths, 1),
+            'sender_count': len(sender_voice_messages),
+            'receiver_count': len(receiver_voice_messages)
+        },
+        'call_duration': {
+            'average': average(call_durations, 1),
+            'count': len(call_messages)
+        }
+    }
+
+
+def test_render_matches_baseline():
+    df = _frame()
+    result = MessageLengthStats.from_frame(df).render()
+    expected = _baseline(df.to_dict('records'))
+
+    for section, fields in expected.items():
+        assert {name: result[section][name] for name in fields} == fields
+
+    # 最近秩法：发送方有效文本长度为 [2, 8]
+    assert result['text_length']['sender_percentiles']['p50'] == 2
+    assert result['text_length']['sender_percentiles']['p75'] == 8
+    assert result['call_duration']['percentiles']['p99'] == 720
+    assert result['monthly_trends']['months'] == ['2024-01', '2024-02']
+    assert result['monthly_trends']['call_duration']['average'] == [174.0, 720.0]
+
+
+def test_render_empty():
+    result = MessageLengthStats.from_frame(_frame([])).render()
+    assert result['text_length']['sender_count'] == 0
+    assert result['call_duration'] == {'average': 0, 'count': 0,
+                                       'percentiles': {'p25': 0, 'p50': 0, 'p75': 0, 'p90': 0, 'p99': 0}}
+    assert result['monthly_trends']['months'] == []
+
+
+@pytest.mark.parametrize('cut', [0, 3, 9, len(ROWS)])
+def test_merge_is_additive(cut):
+    whole = MessageLengthStats.from_frame(_frame())
+    merged = (MessageLengthStats.from_frame(_frame(ROWS[:cut]))
+              .merge(MessageLengthStats.from_frame(_frame(ROWS[cut:]))))
+
+    pd.testing.assert_frame_equal(merged.counts.reset_index(drop=True),
+                                  whole.counts.reset_index(drop=True), check_dtype=False)
+    assert merged.render() == whole.render()
+
+
+def test_merge_then_save_load(tmp_path):
+    stats = (MessageLengthStats.from_frame(_frame(ROWS[::2]))
+             .merge(MessageLengthStats.from_frame(_frame(ROWS[1::2]))))
+    stats.save(tmp_path / 'message_length.npz')
+
+    loaded = MessageLengthStats.load(tmp_path / 'message_length.npz')
+    assert loaded.render() == MessageLengthStats.from_frame(_frame()).render()
+    assert MessageLengthStats.load(tmp_path / 'missing.npz') is None
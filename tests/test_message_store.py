@@ -0,0 +1,98 @@
+"""分块写入消息存储和消息索引的测试"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data_manager import DataPaths, MessageStoreWriter
+from utils.message_index import IndexPaths, MessageIndex
+from utils.message_table import MessageTable
+
+
+def _messages(start: int, n: int) -> MessageTable:
+    return MessageTable.from_frame(pd.DataFrame({
+        'MsgSvrID': np.arange(start, start + n),
+        'type_name': ['文本', '图片'] * (n // 2) + ['文本'] * (n % 2),
+        'is_sender': np.arange(n) % 2,
+        'msg': [f'消息{i}' for i in range(start, start + n)],
+        'CreateTime': pd.date_range('2020-01-01', periods=n, freq='min') + pd.Timedelta(days=start),
+    }))
+
+
+def test_abort_keeps_previous_messages_and_index(tmp_path):
+    paths = DataPaths()
+    with MessageStoreWriter(tmp_path, paths) as writer:
+        writer.append(_messages(0, 10))
+    before = MessageIndex.open(tmp_path)
+    timestamps = np.array(before.timestamps)
+
+    with pytest.raises(RuntimeError):
+        with MessageStoreWriter(tmp_path, paths) as writer:
+            writer.append(_messages(100, 5))
+            raise RuntimeError('导入中途取消')
+
+    messages = MessageTable.read_parquet(tmp_path / paths.MESSAGES_FILE)
+    assert messages.frame['MsgSvrID'].tolist() == list(range(10))
+    index = MessageIndex.open(tmp_path)
+    assert index.header == before.header
+    np.testing.assert_array_equal(index.timestamps, timestamps)
+    assert sorted(p.name for p in (tmp_path / IndexPaths.DIR_NAME).iterdir()) == sorted(
+        [IndexPaths.HEADER_FILE, IndexPaths.TIMESTAMPS_FILE, IndexPaths.SENDER_FILE, IndexPaths.TYPES_FILE])
+
+
+def test_close_replaces_index(tmp_path):
+    paths = DataPaths()
+    for start, n in ((0, 10), (100, 4)):
+        with MessageStoreWriter(tmp_path, paths) as writer:
+            writer.append(_messages(start, n))
+
+    index = MessageIndex.open(tmp_path)
+    assert index.total_messages == 4
+    assert index.type_names == ['图片', '文本']
+    assert index.is_sender.tolist() == [0, 1, 0, 1]
+
+
+def test_save_replaces_arrays_before_header(tmp_path, monkeypatch):
+    MessageIndex.from_frame(_messages(0, 10).frame).save(tmp_path)
+    index_dir = tmp_path / IndexPaths.DIR_NAME
+
+    # 替换数组时旧 header 已删除，读取方此时打开索引得到 None，而不是旧 header 配新数组
+    seen = []
+    replace = os.replace
+
+    def checked_replace(src, dst):
+        seen.append(MessageIndex.open(tmp_path))
+        replace(src, dst)
+
+    monkeypatch.setattr('utils.message_index.os.replace', checked_replace)
+    MessageIndex.from_frame(_messages(100, 4).frame).save(tmp_path)
+
+    assert seen == [None] * 3
+    assert MessageIndex.open(tmp_path).total_messages == 4
+    assert sorted(p.name for p in index_dir.iterdir()) == sorted(
+        [IndexPaths.HEADER_FILE, IndexPaths.TIMESTAMPS_FILE, IndexPaths.SENDER_FILE, IndexPaths.TYPES_FILE])
+
+
+def test_save_raw_data_failure_keeps_previous_store_and_index(tmp_path, monkeypatch):
+    from utils.data_manager import DataManager
+
+    monkeypatch.chdir(tmp_path)
+    data_manager = DataManager()
+    data_manager.init_contact_directory(1)
+    data_manager.save_raw_data(1, {'users': {}, 'messages': _messages(0, 10), 'stats': {}})
+    before = MessageIndex.open(tmp_path / 'data' / 'contacts' / '1').header
+
+    def interrupted_write(table, where, **kwargs):
+        Path(where).write_bytes(b'PAR1')  # 写了一半
+        raise RuntimeError('写入中途取消')
+
+    monkeypatch.setattr('utils.message_table.pq.write_table', interrupted_write)
+    with pytest.raises(RuntimeError):
+        data_manager.save_raw_data(1, {'users': {}, 'messages': _messages(100, 20), 'stats': {}})
+
+    contact_dir = tmp_path / 'data' / 'contacts' / '1'
+    assert data_manager.load_messages(1).frame['MsgSvrID'].tolist() == list(range(10))
+    assert MessageIndex.open(contact_dir).header == before
+    assert not list(contact_dir.glob('*.tmp'))
@@ -0,0 +1,73 @@
+"""预先生成的 API 响应缓存的测试"""
+import gzip
+import json
+
+import pandas as pd
+import pytest
+from flask import Flask, request
+
+from routes.responses import cached_json_response
+from utils.analyzers.series import SeriesConfig, SeriesQuery
+from utils.response_cache import ResponseCache
+
+
+def test_load_caches_parsed_data(tmp_path):
+    cache = ResponseCache(tmp_path)
+    parsed_times = []
+
+    def parse(data):
+        parsed_times.append(1)
+        return {**data, 'parsed': True}
+
+    first = cache.load('stats', 'v1', lambda: {'total': 1}, parse=parse)
+    second = cache.load('stats', 'v1', lambda: {'total': 1}, parse=parse)
+    assert first == {'total': 1, 'parsed': True}
+    assert second is first
+    assert len(parsed_times) == 1
+
+    # 新版本的响应重新生成和解析
+    assert cache.load('stats', 'v2', lambda: {'total': 2}, parse=parse)['total'] == 2
+    assert len(parsed_times) == 2
+
+
+@pytest.fixture
+def stats_client(tmp_path):
+    """返回 1000 天每日统计的接口，响应保存在 tmp_path/responses"""
+    dates = pd.date_range('2020-01-01', periods=1000).strftime('%Y-%m-%d')
+    daily_stats = {'daily_counts': {date: i % 17 for i, date in enumerate(dates)},
+                   'daily_types': {'文本': {date: i % 17 for i, date in enumerate(dates)}}}
+    source = tmp_path / 'aggregates.npz'
+    source.write_bytes(b'0')
+
+    app = Flask(__name__)
+
+    @app.route('/stats')
+    def stats():
+        return cached_json_response(tmp_path / 'responses', 'basic_stats', [source],
+                                    lambda: {'daily_stats': daily_stats}, SeriesQuery.from_args(request.args))
+
+    return app.test_client()
+
+
+def test_page_default_query_is_saved_compressed(stats_client, tmp_path, monkeypatch):
+    url = f'/stats?max_points={SeriesConfig.DEFAULT_MAX_POINTS}'
+    first = stats_client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert first.content_encoding == 'gzip'
+    points = json.loads(gzip.decompress(first.data))['daily_stats']['daily_counts']
+    assert len(points) == SeriesConfig.DEFAULT_MAX_POINTS
+    saved = {path.name.split('.')[0] for path in (tmp_path / 'responses').iterdir()}
+    assert saved == {'basic_stats', f'basic_stats-day-{SeriesConfig.DEFAULT_MAX_POINTS}'}
+
+    # 再次请求直接读取保存的响应体，不再降采样
+    monkeypatch.setattr(SeriesQuery, 'apply', lambda self, payload: pytest.fail('重新降采样'))
+    second = stats_client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert second.data == first.data
+    assert second.get_etag() == first.get_etag()
+
+
+@pytest.mark.parametrize('query', ['max_points=50', 'max_points=51&granularity=week',
+                                   'start=2020-02-01&end=2020-12-31&max_points=400'])
+def test_other_queries_are_not_saved(stats_client, tmp_path, query):
+    response = stats_client.get(f'/stats?{query}')
+    assert response.status_code == 200
+    assert {path.name.split('.')[0] for path in (tmp_path / 'responses').iterdir()} == {'basic_stats'}
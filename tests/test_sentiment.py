@@ -0,0 +1,53 @@
+"""情感打分引擎的测试：结果对齐、按内容哈希复用缓存和进度登记"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.analyzers import sentiment
+from utils.analyzers.sentiment import SentimentEngine, SentimentProgress
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    """用消息长度代替 SnowNLP 打分，记录每次送去打分的消息；'坏' 无法打分"""
+    calls = []
+
+    def fake_score_chunk(texts):
+        calls.append(list(texts))
+        return [float('nan') if text == '坏' else len(text) / 10 for text in texts]
+
+    monkeypatch.setattr(sentiment, '_score_chunk', fake_score_chunk)
+    return calls
+
+
+def test_scores_align_with_texts(scored):
+    texts = pd.Series(['好', None, '很好', '坏', np.nan, '好'], index=[10, 11, 12, 13, 14, 15])
+    scores = SentimentEngine().score(texts)
+
+    np.testing.assert_array_equal(scores, [0.1, np.nan, 0.2, np.nan, np.nan, 0.1])
+    # 相同内容只打分一次
+    assert sorted(scored[0]) == ['坏', '好', '很好']
+
+
+def test_cache_reused_by_content_hash(tmp_path, scored):
+    cache_path = tmp_path / 'sentiment_scores.npz'
+    first = SentimentEngine(cache_path=cache_path).score(pd.Series(['好', '很好', '坏']))
+    assert cache_path.exists()
+
+    second = SentimentEngine(cache_path=cache_path).score(pd.Series(['很好', '新消息', '好', '坏', '很好']))
+    np.testing.assert_array_equal(first, [0.1, 0.2, np.nan])
+    np.testing.assert_array_equal(second, [0.2, 0.3, 0.1, np.nan, 0.2])
+    # 第二次只为缓存中没有的内容打分（无法打分的结果也被缓存）
+    assert [sorted(texts) for texts in scored] == [['坏', '好', '很好'], ['新消息']]
+
+    SentimentEngine(cache_path=cache_path).score(pd.Series(['新消息', '好']))
+    assert len(scored) == 2
+
+
+def test_progress_registered_and_removed(scored):
+    SentimentEngine(progress_key='contact-1').score(pd.Series(['好', '很好']))
+    assert SentimentProgress.get('contact-1') == {'status': 'done', 'done': 2, 'total': 2}
+
+    SentimentProgress.remove('contact-1')
+    assert SentimentProgress.get('contact-1')['status'] == 'idle'
+    assert 'contact-1' not in SentimentProgress._progress
@@ -0,0 +1,53 @@
+"""图表序列截取和 LTTB 降采样的测试"""
+import numpy as np
+import pytest
+
+from utils.analyzers.series import SeriesConfig, SeriesQuery, lttb_indices, parse_series
+
+# 有缺失日期（没有消息的日期不出现在每日统计中）的序列
+DAYS = [2, 3, 8, 17, 25, 30, 34, 42, 46, 48, 51, 59]
+COUNTS = [9, 3, 9, 7, 9, 2, 7, 9, 1, 4, 6, 1]
+
+
+def _daily_stats():
+    dates = [str(np.datetime64('2020-01-01') + day) for day in DAYS]
+    return {
+        'daily_counts': dict(zip(dates, COUNTS)),
+        'daily_types': {'文本': dict(zip(dates, COUNTS))}
+    }
+
+
+def test_lttb_uses_timestamps_as_x():
+    x = np.array(DAYS) * 86400
+    assert lttb_indices(np.array(COUNTS), 5, x).tolist() == [0, 1, 4, 7, 11]
+    # 按下标计算时日期间隔被忽略，第 42 天的峰值被第 51 天的点取代
+    assert lttb_indices(np.array(COUNTS), 5).tolist() == [0, 1, 4, 10, 11]
+
+
+def test_lttb_with_evenly_spaced_x_matches_positions():
+    values = np.random.default_rng(0).integers(0, 100, 200)
+    x = np.datetime64('2020-01-01', 's').astype(np.int64) + np.arange(200) * 86400
+    np.testing.assert_array_equal(lttb_indices(values, 20, x), lttb_indices(values, 20))
+
+
+def test_max_points_keeps_peaks_across_gaps():
+    daily = SeriesQuery(max_points=5).apply_daily_stats(_daily_stats())
+    dates = [str(np.datetime64('2020-01-01') + DAYS[i]) for i in (0, 1, 4, 7, 11)]
+    assert list(daily['daily_counts']) == dates
+    assert daily['daily_types']['文本'] == daily['daily_counts']
+
+
+def test_parsed_payload_gives_same_result():
+    heatmap = {'data': [[date, count] for date, count in _daily_stats()['daily_counts'].items()], 'max': 9}
+    payload = {'daily_stats': _daily_stats(), 'heatmap': heatmap, 'total': 67}
+    parsed = parse_series(payload)
+    for query in (SeriesQuery(start='2020-01-05', end='2020-02-20'), SeriesQuery(granularity='week'),
+                  SeriesQuery(granularity='month', max_points=3), SeriesQuery(max_points=4)):
+        assert query.apply(parsed) == query.apply(payload)
+
+
+def test_max_points_is_clamped():
+    assert SeriesQuery.from_args({'max_points': '100000000'}).max_points == SeriesConfig.MAX_POINTS_LIMIT
+    assert SeriesQuery.from_args({'max_points': '50'}).max_points == 50
+    with pytest.raises(ValueError):
+        SeriesQuery.from_args({'max_points': '2'})
@@ -0,0 +1,63 @@
+"""会话划分的测试：空闲间隔阈值、按自然日划分和乱序输入"""
+import numpy as np
+import pytest
+
+from utils.analyzers.sessions import segment_sessions
+
+
+def _times(*values):
+    return np.array(values, dtype='datetime64[s]')
+
+
+def test_gap_equal_to_idle_gap_stays_in_session():
+    times = _times('2024-01-01T10:00:00', '2024-01-01T10:30:00',  # 恰好 1800 秒：同一会话
+                   '2024-01-01T11:00:01',  # 1801 秒：新会话
+                   '2024-01-01T11:10:00')
+    sessions = segment_sessions(times, np.array([1, 0, 0, 1]), idle_gap=1800)
+
+    assert len(sessions) == 2
+    np.testing.assert_array_equal(sessions.start, [0, 2])
+    np.testing.assert_array_equal(sessions.end, [1, 3])
+    np.testing.assert_array_equal(sessions.message_count, [2, 2])
+    np.testing.assert_array_equal(sessions.initiator, [1, 0])
+    np.testing.assert_array_equal(sessions.ender, [0, 1])
+    np.testing.assert_array_equal(sessions.duration, [1800.0, 599.0])
+    np.testing.assert_array_equal(sessions.start_time, times[[0, 2]].astype('datetime64[ns]'))
+    np.testing.assert_array_equal(sessions.end_time, times[[1, 3]].astype('datetime64[ns]'))
+
+
+@pytest.mark.parametrize('idle_gap, expected', [(59, 4), (60, 2), (119, 2), (120, 1)])
+def test_idle_gap_threshold(idle_gap, expected):
+    # 相邻间隔依次为 60、120、60 秒
+    times = _times('2024-01-01T10:00:00', '2024-01-01T10:01:00', '2024-01-01T10:03:00', '2024-01-01T10:04:00')
+    assert len(segment_sessions(times, np.zeros(4), idle_gap=idle_gap)) == expected
+
+
+def test_natural_day_ignores_gap_length():
+    times = _times('2024-01-01T00:00:00', '2024-01-01T23:59:59',  # 相隔将近一天：同一会话
+                   '2024-01-02T00:00:01')  # 相隔 2 秒但跨天：新会话
+    sessions = segment_sessions(times, np.array([0, 1, 1]))
+
+    np.testing.assert_array_equal(sessions.start, [0, 2])
+    np.testing.assert_array_equal(sessions.message_count, [2, 1])
+    np.testing.assert_array_equal(sessions.duration, [86399.0, 0.0])
+    # 同样的消息按空闲间隔划分时结果不同
+    assert len(segment_sessions(times, np.array([0, 1, 1]), idle_gap=3600)) == 2
+    assert len(segment_sessions(times, np.array([0, 1, 1]), idle_gap=86400)) == 1
+
+
+def test_unsorted_input_is_sorted_with_senders():
+    times = _times('2024-01-01T10:20:00', '2024-01-01T10:00:00', '2024-01-01T10:05:00')
+    sessions = segment_sessions(times, np.array([1, 0, 0]), idle_gap=600)
+
+    np.testing.assert_array_equal(sessions.message_count, [2, 1])
+    np.testing.assert_array_equal(sessions.initiator, [0, 1])
+    np.testing.assert_array_equal(sessions.ender, [0, 1])
+
+
+def test_empty_and_single_message():
+    assert len(segment_sessions(_times(), np.array([]), idle_gap=1800)) == 0
+
+    single = segment_sessions(_times('2024-01-01T10:00:00'), np.array([1]))
+    np.testing.assert_array_equal(single.message_count, [1])
+    np.testing.assert_array_equal(single.duration, [0.0])
@@ -0,0 +1,86 @@
+"""分词配置（编译后的自定义词典）与 jieba.load_userdict 一致性的测试"""
+import jieba
+import jieba.posseg
+import pytest
+
+from utils.analyzers.tokenizer_profile import TokenizerProfile
+
+# 1、2、3 列的行，词频为 0 的词，以及制表符分隔、多个空格、带 BOM 和空行等 load_userdict 的边界情况
+CUSTOM_DICT = (
+    '\ufeff鲸落 3 n\n'
+    '鲸落时\n'  # 省略词频：按已加入“鲸落”的词典计算
+    '云吸猫 20\n'
+    '打工人 100 n\n'
+    '干饭人\n'
+    '\n'
+    '小确幸  8 a\n'
+    '躺平\t50\tv\n'
+    '天安门广场 0\n'
+    'Python开发 12 nz\n'
+)
+TEXTS = [
+    '打工人周末都是干饭人，鲸落时想去天安门广场',
+    '云吸猫是一种小确幸，躺平\t50也不错',
+    '我们用Python开发了一个鲸落的网站',
+    '今天天气真好，一起去吃饭吧',
+]
+
+
+@pytest.fixture
+def dictionaries(tmp_path):
+    custom_dict = tmp_path / 'custom_dict.txt'
+    custom_dict.write_text(CUSTOM_DICT, encoding='utf-8')
+    reference = jieba.Tokenizer()
+    reference.load_userdict(str(custom_dict))
+    return custom_dict, reference
+
+
+def _profiled(custom_dict, cache_dir) -> jieba.Tokenizer:
+    tokenizer = jieba.Tokenizer()
+    TokenizerProfile(custom_dict, stop_words=None, cache_dir=cache_dir).apply(tokenizer)
+    return tokenizer
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_matches_load_userdict(dictionaries, tmp_path, cached):
+    custom_dict, reference = dictionaries
+    cache_dir = tmp_path / 'cache'
+    if cached:
+        _profiled(custom_dict, cache_dir)  # 第一次生成缓存，第二次读取缓存
+    tokenizer = _profiled(custom_dict, cache_dir)
+
+    assert tokenizer.FREQ == reference.FREQ
+    assert tokenizer.total == reference.total
+    assert tokenizer.user_word_tag_tab == reference.user_word_tag_tab
+    for text in TEXTS:
+        assert list(tokenizer.cut(text)) == list(reference.cut(text))
+        assert list(jieba.posseg.POSTokenizer(tokenizer).cut(text)) == \
+            list(jieba.posseg.POSTokenizer(reference).cut(text))
+
+
+def test_stop_words_loaded_when_tokenizer_already_initialized(dictionaries, tmp_path):
+    custom_dict, reference = dictionaries  # 已由 load_userdict 加载词典
+    stop_words = tmp_path / 'stop_words.txt'
+    stop_words.write_text('\ufeff的\n了\n\n吧\n', encoding='utf-8')
+    profile = TokenizerProfile(custom_dict, stop_words, cache_dir=tmp_path / 'cache')
+
+    profile.apply(reference)
+    assert profile.stop_words == {'的', '了', '吧'}
+    assert not (tmp_path / 'cache').exists()  # 分词器已加载词典，不再编译
+
+
+def test_segment_chunk_filters_stop_words_after_external_initialize(tmp_path, monkeypatch):
+    """jieba.dt 已由其他代码加载词典时，分词仍去掉停用词"""
+    from utils.analyzers import tokenizer_profile
+    from utils.analyzers.tokens import _segment_chunk, load_jieba
+
+    monkeypatch.chdir(tmp_path)
+    load_jieba()
+    tokenizer_profile.default_profile.cache_clear()
+    try:
+        words = [word for words, _ in _segment_chunk(['今天的饭真的好吃了吧']) for word in words]
+        stop_words = tokenizer_profile.default_profile().stop_words
+        assert words and not set(words) & stop_words
+        assert {'的', '了', '吧'} <= stop_words
+    finally:
+        tokenizer_profile.default_profile.cache_clear()
@@ -0,0 +1,41 @@
+"""分词缓存和关键词计算的测试"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.analyzers.tokens import SEPARATOR, TokenStore, Tokens, _segment_chunk, extract_tfidf, load_jieba
+
+TEXTS = pd.Series(['今天一起去吃饭吧', '哈哈', '好的', '周末加班真的很难过，明天想回家休息', '今天一起去吃饭吧'])
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """分词配置的缓存写入临时工作目录"""
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_tokenize_flattens_messages_in_order(tmp_path, cached):
+    store = TokenStore(tmp_path / 'tokens.parquet')
+    if cached:
+        store.warm(TEXTS)  # 第二次从 Parquet 缓存读取
+    tokens = store.tokenize(TEXTS)
+
+    expected_words, expected_flags = [], []
+    for words, flags in _segment_chunk(TEXTS.tolist()):
+        expected_words += list(words) + [SEPARATOR[0]]
+        expected_flags += list(flags) + [SEPARATOR[1]]
+    assert tokens.words.dtype == object
+    assert tokens.words.tolist() == expected_words[:-1]
+    assert tokens.flags.tolist() == expected_flags[:-1]
+
+
+def test_tfidf_scores_like_extract_tags():
+    """同样的分词结果下，计分规则与 jieba.analyse.extract_tags 一致"""
+    jieba = load_jieba()
+    import jieba.analyse
+
+    text = ' '.join(TEXTS) * 3
+    tokens = Tokens(np.array(list(jieba.cut(text)), dtype=object), np.empty(0, dtype=object))
+    expected = dict(jieba.analyse.extract_tags(text, topK=100, withWeight=True))
+    assert dict(extract_tfidf(tokens, topK=100)) == pytest.approx(expected)
@@ -1,12 +1,16 @@
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from functools import reduce
+from typing import Dict, List, Optional, Tuple
 import pandas as pd
 import numpy as np
-import jieba
-import jieba.analyse
-from snownlp import SnowNLP
-import json
-from pathlib import Path
+
+from utils.analyzers.aggregates import GAP_BINS, GAP_LABELS, ChatAggregates, gap_bin_counts
+from utils.analyzers.batch import map_chunks
+from utils.analyzers.keyword_matcher import get_tag_matcher, load_tag_dictionaries
+from utils.analyzers.sentiment import SentimentEngine
+from utils.analyzers.sessions import Sessions, segment_sessions
+from utils.analyzers.tokens import TokenStore, Tokens, extract_textrank, extract_tfidf
+from utils.message_table import MessageTable
 
 
 @dataclass
@@ -15,27 +19,38 @@ class AnalysisConfig:
     RESPONSE_TIME_THRESHOLD: int = 3600  # 响应时间阈值(秒)
     KEYWORDS_TOP_K: int = 20  # 关键词提取数量
     SENTIMENT_THRESHOLDS: Tuple[float, float] = (0.4, 0.6)  # 情感分析阈值
+    SESSION_IDLE_GAP: Optional[float] = None  # 会话空闲间隔(秒)，None 表示按自然日划分
 
 
 class ChatAnalyzer:
     def __init__(self, chat_data: Dict):
         """初始化分析器
         Args:
-            chat_data: 包含用户信息和消息数据的字典
+            chat_data: 包含用户信息、消息和基础统计的字典，消息为 MessageTable
+                       （也接受 DataFrame 或逐行字典，会先转换为消息表）
         """
         self.users = chat_data['users']
-        self.messages_df = pd.DataFrame(chat_data['messages'])
+        # 与消息表共享列缓冲区，派生列只加在分析器自己的 DataFrame 上
+        self.messages_df = MessageTable.of(chat_data['messages']).to_frame()
         self.stats = chat_data['stats']
+        self._gap_arrays = None
+        self._aggregates = None
+        self._tokens = None
         self._preprocess_data()
 
     def _preprocess_data(self) -> None:
-        """预处理数据"""
-        # 确保时间列为datetime类型
-        self.messages_df['CreateTime'] = pd.to_datetime(self.messages_df['CreateTime'])
+        """预处理数据，一次性生成各项分析共用的派生列"""
+        df = self.messages_df
+        create_time = df['CreateTime'].to_numpy(dtype='datetime64[ns]')
         # 添加小时列用于时间分析
-        self.messages_df['hour'] = self.messages_df['CreateTime'].dt.hour
-        # 添加日期列用于日期分析
-        self.messages_df['date'] = self.messages_df['CreateTime'].dt.date
+        df['hour'] = df['CreateTime'].dt.hour
+        # 添加日期、星期、月份列用于日期分析
+        df['date_str'] = np.datetime_as_string(create_time.astype('datetime64[D]'))
+        df['weekday'] = df['CreateTime'].dt.day_name()
+        df['month'] = np.datetime_as_string(create_time.astype('datetime64[M]'))
+        # 与上一条消息的时间间隔(秒)及发送方是否切换
+        df['gap_seconds'] = df['CreateTime'].diff().dt.total_seconds()
+        df['sender_switch'] = df['is_sender'] != df['is_sender'].shift()
 
     @property
     def text_messages(self) -> pd.DataFrame:
@@ -44,79 +59,46 @@ class ChatAnalyzer:
 
     def analyze_basic_stats(self) -> Dict:
         """基础统计分析"""
-        message_stats = self._analyze_message_types()
-        time_stats = self._analyze_time_distribution()
-        daily_stats = self._analyze_daily_stats()
-
-        return {
-            'message_stats': message_stats,
-            'time_stats': time_stats,
-            'daily_stats': daily_stats
-        }
-
-    def _analyze_message_types(self) -> Dict:
-        """分析消息类型分布"""
-        type_counts = self.messages_df['type_name'].value_counts()
-        return {
-            'type_counts': type_counts.to_dict(),
-            'type_percentages': (type_counts.div(len(self.messages_df)) * 100).round(2).to_dict()
-        }
-
-    def _analyze_time_distribution(self) -> Dict:
-        """分析时间分布"""
-        return {
-            'hourly_counts': self.messages_df['hour'].value_counts().sort_index().to_dict(),
-            'weekday_counts': self.messages_df['CreateTime'].dt.day_name().value_counts().to_dict(),
-            'monthly_counts': self.messages_df['CreateTime'].dt.to_period('M').astype(
-                str).value_counts().sort_index().to_dict()
-        }
+        return self.aggregates.basic_results()
 
-    def _analyze_daily_stats(self) -> Dict:
-        """分析每日统计"""
-        # 将日期转换为字符串格式
-        self.messages_df['date_str'] = self.messages_df['date'].astype(str)
-
-        # 使用字符串格式的日期进行分组
-        daily_counts = self.messages_df.groupby('date_str').size()
-        daily_types = self.messages_df.groupby(['date_str', 'type_name']).size().unstack(fill_value=0)
-
-        return {
-            'daily_counts': daily_counts.to_dict(),
-            'daily_types': daily_types.to_dict()
-        }
+    def analyze_all(self) -> Dict:
+        """基于同一份预处理数据完成基础分析和交互分析"""
+        return self.aggregates.to_results()
 
     def analyze_interactive_patterns(self) -> Dict:
         """交互模式分析"""
-        return {
-            'chat_pattern': {'conversation_gaps': self._analyze_conversation_gaps()},
-            'response_time': {'response_distribution': self._analyze_response_distribution()},
-            'heatmap': self._analyze_chat_heatmap(),
-            'interaction': self._analyze_chat_interaction()
-        }
+        return self.aggregates.interactive_results()
+
+    @property
+    def aggregates(self) -> ChatAggregates:
+        """基础分析和交互分析的可合并中间结果，可与之后导入的消息的结果合并"""
+        if self._aggregates is None:
+            df = self.messages_df
+            gaps, _, _ = self._get_gap_arrays()
+            self._aggregates = ChatAggregates.from_frame(
+                df, gaps,
+                response_times=np.asarray(self._get_response_times()),
+                response_mask=self._get_response_mask().to_numpy(),
+                sessions=self.analyze_sessions(AnalysisConfig.SESSION_IDLE_GAP),
+                session_idle_gap=AnalysisConfig.SESSION_IDLE_GAP
+            )
+        return self._aggregates
+
+    def _get_response_mask(self) -> pd.Series:
+        """发送方切换且距上一条消息不超过阈值的消息，即被视为“响应”的消息"""
+        df = self.messages_df
+        return df['sender_switch'] & (df['gap_seconds'] < AnalysisConfig.RESPONSE_TIME_THRESHOLD)
 
     def _get_response_times(self) -> List[float]:
         """获取响应时间列表"""
         df = self.messages_df
-        mask = (df['is_sender'] != df['is_sender'].shift()) & \
-               (df['CreateTime'].diff().dt.total_seconds() < AnalysisConfig.RESPONSE_TIME_THRESHOLD)
-        return df[mask]['CreateTime'].diff().dt.total_seconds().dropna().tolist()
+        return df[self._get_response_mask()]['CreateTime'].diff().dt.total_seconds().dropna().tolist()
 
     def _calculate_avg_response_time(self):
         """计算平均响应时间"""
         response_times = self._get_response_times()
         return np.mean(response_times) if response_times else 0
 
-    def _analyze_response_distribution(self) -> Dict:
-        """分析响应时间分布"""
-        response_times = pd.Series(self._get_response_times())
-        bins = [0, 60, 300, 900, 1800, 3600]
-        labels = ['1分钟内', '5分钟内', '15分钟内', '30分钟内', '1小时内']
-
-        if not response_times.empty:
-            distribution = pd.cut(response_times, bins=bins, labels=labels, right=False).value_counts()
-            return distribution.to_dict()
-        return {label: 0 for label in labels}
-
     def _analyze_interaction_frequency(self):
         """分析互动频率"""
         df = self.messages_df
@@ -126,177 +108,125 @@ class ChatAnalyzer:
             'by_month': df.groupby(df['CreateTime'].dt.month).size().to_dict()
         }
 
-    def _analyze_chat_interaction(self):
-        """分析聊天互动情况"""
-        df = self.messages_df
-
-        # 按日期分组消息
-        df['date'] = df['CreateTime'].dt.date
-        daily_messages = df.groupby('date').agg(list).reset_index()
-
-        # 统计发起和结束对话的次数
-        initiator_stats = {'sender': 0, 'receiver': 0}
-        ender_stats = {'sender': 0, 'receiver': 0}
-
-        for _, day in daily_messages.iterrows():
-            messages = day['is_sender']
-            if len(messages) > 0:
-                # 判断对话发起者
-                first_msg = messages[0]
-                initiator_stats['sender' if first_msg == 1 else 'receiver'] += 1
-
-                # 判断对话结束者
-                last_msg = messages[-1]
-                ender_stats['sender' if last_msg == 1 else 'receiver'] += 1
+    def analyze_sessions(self, idle_gap: Optional[float] = None) -> Sessions:
+        """划分会话
+        Args:
+            idle_gap: 空闲间隔（秒），None 表示按自然日划分
+        """
+        return segment_sessions(self.messages_df['CreateTime'].to_numpy(),
+                                self.messages_df['is_sender'].to_numpy(),
+                                idle_gap=idle_gap)
 
-        total_days = len(daily_messages)
+    def _get_gap_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """按时间排序后的相邻消息间隔(小时)，以及每个间隔后一条消息的发送方和年份
 
-        return {
-            'initiator': {
-                'sender_percent': round(initiator_stats['sender'] / total_days * 100, 1),
-                'receiver_percent': round(initiator_stats['receiver'] / total_days * 100, 1),
-                'sender_count': initiator_stats['sender'],
-                'receiver_count': initiator_stats['receiver']
-            },
-            'ender': {
-                'sender_percent': round(ender_stats['sender'] / total_days * 100, 1),
-                'receiver_percent': round(ender_stats['receiver'] / total_days * 100, 1),
-                'sender_count': ender_stats['sender'],
-                'receiver_count': ender_stats['receiver']
+        结果会被缓存，按发送方、年份或自定义区间统计时无需再次遍历数据。
+        """
+        if self._gap_arrays is None:
+            times = self.messages_df['CreateTime'].to_numpy(dtype='datetime64[ns]')
+            is_sender = self.messages_df['is_sender'].to_numpy()
+            if len(times) > 1 and (np.diff(times) < np.timedelta64(0)).any():
+                order = np.argsort(times, kind='stable')
+                times, is_sender = times[order], is_sender[order]
+
+            gaps = np.diff(times).astype(np.int64) / 1e9 / 3600
+            senders = is_sender[1:].astype(bool)
+            years = times[1:].astype('datetime64[Y]').astype(np.int64) + 1970
+            self._gap_arrays = (gaps, senders, years)
+        return self._gap_arrays
+
+    def analyze_gap_distribution(self, by: Optional[str] = None,
+                                 bins: Optional[List[float]] = None,
+                                 labels: Optional[List[str]] = None) -> Dict:
+        """分析对话间隔分布
+        Args:
+            by: 分组方式，None 表示不分组，'sender' 按发送方分组，'year' 按年份分组
+            bins: 区间边界（小时），默认使用 GAP_BINS
+            labels: 区间标签，默认使用 GAP_LABELS 或根据边界生成
+        """
+        if bins is None:
+            bins, labels = GAP_BINS, labels or GAP_LABELS
+        elif labels is None:
+            labels = [f'{low:g}小时以上' if np.isinf(high) else f'{low:g}-{high:g}小时'
+                      for low, high in zip(bins[:-1], bins[1:])]
+        if len(labels) != len(bins) - 1:
+            raise ValueError('区间标签数量必须比区间边界少一个')
+
+        gaps, senders, years = self._get_gap_arrays()
+
+        if by is None:
+            return self._summarize_gaps(gaps, bins, labels)
+        if by == 'sender':
+            return {
+                'sender': self._summarize_gaps(gaps[senders], bins, labels),
+                'receiver': self._summarize_gaps(gaps[~senders], bins, labels)
             }
-        }
-
-    def _analyze_conversation_gaps(self):
-        """分析对话间隔"""
-        df = self.messages_df
+        if by == 'year':
+            return {str(year): self._summarize_gaps(gaps[years == year], bins, labels)
+                    for year in np.unique(years)}
+        raise ValueError(f'不支持的分组方式: {by}')
 
-        # 按时间排序
-        df = df.sort_values('CreateTime')
-
-        # 计算时间差（小时）
-        time_diffs = []
-        for i in range(1, len(df)):
-            time_diff = (df.iloc[i]['CreateTime'] - df.iloc[i - 1]['CreateTime']).total_seconds() / 3600
-            time_diffs.append(time_diff)
-
-        if time_diffs:
-            # 定义时间间隔的边界（小时）
-            bins = [0, 1, 2, 3, 4, 5, 6, 12, 24, float('inf')]
-            labels = ['1小时内', '1-2小时', '2-3小时', '3-4小时', '4-5小时',
-                      '5-6小时', '6-12小时', '12-24小时', '24小时以上']
-
-            # 使用 pandas 的 cut 函数进行分类
-            gap_series = pd.Series(time_diffs)
-            gap_categories = pd.cut(gap_series,
-                                    bins=bins,
-                                    labels=labels,
-                                    include_lowest=True)
-
-            distribution = gap_categories.value_counts().to_dict()
-
-            # 确保所有类别都存在
-            all_categories = {label: 0 for label in labels}
-            all_categories.update(distribution)
-            distribution = all_categories
-
-            # 计算平均间隔和最大间隔（小时）
-            avg_gap = np.mean(time_diffs)
-            max_gap = max(time_diffs)
-        else:
-            distribution = {label: 0 for label in
-                            ['1小时内', '1-2小时', '2-3小时', '3-4小时', '4-5小时', '5-6小时', '6-12小时', '12-24小时',
-                             '24小时以上']}
-            avg_gap = 0
-            max_gap = 0
+    @staticmethod
+    def _summarize_gaps(gaps: np.ndarray, bins: List[float], labels: List[str]) -> Dict:
+        """统计一组间隔的数量、平均值、最大值和区间分布"""
+        counts = gap_bin_counts(gaps, bins)
 
         return {
-            'count': len(time_diffs),
-            'avg_gap': round(avg_gap, 1),
-            'max_gap': round(max_gap, 1),
-            'distribution': distribution
+            'count': len(gaps),
+            'avg_gap': round(float(gaps.mean()), 1) if len(gaps) else 0,
+            'max_gap': round(float(gaps.max()), 1) if len(gaps) else 0,
+            'distribution': dict(zip(labels, counts.tolist()))
         }
 
-    def _analyze_chat_heatmap(self):
-        """分析聊天热力图数据"""
-        df = self.messages_df
-
-        # 确保 CreateTime 是 datetime 类型
-        df['CreateTime'] = pd.to_datetime(df['CreateTime'])
-
-        # 按日期统计消息数量（使用日期字符串作为索引）
-        daily_counts = df.groupby(df['CreateTime'].dt.strftime('%Y-%m-%d')).size()
-
-        # 生成热力图数据
-        heatmap_data = []
-        max_count = 0
-
-        # 生成完整的日期范围
-        start_date = df['CreateTime'].min().date()
-        end_date = df['CreateTime'].max().date()
-        date_range = pd.date_range(start_date, end_date)
-
-        # 对每一天生成数据，包括没有消息的日期
-        for date in date_range:
-            date_str = date.strftime('%Y-%m-%d')
-            count = daily_counts.get(date_str, 0)  # 如果没有消息，返回0
-            heatmap_data.append([date_str, int(count)])
-            max_count = max(max_count, count)
-
-        # 定义消息数量的区间（使用红色系）
-        max_daily = max_count
-        pieces = [
-            {'min': 0, 'max': max_daily * 0.1, 'label': f'0-{int(max_daily * 0.1)}', 'color': '#FFEBEE'},  # 最浅红
-            {'min': max_daily * 0.1, 'max': max_daily * 0.3, 'label': f'{int(max_daily * 0.1)}-{int(max_daily * 0.3)}',
-             'color': '#FFCDD2'},  # 浅红
-            {'min': max_daily * 0.3, 'max': max_daily * 0.5, 'label': f'{int(max_daily * 0.3)}-{int(max_daily * 0.5)}',
-             'color': '#EF9A9A'},  # 中红
-            {'min': max_daily * 0.5, 'max': max_daily * 0.7, 'label': f'{int(max_daily * 0.5)}-{int(max_daily * 0.7)}',
-             'color': '#E57373'},  # 深红
-            {'min': max_daily * 0.7, 'label': f'{int(max_daily * 0.7)}+', 'color': '#F44336'}  # 最深红
-        ]
+    def _get_tokens(self, token_store: Optional[TokenStore] = None) -> Tokens:
+        """获取文本消息的分词结果，同一分析器内只分词一次"""
+        if self._tokens is None:
+            self._tokens = (token_store or TokenStore()).tokenize(self.text_messages['msg'])
+        return self._tokens
 
+    def analyze_semantic_content(self, token_store: Optional[TokenStore] = None,
+                                 sentiment_engine: Optional[SentimentEngine] = None) -> Dict:
+        """语义内容分析"""
         return {
-            'data': heatmap_data,
-            'max_count': max_count,
-            'date_range': [start_date.strftime('%Y-%m-%d'),
-                           end_date.strftime('%Y-%m-%d')],
-            'pieces': pieces
+            'keywords': self.analyze_keywords(token_store),
+            'topics': self.analyze_topics(token_store),
+            'sentiment': self._analyze_sentiment(self.text_messages, engine=sentiment_engine)
         }
 
-    def analyze_semantic_content(self) -> Dict:
-        """语义内容分析"""
-        text = ' '.join(self.text_messages['msg'].fillna(''))
+    def analyze_keywords(self, token_store: Optional[TokenStore] = None) -> Dict:
+        """关键词分析"""
+        tokens = self._get_tokens(token_store)
         return {
-            'keywords': {
-                'tfidf': self._extract_keywords(text, 'tfidf'),
-                'textrank': self._extract_keywords(text, 'textrank')
-            },
-            'topics': self._analyze_topics(text),
-            'sentiment': self._analyze_sentiment(self.text_messages)
+            'tfidf': self._extract_keywords(tokens, 'tfidf'),
+            'textrank': self._extract_keywords(tokens, 'textrank')
         }
 
+    def analyze_topics(self, token_store: Optional[TokenStore] = None) -> Dict:
+        """话题分析"""
+        return self._analyze_topics(self._get_tokens(token_store))
+
     @staticmethod
-    def _extract_keywords(text: str, method: str = 'tfidf', topK: int = AnalysisConfig.KEYWORDS_TOP_K) -> List[
+    def _extract_keywords(tokens: Tokens, method: str = 'tfidf', topK: int = AnalysisConfig.KEYWORDS_TOP_K) -> List[
         Tuple[str, float]]:
         """提取关键词
         Args:
-            text: 文本内容
+            tokens: 分词结果
             method: 提取方法 ('tfidf' 或 'textrank')
             topK: 返回前K个关键词
         """
-        extractor = jieba.analyse.extract_tags if method == 'tfidf' else jieba.analyse.textrank
-        return extractor(text, topK=topK, withWeight=True)
+        extractor = extract_tfidf if method == 'tfidf' else extract_textrank
+        return extractor(tokens, topK=topK)
 
     @staticmethod
-    def _analyze_topics(text):
+    def _analyze_topics(tokens: Tokens):
         """话题分析"""
-        # 使用 jieba 提取关键词
-        keywords = jieba.analyse.extract_tags(text, topK=100, withWeight=True)
+        # 使用 TF-IDF 提取关键词
+        keywords = extract_tfidf(tokens, topK=20)  # 只取前20个关键词
 
         # 处理关键词和权重
         processed_keywords = []
         frequencies = []
-        for word, weight in keywords[:20]:  # 只取前20个关键词
+        for word, weight in keywords:
             processed_keywords.append(word)
             frequencies.append(round(weight * 100, 1))  # 将权重转换为百分比
 
@@ -307,16 +237,18 @@ class ChatAnalyzer:
         }
 
     @staticmethod
-    def _analyze_sentiment(messages: pd.DataFrame) -> Dict[str, float]:
-        """情感分析"""
-        sentiments = []
-        for text in messages['msg'].dropna():
-            try:
-                sentiments.append(SnowNLP(text).sentiments)
-            except:
-                continue
-
-        if not sentiments:
+    def _analyze_sentiment(messages: pd.DataFrame,
+                           engine: Optional[SentimentEngine] = None) -> Dict[str, float]:
+        """情感分析
+        Args:
+            messages: 文本消息
+            engine: 情感打分引擎，None 表示不使用缓存的默认引擎
+        """
+        engine = engine or SentimentEngine()
+        sentiments = engine.score(messages['msg'])
+        sentiments = sentiments[~np.isnan(sentiments)]
+
+        if not len(sentiments):
             return {'positive': 0, 'neutral': 0, 'negative': 0}
 
         sentiments = pd.Series(sentiments)
@@ -329,58 +261,73 @@ class ChatAnalyzer:
         return {k: round(v / total * 100, 1) for k, v in counts.items()}
 
     @staticmethod
-    def _analyze_tag_trends(messages_df: pd.DataFrame, granularity: str = 'month') -> Dict:
-        """分析标签趋势"""
-        # 加载话题和情感关键词映射
-        base_dir = Path(__file__).parent.parent
-        with open(base_dir / 'utils/text_analysis_data/basic_topics.json', 'r', encoding='utf-8') as f:
-            basic_topics = json.load(f)
-        with open(base_dir / 'utils/text_analysis_data/emotion_topics.json', 'r', encoding='utf-8') as f:
-            emotion_topics = json.load(f)
+    def _analyze_tag_trends(messages_df: pd.DataFrame, granularity: str = 'month',
+                            mode: str = 'presence') -> Dict:
+        """分析标签趋势
+        Args:
+            messages_df: 消息数据
+            granularity: 时间粒度 ('month'、'week' 或 'day')
+            mode: 'presence' 记录每个时间段是否出现(0/1)，'count' 记录关键词命中次数
+        """
+        if mode not in ('presence', 'count'):
+            raise ValueError(f'不支持的统计方式: {mode}')
 
         # 设置重采样频率
-        freq_map = {'month': 'M', 'week': 'W', 'day': 'D'}
+        freq_map = {'month': 'ME', 'week': 'W', 'day': 'D'}
         date_format_map = {'month': '%Y-%m', 'week': '%Y-%m-%d', 'day': '%Y-%m-%d'}
+        freq = freq_map[granularity]
+
+        times = pd.DatetimeIndex(pd.to_datetime(messages_df['CreateTime']))
+        is_text = (messages_df['type_name'] == '文本').to_numpy()
+
+        # 一次扫描得到每条文本消息在各话题/情感上的命中次数
+        matcher = get_tag_matcher()
+        texts = messages_df.loc[is_text, 'msg'].fillna('').astype(str)
+        counts = matcher.count(texts)
+
+        # 按时间粒度汇总，时间段覆盖全部消息的起止范围
+        buckets = pd.Series(0, index=times).resample(freq).size().index
+        if mode == 'presence':
+            # 每条消息压缩为一个命中位掩码，各时间段按位或，再展开为各分组是否出现
+            masks = pd.Series(matcher.bitmasks(counts), index=times[is_text])
+            bucket_masks = (masks.resample(freq).agg(np.bitwise_or.reduce)
+                            .reindex(buckets, fill_value=0).to_numpy(dtype=np.uint64))
+            bits = np.arange(len(matcher.group_names), dtype=np.uint64)
+            per_bucket = pd.DataFrame(((bucket_masks[:, None] >> bits) & np.uint64(1)).astype(int),
+                                      index=buckets, columns=matcher.group_names)
+        else:
+            per_bucket = (pd.DataFrame(counts, index=times[is_text], columns=matcher.group_names)
+                          .resample(freq).sum().reindex(buckets, fill_value=0))
 
-        # 确保 CreateTime 是 datetime 类型并设置为索引
-        messages_df = messages_df.copy()
-        messages_df['CreateTime'] = pd.to_datetime(messages_df['CreateTime'])
-        messages_df.set_index('CreateTime', inplace=True)
-
-        def check_keywords(text: str, key_words: List[str]) -> bool:
-            """检查文本中是否包含任意关键词"""
-            return any(keyword in text for keyword in key_words)
-
-        results = {'times': [], 'basicTopics': {}, 'emotions': {}}
+        results = {'times': [t.strftime(date_format_map[granularity]) for t in buckets]}
+        for name, dictionary in load_tag_dictionaries().items():
+            results[name] = {group: per_bucket[f'{name}/{group}'].tolist() for group in dictionary}
+        return results
 
-        # 初始化话题和情感的列表
-        for topic in basic_topics:
-            results['basicTopics'][topic] = []
-        for emotion in emotion_topics:
-            results['emotions'][emotion] = []
 
-        # 按时间粒度重采样并分析
-        resampled = messages_df.resample(freq_map[granularity])
-        for name, group in resampled:
-            results['times'].append(name.strftime(date_format_map[granularity]))  # type: ignore
+def _aggregate_shards(shards: List[MessageTable]) -> List[ChatAggregates]:
+    """在工作进程中计算各时间分片的中间结果"""
+    return [ChatAnalyzer({'users': {}, 'messages': shard, 'stats': {}}).aggregates for shard in shards]
 
-            # 获取该时间段的文本消息
-            text_messages = group[group['type_name'] == '文本']['msg'].astype(str).fillna('')
-            text_list = text_messages.tolist()  # 转换为列表
 
-            # 统计基础话题
-            for topic, keywords in basic_topics.items():
-                # 检查该时间段内的所有消息是否包含话题关键词
-                has_topic = any(check_keywords(msg, keywords) for msg in text_list)
-                results['basicTopics'][topic].append(1 if has_topic else 0)
+def aggregate_messages(messages: MessageTable, shard_size: int = 500_000,
+                       max_workers: Optional[int] = None) -> ChatAggregates:
+    """将按时间排序的消息切分为时间分片，在进程池中分别计算中间结果后按顺序合并
+    Args:
+        messages: 按时间排序的消息
+        shard_size: 每个分片的消息数，消息不多于该值时直接在当前进程计算
+        max_workers: 进程池大小，None 表示使用 CPU 核数
+    """
+    messages = MessageTable.of(messages).select(['CreateTime', 'is_sender', 'type_name'])
+    shards = [messages.slice(start, start + shard_size) for start in range(0, len(messages), shard_size)]
+    parts = map_chunks(_aggregate_shards, shards, chunk_size=1, max_workers=max_workers)
+    return reduce(ChatAggregates.merge, parts, ChatAggregates(session_idle_gap=AnalysisConfig.SESSION_IDLE_GAP))
 
-            # 统计情感态度
-            for emotion, keywords in emotion_topics.items():
-                # 检查该时间段内的所有消息是否包含情感关键词
-                has_emotion = any(check_keywords(msg, keywords) for msg in text_list)
-                results['emotions'][emotion].append(1 if has_emotion else 0)
 
-        return results
+def analyze_chat(chat_data):
+    """基础分析与交互分析的合并入口函数，只构建一次分析器"""
+    analyzer = ChatAnalyzer(chat_data)
+    return analyzer.analyze_all()
 
 
 def analyze_basic_stats(chat_data):
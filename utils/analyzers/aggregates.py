@@ -0,0 +1,468 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import json
+import numpy as np
+import pandas as pd
+
+# 对话间隔的区间边界（小时）及标签
+GAP_BINS = [0, 1, 2, 3, 4, 5, 6, 12, 24, float('inf')]
+GAP_LABELS = ['1小时内', '1-2小时', '2-3小时', '3-4小时', '4-5小时',
+              '5-6小时', '6-12小时', '12-24小时', '24小时以上']
+
+# 响应时间的区间边界（秒）及标签
+RESPONSE_BINS = [0, 60, 300, 900, 1800, 3600]
+RESPONSE_LABELS = ['1分钟内', '5分钟内', '15分钟内', '30分钟内', '1小时内']
+
+NS_PER_SECOND = 10 ** 9
+
+# 以 npz 数组保存的计数向量
+COUNT_VECTORS = ('type_counts', 'hourly_counts', 'weekday_counts', 'monthly_counts', 'daily_counts')
+# 以 JSON 头保存的标量
+HEADER_FIELDS = ('session_idle_gap', 'session_count', 'first_session', 'last_session', 'message_count',
+                 'first_time', 'last_time', 'first_sender', 'last_sender',
+                 'first_response_time', 'last_response_time')
+
+
+def gap_bin_counts(gaps: np.ndarray, bins: Sequence[float] = GAP_BINS) -> np.ndarray:
+    """按区间统计间隔数量，与 pd.cut(include_lowest=True) 一致：左开右闭，第一个区间包含左端点"""
+    gaps = np.asarray(gaps, dtype=float)
+    positions = np.searchsorted(bins, gaps, side='left') - 1
+    positions[gaps == bins[0]] = 0
+    in_range = (positions >= 0) & (positions < len(bins) - 1)
+    return np.bincount(positions[in_range], minlength=len(bins) - 1)
+
+
+def _day(timestamp_ns: int) -> np.datetime64:
+    return np.datetime64(timestamp_ns, 'ns').astype('datetime64[D]')
+
+
+@dataclass
+class CountVector:
+    """按键计数，键按升序保存，合并时按键相加"""
+    keys: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=str))
+    counts: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+
+    @classmethod
+    def from_values(cls, values) -> 'CountVector':
+        """统计每个取值出现的次数"""
+        return cls.from_counts(pd.Series(values).value_counts(sort=False))
+
+    @classmethod
+    def from_counts(cls, counts: pd.Series) -> 'CountVector':
+        """由 键 -> 次数 的序列构建"""
+        counts = counts.sort_index()
+        return cls(counts.index.to_numpy(), counts.to_numpy(dtype=np.int64))
+
+    def merge(self, other: 'CountVector') -> 'CountVector':
+        if not len(other.keys):
+            return self
+        if not len(self.keys):
+            return other
+        keys, inverse = np.unique(np.concatenate([self.keys, other.keys]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([self.counts, other.counts]), minlength=len(keys))
+        return CountVector(keys, counts.astype(np.int64))
+
+    def reindex(self, keys: np.ndarray) -> np.ndarray:
+        """按给定的键取计数，不存在的键计为0"""
+        return pd.Series(self.counts, index=self.keys).reindex(keys, fill_value=0).to_numpy()
+
+    def to_dict(self, by_count: bool = False) -> Dict:
+        """转换为字典
+        Args:
+            by_count: 是否按次数降序排列（次数相同按键升序），否则按键升序
+        """
+        order = np.argsort(-self.counts, kind='stable') if by_count else np.arange(len(self.keys))
+        return dict(zip(self.keys[order].tolist(), self.counts[order].tolist()))
+
+    def to_arrays(self, name: str) -> Dict[str, np.ndarray]:
+        keys = self.keys.astype(str) if self.keys.dtype == object else self.keys
+        return {f'{name}.keys': keys, f'{name}.counts': self.counts}
+
+    @classmethod
+    def from_arrays(cls, arrays, name: str) -> 'CountVector':
+        return cls(arrays[f'{name}.keys'], arrays[f'{name}.counts'])
+
+
+@dataclass
+class FixedHistogram:
+    """固定区间的直方图，区间相同的直方图可以直接相加"""
+    edges: Sequence[float]
+    closed: str = 'right'  # 'right' 左开右闭（第一个区间包含左端点），'left' 左闭右开
+    counts: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        if self.counts is None:
+            self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+
+    def add(self, values) -> 'FixedHistogram':
+        """返回加入一组取值后的新直方图"""
+        if self.closed == 'right':
+            counts = gap_bin_counts(values, self.edges)
+        else:
+            values = np.asarray(values, dtype=float)
+            positions = np.searchsorted(self.edges, values, side='right') - 1
+            in_range = (positions >= 0) & (positions < len(self.edges) - 1)
+            counts = np.bincount(positions[in_range], minlength=len(self.edges) - 1)
+        return FixedHistogram(self.edges, self.closed, self.counts + counts)
+
+    def merge(self, other: 'FixedHistogram') -> 'FixedHistogram':
+        if list(self.edges) != list(other.edges) or self.closed != other.closed:
+            raise ValueError('区间不一致的直方图无法合并')
+        return FixedHistogram(self.edges, self.closed, self.counts + other.counts)
+
+
+@dataclass
+class RunningStats:
+    """数量、总和与最大值，合并后可得到平均值和最大值"""
+    count: int = 0
+    total: float = 0.0
+    maximum: float = 0.0
+
+    @classmethod
+    def from_values(cls, values) -> 'RunningStats':
+        if not len(values):
+            return cls()
+        return cls(len(values), float(np.sum(values)), float(np.max(values)))
+
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        if not other.count:
+            return self
+        if not self.count:
+            return other
+        return RunningStats(self.count + other.count, self.total + other.total,
+                            max(self.maximum, other.maximum))
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+@dataclass
+class ChatAggregates:
+    """基础分析和交互分析的可合并中间结果
+
+    由计数向量、固定区间直方图和累计统计组成。按时间先后切分的两段消息
+    （例如两个CSV文件或两个时间分片）各自计算的结果可以通过 merge 合并，
+    与对整段消息直接计算的结果一致，且满足结合律。首末消息、首末会话和
+    首末“响应”消息的信息用于处理两段之间的衔接。时间戳均为纳秒整数。
+    """
+    type_counts: CountVector = field(default_factory=CountVector)
+    hourly_counts: CountVector = field(default_factory=CountVector)
+    weekday_counts: CountVector = field(default_factory=CountVector)
+    monthly_counts: CountVector = field(default_factory=CountVector)
+    daily_counts: CountVector = field(default_factory=CountVector)
+    daily_types: Dict[str, CountVector] = field(default_factory=dict)
+
+    gap_stats: RunningStats = field(default_factory=RunningStats)  # 小时
+    gap_histogram: FixedHistogram = field(default_factory=lambda: FixedHistogram(GAP_BINS, 'right'))
+    response_histogram: FixedHistogram = field(default_factory=lambda: FixedHistogram(RESPONSE_BINS, 'left'))
+
+    session_idle_gap: Optional[float] = None  # 会话空闲间隔(秒)，None 表示按自然日划分
+    session_count: int = 0
+    initiator_counts: np.ndarray = field(default_factory=lambda: np.zeros(2, dtype=np.int64))  # [接收方, 发送方]
+    ender_counts: np.ndarray = field(default_factory=lambda: np.zeros(2, dtype=np.int64))
+    first_session: Optional[Dict] = None
+    last_session: Optional[Dict] = None
+
+    message_count: int = 0
+    first_time: Optional[int] = None
+    last_time: Optional[int] = None
+    first_sender: Optional[int] = None
+    last_sender: Optional[int] = None
+    first_response_time: Optional[int] = None
+    last_response_time: Optional[int] = None
+
+    # 由中间结果生成的分析数据：分析类型 -> 数据类型
+    RESULT_TYPES = {
+        'basic': ('message_stats', 'time_stats', 'daily_stats'),
+        'interactive': ('chat_pattern', 'response_time', 'heatmap', 'interaction')
+    }
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, gaps: np.ndarray, response_times: np.ndarray,
+                   response_mask: np.ndarray, sessions, session_idle_gap: Optional[float] = None
+                   ) -> 'ChatAggregates':
+        """由一段按时间排序、已完成预处理的消息计算中间结果
+        Args:
+            df: 含 type_name/hour/weekday/month/date_str/CreateTime/is_sender 列的消息
+            gaps: 相邻消息间隔（小时）
+            response_times: 响应时间（秒）
+            response_mask: 被视为“响应”的消息掩码
+            sessions: segment_sessions 的划分结果
+            session_idle_gap: 划分会话使用的空闲间隔
+        """
+        aggregates = cls(session_idle_gap=session_idle_gap)
+        if df.empty:
+            return aggregates
+
+        type_names = df['type_name'].astype(str)
+        aggregates.type_counts = CountVector.from_values(type_names)
+        aggregates.hourly_counts = CountVector.from_values(df['hour'])
+        aggregates.weekday_counts = CountVector.from_values(df['weekday'])
+        aggregates.monthly_counts = CountVector.from_values(df['month'])
+        aggregates.daily_counts = CountVector.from_values(df['date_str'])
+        daily_types = df.groupby([type_names, 'date_str']).size()
+        for type_name, counts in daily_types.groupby(level=0):
+            aggregates.daily_types[type_name] = CountVector.from_counts(counts.droplevel(0))
+
+        aggregates.gap_stats = RunningStats.from_values(gaps)
+        aggregates.gap_histogram = aggregates.gap_histogram.add(gaps)
+        aggregates.response_histogram = aggregates.response_histogram.add(response_times)
+
+        aggregates.session_count = len(sessions)
+        aggregates.initiator_counts = np.bincount(sessions.initiator.astype(np.int64), minlength=2)
+        aggregates.ender_counts = np.bincount(sessions.ender.astype(np.int64), minlength=2)
+        aggregates.first_session = cls._session_record(sessions, 0)
+        aggregates.last_session = cls._session_record(sessions, len(sessions) - 1)
+
+        times = df['CreateTime'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        is_sender = df['is_sender'].to_numpy()
+        response_times_ns = times[response_mask]
+        aggregates.message_count = len(df)
+        aggregates.first_time, aggregates.last_time = int(times[0]), int(times[-1])
+        aggregates.first_sender, aggregates.last_sender = int(is_sender[0]), int(is_sender[-1])
+        if len(response_times_ns):
+            aggregates.first_response_time = int(response_times_ns[0])
+            aggregates.last_response_time = int(response_times_ns[-1])
+        return aggregates
+
+    @staticmethod
+    def _session_record(sessions, i: int) -> Dict:
+        return {
+            'start': int(sessions.start_time[i].astype('datetime64[ns]').astype(np.int64)),
+            'end': int(sessions.end_time[i].astype('datetime64[ns]').astype(np.int64)),
+            'initiator': int(sessions.initiator[i]),
+            'ender': int(sessions.ender[i])
+        }
+
+    def _same_session(self, previous: Dict, following: Dict) -> bool:
+        if self.session_idle_gap is None:
+            return _day(previous['end']) == _day(following['start'])
+        return following['start'] - previous['end'] <= self.session_idle_gap * NS_PER_SECOND
+
+    def merge(self, other: 'ChatAggregates') -> 'ChatAggregates':
+        """合并时间上紧随其后的另一段消息的中间结果，返回新的对象"""
+        if other.message_count == 0:
+            return self
+        if self.message_count == 0:
+            return other
+        if other.first_time < self.last_time:
+            raise ValueError('只能合并时间上位于其后的消息段')
+        if other.session_idle_gap != self.session_idle_gap:
+            raise ValueError('会话划分方式不一致，无法合并')
+
+        merged = ChatAggregates(session_idle_gap=self.session_idle_gap)
+        for name in COUNT_VECTORS:
+            setattr(merged, name, getattr(self, name).merge(getattr(other, name)))
+        for type_name in sorted(set(self.daily_types) | set(other.daily_types)):
+            merged.daily_types[type_name] = (self.daily_types.get(type_name, CountVector())
+                                             .merge(other.daily_types.get(type_name, CountVector())))
+
+        # 两段之间的衔接间隔
+        boundary_gap = [(other.first_time - self.last_time) / NS_PER_SECOND / 3600]
+        merged.gap_stats = (self.gap_stats.merge(RunningStats.from_values(boundary_gap))
+                            .merge(other.gap_stats))
+        merged.gap_histogram = self.gap_histogram.merge(other.gap_histogram).add(boundary_gap)
+
+        # 衔接处的第一条消息可能成为新的“响应”，并与前后的响应消息构成新的响应时间
+        boundary_is_response = (self.last_sender != other.first_sender and
+                                other.first_time - self.last_time < 3600 * NS_PER_SECOND)
+        boundary_response = [other.first_time] if boundary_is_response else []
+        chain = [t for t in [self.last_response_time, *boundary_response, other.first_response_time]
+                 if t is not None]
+        merged.response_histogram = (self.response_histogram.merge(other.response_histogram)
+                                     .add(np.diff(chain) / NS_PER_SECOND))
+        responses = [t for t in [self.first_response_time, *boundary_response, other.first_response_time]
+                     if t is not None]
+        merged.first_response_time = responses[0] if responses else None
+        responses = [t for t in [self.last_response_time, *boundary_response, other.last_response_time]
+                     if t is not None]
+        merged.last_response_time = responses[-1] if responses else None
+
+        # 会话：衔接处的两个会话可能属于同一个会话
+        merged.session_count = self.session_count + other.session_count
+        merged.initiator_counts = self.initiator_counts + other.initiator_counts
+        merged.ender_counts = self.ender_counts + other.ender_counts
+        merged.first_session, merged.last_session = self.first_session, other.last_session
+        if self._same_session(self.last_session, other.first_session):
+            joined = {
+                'start': self.last_session['start'],
+                'end': other.first_session['end'],
+                'initiator': self.last_session['initiator'],
+                'ender': other.first_session['ender']
+            }
+            merged.session_count -= 1
+            merged.initiator_counts[other.first_session['initiator']] -= 1
+            merged.ender_counts[self.last_session['ender']] -= 1
+            if self.session_count == 1:
+                merged.first_session = joined
+            if other.session_count == 1:
+                merged.last_session = joined
+
+        merged.message_count = self.message_count + other.message_count
+        merged.first_time, merged.last_time = self.first_time, other.last_time
+        merged.first_sender, merged.last_sender = self.first_sender, other.last_sender
+        return merged
+
+    def render(self, analysis_type: str, data_type: str) -> Optional[Dict]:
+        """生成指定的分析数据，不属于基础分析或交互分析的数据返回 None"""
+        if data_type not in self.RESULT_TYPES.get(analysis_type, ()):
+            return None
+        return getattr(self, f'_{data_type}')()
+
+    def basic_results(self) -> Dict:
+        """生成基础分析结果"""
+        return {data_type: self.render('basic', data_type) for data_type in self.RESULT_TYPES['basic']}
+
+    def interactive_results(self) -> Dict:
+        """生成交互分析结果"""
+        return {data_type: self.render('interactive', data_type) for data_type in self.RESULT_TYPES['interactive']}
+
+    def to_results(self) -> Dict:
+        """生成基础分析和交互分析结果"""
+        return {
+            'basic': self.basic_results(),
+            'interactive': self.interactive_results()
+        }
+
+    def _message_stats(self) -> Dict:
+        type_counts = pd.Series(self.type_counts.to_dict(by_count=True), dtype=np.int64)
+        return {
+            'type_counts': type_counts.to_dict(),
+            'type_percentages': (type_counts.div(self.message_count) * 100).round(2).to_dict()
+        }
+
+    def _time_stats(self) -> Dict:
+        return {
+            'hourly_counts': self.hourly_counts.to_dict(),
+            'weekday_counts': self.weekday_counts.to_dict(by_count=True),
+            'monthly_counts': self.monthly_counts.to_dict()
+        }
+
+    def _daily_stats(self) -> Dict:
+        dates = self.daily_counts.keys
+        return {
+            'daily_counts': self.daily_counts.to_dict(),
+            'daily_types': {type_name: dict(zip(dates.tolist(), counts.reindex(dates).tolist()))
+                            for type_name, counts in sorted(self.daily_types.items())}
+        }
+
+    def _chat_pattern(self) -> Dict:
+        stats = self.gap_stats
+        return {
+            'conversation_gaps': {
+                'count': stats.count,
+                'avg_gap': round(stats.mean, 1) if stats.count else 0,
+                'max_gap': round(stats.maximum, 1) if stats.count else 0,
+                'distribution': dict(zip(GAP_LABELS, self.gap_histogram.counts.tolist()))
+            }
+        }
+
+    def _response_time(self) -> Dict:
+        distribution = sorted(zip(RESPONSE_LABELS, self.response_histogram.counts.tolist()),
+                              key=lambda item: item[1], reverse=True)
+        return {'response_distribution': dict(distribution)}
+
+    def _heatmap(self) -> Dict:
+        """聊天热力图数据，覆盖首末消息之间的每一天"""
+        if self.message_count == 0:
+            return {'data': [], 'max_count': 0, 'date_range': [], 'pieces': []}
+
+        start_date = pd.Timestamp(_day(self.first_time))
+        end_date = pd.Timestamp(_day(self.last_time))
+        dates = pd.date_range(start_date, end_date).strftime('%Y-%m-%d')
+        heatmap_data = [list(item) for item in zip(dates, self.daily_counts.reindex(dates).tolist())]
+        max_daily = max(count for _, count in heatmap_data)
+
+        # 定义消息数量的区间（使用红色系）
+        pieces = [
+            {'min': 0, 'max': max_daily * 0.1, 'label': f'0-{int(max_daily * 0.1)}', 'color': '#FFEBEE'},  # 最浅红
+            {'min': max_daily * 0.1, 'max': max_daily * 0.3, 'label': f'{int(max_daily * 0.1)}-{int(max_daily * 0.3)}',
+             'color': '#FFCDD2'},  # 浅红
+            {'min': max_daily * 0.3, 'max': max_daily * 0.5, 'label': f'{int(max_daily * 0.3)}-{int(max_daily * 0.5)}',
+             'color': '#EF9A9A'},  # 中红
+            {'min': max_daily * 0.5, 'max': max_daily * 0.7, 'label': f'{int(max_daily * 0.5)}-{int(max_daily * 0.7)}',
+             'color': '#E57373'},  # 深红
+            {'min': max_daily * 0.7, 'label': f'{int(max_daily * 0.7)}+', 'color': '#F44336'}  # 最深红
+        ]
+
+        return {
+            'data': heatmap_data,
+            'max_count': max_daily,
+            'date_range': [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')],
+            'pieces': pieces
+        }
+
+    def _interaction(self) -> Dict:
+        """对话的发起者和结束者统计"""
+        total = self.session_count
+
+        def _summarize(counts: np.ndarray) -> Dict:
+            receiver_count, sender_count = counts.tolist()
+            return {
+                'sender_percent': round(sender_count / total * 100, 1) if total else 0,
+                'receiver_percent': round(receiver_count / total * 100, 1) if total else 0,
+                'sender_count': sender_count,
+                'receiver_count': receiver_count
+            }
+
+        return {
+            'initiator': _summarize(self.initiator_counts),
+            'ender': _summarize(self.ender_counts)
+        }
+
+    def save(self, path: Path) -> None:
+        """保存为压缩的 npz 文件：计数和直方图为数组，其余标量为一段 JSON"""
+        arrays = {}
+        for name in COUNT_VECTORS:
+            arrays.update(getattr(self, name).to_arrays(name))
+
+        # 每种消息类型的每日计数首尾相接保存，另记每种类型的长度
+        type_names = sorted(self.daily_types)
+        per_type = [self.daily_types[type_name].to_arrays('daily_types') for type_name in type_names]
+        arrays['daily_types.names'] = np.array(type_names, dtype=str)
+        arrays['daily_types.sizes'] = np.array([len(a['daily_types.counts']) for a in per_type], dtype=np.int64)
+        arrays['daily_types.keys'] = np.concatenate(
+            [np.empty(0, dtype=str)] + [a['daily_types.keys'] for a in per_type])
+        arrays['daily_types.counts'] = np.concatenate(
+            [np.empty(0, dtype=np.int64)] + [a['daily_types.counts'] for a in per_type])
+
+        arrays['gap_histogram'] = self.gap_histogram.counts
+        arrays['response_histogram'] = self.response_histogram.counts
+        arrays['session_counts'] = np.stack([self.initiator_counts, self.ender_counts])
+
+        header = {name: getattr(self, name) for name in HEADER_FIELDS}
+        header['gap_stats'] = [self.gap_stats.count, self.gap_stats.total, self.gap_stats.maximum]
+        arrays['header'] = np.array(json.dumps(header))
+
+        path = Path(path)
+        tmp_path = path.with_suffix('.tmp.npz')
+        np.savez_compressed(tmp_path, **arrays)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['ChatAggregates']:
+        """读取 save 保存的中间结果，文件不存在时返回 None"""
+        path = Path(path)
+        if not path.exists():
+            return None
+
+        with np.load(path) as arrays:
+            header = json.loads(arrays['header'].item())
+            aggregates = cls(**{name: header[name] for name in HEADER_FIELDS})
+            for name in COUNT_VECTORS:
+                setattr(aggregates, name, CountVector.from_arrays(arrays, name))
+
+            offsets = np.cumsum(np.concatenate([[0], arrays['daily_types.sizes']]))
+            keys, counts = arrays['daily_types.keys'], arrays['daily_types.counts']
+            aggregates.daily_types = {
+                type_name: CountVector(keys[start:end], counts[start:end])
+                for type_name, start, end in zip(arrays['daily_types.names'].tolist(), offsets[:-1], offsets[1:])
+            }
+
+            aggregates.gap_stats = RunningStats(*header['gap_stats'])
+            aggregates.gap_histogram = FixedHistogram(GAP_BINS, 'right', arrays['gap_histogram'])
+            aggregates.response_histogram = FixedHistogram(RESPONSE_BINS, 'left', arrays['response_histogram'])
+            aggregates.initiator_counts, aggregates.ender_counts = arrays['session_counts']
+        return aggregates
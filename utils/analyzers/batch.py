@@ -0,0 +1,51 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+from utils.warmup import warmup
+
+
+def hash_texts(texts: pd.Series) -> np.ndarray:
+    """计算消息内容的 64 位哈希，用作各类逐条消息缓存的键"""
+    return pd.util.hash_pandas_object(texts.astype(str), index=False).to_numpy()
+
+
+def map_chunks(func: Callable[[List], List], items: Sequence, chunk_size: int,
+               max_workers: Optional[int] = None,
+               on_progress: Optional[Callable[[int], None]] = None) -> List:
+    """将 items 分块交给进程池处理，按原顺序拼接结果
+
+    只有一个分块时直接在当前进程处理，避免启动进程池的开销。
+    Args:
+        func: 处理一个分块并返回等长结果列表的顶层函数
+        items: 待处理的数据
+        chunk_size: 每个分块的大小
+        max_workers: 进程池大小，None 表示使用 CPU 核数
+        on_progress: 每完成一个分块后以已完成数量回调
+    """
+    chunks = [(start, list(items[start:start + chunk_size]))
+              for start in range(0, len(items), chunk_size)]
+    results: List = [None] * len(items)
+    done = 0
+
+    def _collect(start: int, chunk_result: List) -> None:
+        nonlocal done
+        results[start:start + len(chunk_result)] = chunk_result
+        done += len(chunk_result)
+        if on_progress:
+            on_progress(done)
+
+    if len(chunks) <= 1:
+        for start, chunk in chunks:
+            _collect(start, func(chunk))
+        return results
+
+    # 以 fork 启动的工作进程会继承后台预热线程当时持有的锁（模块导入锁、jieba 词典锁）而死锁，
+    # 等预热完成后再启动进程池；工作进程也因此直接继承已加载的词典和模型
+    warmup.wait()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(func, chunk): start for start, chunk in chunks}
+        for future in as_completed(futures):
+            _collect(futures[future], future.result())
+    return results
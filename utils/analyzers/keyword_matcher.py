@@ -0,0 +1,107 @@
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List
+import json
+import numpy as np
+
+TEXT_ANALYSIS_DIR = Path(__file__).parent.parent / 'text_analysis_data'
+
+
+class KeywordMatcher:
+    """Aho-Corasick 多模式匹配器
+
+    将多组关键词编译为一个确定性自动机，每条消息只需逐字扫描一遍，
+    即可得到每组关键词的命中次数。
+    """
+
+    def __init__(self, groups: Dict[str, List[str]]):
+        """
+        Args:
+            groups: 分组名 -> 关键词列表，分组顺序即结果中列的顺序
+        """
+        self.group_names = list(groups)
+
+        # 构建字典树，outputs[state] 为到达该状态时命中的分组（同一分组可重复出现）
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for group_id, keywords in enumerate(groups.values()):
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                state = 0
+                for char in keyword:
+                    next_state = goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(goto)
+                        goto[state][char] = next_state
+                        goto.append({})
+                        outputs.append([])
+                    state = next_state
+                outputs[state].append(group_id)
+
+        # 广度优先计算失败指针，并把失败状态的转移合并进来，得到完整的转移表
+        transitions: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            transitions[state] = {**transitions[fail[state]], **goto[state]}
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for char, next_state in goto[state].items():
+                fail[next_state] = transitions[fail[state]].get(char, 0)
+                queue.append(next_state)
+
+        self._transitions = transitions
+        self._outputs = [tuple(groups_hit) for groups_hit in outputs]
+
+    def count(self, texts: Iterable[str]) -> np.ndarray:
+        """统计每条消息中各分组关键词的命中次数
+        Returns:
+            形状为 (消息数, 分组数) 的计数矩阵
+        """
+        transitions, outputs = self._transitions, self._outputs
+        rows, cols = [], []
+        n_texts = 0
+        for row, text in enumerate(texts):
+            n_texts += 1
+            state = 0
+            for char in text:
+                state = transitions[state].get(char, 0)
+                if outputs[state]:
+                    for group_id in outputs[state]:
+                        rows.append(row)
+                        cols.append(group_id)
+
+        counts = np.zeros((n_texts, len(self.group_names)), dtype=np.int32)
+        np.add.at(counts, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)), 1)
+        return counts
+
+    def bitmasks(self, counts: np.ndarray) -> np.ndarray:
+        """将计数矩阵压缩为每条消息一个的分组命中位掩码（最多64组）"""
+        if len(self.group_names) > 64:
+            raise ValueError('位掩码最多支持64个分组')
+        weights = np.left_shift(np.uint64(1), np.arange(len(self.group_names), dtype=np.uint64))
+        return ((counts > 0).astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+
+
+@lru_cache(maxsize=None)
+def load_tag_dictionaries() -> Dict[str, Dict[str, List[str]]]:
+    """加载话题和情感关键词词典（进程内只读取一次）"""
+    dictionaries = {}
+    for name, file_name in [('basicTopics', 'basic_topics.json'), ('emotions', 'emotion_topics.json')]:
+        with open(TEXT_ANALYSIS_DIR / file_name, 'r', encoding='utf-8') as f:
+            dictionaries[name] = json.load(f)
+    return dictionaries
+
+
+@lru_cache(maxsize=None)
+def get_tag_matcher() -> KeywordMatcher:
+    """话题与情感词典编译成的匹配器（进程内只构建一次）
+
+    分组名为 '<词典>/<分组>'，例如 'basicTopics/工作'。
+    """
+    groups = {f'{name}/{group}': keywords
+              for name, dictionary in load_tag_dictionaries().items()
+              for group, keywords in dictionary.items()}
+    return KeywordMatcher(groups)
@@ -1,68 +1,184 @@
-def analyze_message_length(messages):
-    """分析消息长度"""
-    # 文字消息分析
-    sender_text_messages = [msg for msg in messages
-                            if msg.get('type_name') == '文本' and msg.get('is_sender')]
-    receiver_text_messages = [msg for msg in messages
-                              if msg.get('type_name') == '文本' and not msg.get('is_sender')]
-
-    # 计算文字消息平均长度
-    sender_text_lengths = [len(msg.get('msg', '')) for msg in sender_text_messages if msg.get('msg')]
-    receiver_text_lengths = [len(msg.get('msg', '')) for msg in receiver_text_messages if msg.get('msg')]
-
-    # 语音消息分析
-    def extract_voice_length(msg):
-        content = msg.get('msg', '')
-        if isinstance(content, str) and '语音时长：' in content:
-            try:
-                length_str = content.split('语音时长：')[1].split('秒')[0].strip()
-                return float(length_str)
-            except (ValueError, IndexError):
-                return 0
-        return 0
-
-    sender_voice_messages = [msg for msg in messages
-                             if msg.get('type_name') == '语音' and msg.get('is_sender')]
-    receiver_voice_messages = [msg for msg in messages
-                               if msg.get('type_name') == '语音' and not msg.get('is_sender')]
-
-    # 计算语音消息平均长度
-    sender_voice_lengths = [l for l in [extract_voice_length(msg) for msg in sender_voice_messages] if l > 0]
-    receiver_voice_lengths = [l for l in [extract_voice_length(msg) for msg in receiver_voice_messages] if l > 0]
-
-    # 语音通话分析
-    def extract_call_duration(msg):
-        content = msg.get('msg', '')
-        if isinstance(content, str) and '通话时长' in content:
-            try:
-                duration_str = content.split('通话时长')[1].strip().strip('[]').strip()
-                minutes, seconds = map(int, duration_str.split(':'))
-                return minutes * 60 + seconds
-            except (ValueError, IndexError):
-                return 0
-        return 0
-
-    call_messages = [msg for msg in messages if msg.get('type_name') == '语音通话']
-    call_durations = [d for d in [extract_call_duration(msg) for msg in call_messages] if d > 0]
-
-    return {
-        'text_length': {
-            'sender_average': round(sum(sender_text_lengths) / len(sender_text_lengths)) if sender_text_lengths else 0,
-            'receiver_average': round(
-                sum(receiver_text_lengths) / len(receiver_text_lengths)) if receiver_text_lengths else 0,
-            'sender_count': len(sender_text_messages),
-            'receiver_count': len(receiver_text_messages)
-        },
-        'voice_length': {
-            'sender_average': round(sum(sender_voice_lengths) / len(sender_voice_lengths),
-                                    1) if sender_voice_lengths else 0,
-            'receiver_average': round(sum(receiver_voice_lengths) / len(receiver_voice_lengths),
-                                      1) if receiver_voice_lengths else 0,
-            'sender_count': len(sender_voice_messages),
-            'receiver_count': len(receiver_voice_messages)
-        },
-        'call_duration': {
-            'average': round(sum(call_durations) / len(call_durations), 1) if call_durations else 0,
-            'count': len(call_messages)
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+import re
+import numpy as np
+import pandas as pd
+
+from utils.message_table import MessageTable
+
+# 参与长度统计的消息类型 -> 统计项
+LENGTH_KINDS = {'文本': 'text', '语音': 'voice', '语音通话': 'call'}
+# 语音时长：“语音时长：12秒”，取冒号后到“秒”之前的数值
+VOICE_PATTERN = re.compile(r'语音时长：([^秒]*)')
+# 通话时长：“通话时长 05:03”，分和秒可被方括号包围
+CALL_PATTERN = re.compile(r'通话时长[\s\[\]]*([+-]?\d+)\s*:\s*([+-]?\d+)[\s\[\]]*$')
+PERCENTILES = (25, 50, 75, 90, 99)
+
+COUNT_COLUMNS = ['kind', 'is_sender', 'month', 'value']
+
+
+def extract_lengths(df: pd.DataFrame) -> pd.DataFrame:
+    """逐列提取文本长度（字）、语音时长（秒）和通话时长（秒）
+    Args:
+        df: 含 CreateTime/is_sender/type_name/msg 列的消息
+    Returns:
+        文本、语音、语音通话消息的 kind/is_sender/month/value 列；
+        value 为0表示空消息或无法解析时长，只计入消息数
+    """
+    kinds = df['type_name'].astype(str).map(LENGTH_KINDS)
+    mask = kinds.notna().to_numpy()
+    kinds = kinds[mask].to_numpy()
+    msg = df['msg'][mask].astype('string')
+
+    values = np.zeros(len(msg), dtype=np.float64)
+    is_text, is_voice, is_call = kinds == 'text', kinds == 'voice', kinds == 'call'
+    values[is_text] = msg[is_text].str.len().fillna(0).to_numpy(dtype=np.float64)
+    if is_voice.any():
+        voice = msg[is_voice].str.extract(VOICE_PATTERN, expand=False).str.strip()
+        values[is_voice] = pd.to_numeric(voice, errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    if is_call.any():
+        call = msg[is_call].str.extract(CALL_PATTERN)
+        minutes, seconds = (pd.to_numeric(call[i], errors='coerce') for i in (0, 1))
+        values[is_call] = (minutes * 60 + seconds).fillna(0).to_numpy(dtype=np.float64)
+
+    times = pd.to_datetime(df['CreateTime'][mask]).to_numpy(dtype='datetime64[M]')
+    return pd.DataFrame({
+        'kind': kinds,
+        'is_sender': (df['is_sender'][mask].fillna(0).to_numpy() != 0).astype(np.uint8),
+        'month': times.astype(str),
+        'value': np.where(values > 0, values, 0)
+    })
+
+
+@dataclass
+class MessageLengthStats:
+    """消息长度的可合并中间结果
+
+    按 (统计项, 是否发送方, 月份, 长度) 计数。平均值、百分位数和每月趋势都由计数
+    精确得出，两段消息的结果相加即为整段消息的结果，导入新消息时直接合并。
+    """
+    counts: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(
+        {'kind': [], 'is_sender': [], 'month': [], 'value': [], 'count': []}))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'MessageLengthStats':
+        lengths = extract_lengths(df)
+        counts = lengths.groupby(COUNT_COLUMNS, sort=True).size().rename('count').reset_index()
+        return cls(counts)
+
+    def merge(self, other: 'MessageLengthStats') -> 'MessageLengthStats':
+        if other.counts.empty:
+            return self
+        if self.counts.empty:
+            return other
+        counts = (pd.concat([self.counts, other.counts], ignore_index=True)
+                  .groupby(COUNT_COLUMNS, sort=True)['count'].sum().reset_index())
+        return MessageLengthStats(counts)
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp.npz')
+        np.savez_compressed(
+            tmp_path,
+            kind=self.counts['kind'].to_numpy(dtype=str),
+            is_sender=self.counts['is_sender'].to_numpy(dtype=np.uint8),
+            month=self.counts['month'].to_numpy(dtype=str),
+            value=self.counts['value'].to_numpy(dtype=np.float64),
+            count=self.counts['count'].to_numpy(dtype=np.int64)
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['MessageLengthStats']:
+        """读取 save 保存的中间结果，文件不存在时返回 None"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        with np.load(path) as arrays:
+            return cls(pd.DataFrame({name: arrays[name] for name in [*COUNT_COLUMNS, 'count']}))
+
+    def _select(self, kind: str, is_sender: Optional[bool] = None) -> pd.DataFrame:
+        counts = self.counts[self.counts['kind'] == kind]
+        if is_sender is not None:
+            counts = counts[counts['is_sender'] == int(is_sender)]
+        return counts
+
+    @staticmethod
+    def _summarize(counts: pd.DataFrame, digits: Optional[int]) -> Dict:
+        """消息数、有效长度的平均值和百分位数（最近秩法）"""
+        valid = counts[counts['value'] > 0].groupby('value')['count'].sum()
+        total = int(valid.sum())
+        average = float((valid.index.to_numpy() * valid.to_numpy()).sum() / total) if total else 0
+        percentiles = {}
+        for p in PERCENTILES:
+            if total:
+                rank = int(np.ceil(p / 100 * total))
+                value = float(valid.index[np.searchsorted(valid.cumsum().to_numpy(), rank)])
+            else:
+                value = 0
+            percentiles[f'p{p}'] = round(value, digits) if digits else round(value)
+        return {
+            'count': int(counts['count'].sum()),
+            'average': round(average, digits) if digits else round(average),
+            'percentiles': percentiles
         }
-    }
+
+    def render(self) -> Dict:
+        """生成消息长度分析数据"""
+        text = {side: self._summarize(self._select('text', side == 'sender'), None)
+                for side in ('sender', 'receiver')}
+        voice = {side: self._summarize(self._select('voice', side == 'sender'), 1)
+                 for side in ('sender', 'receiver')}
+        call = self._summarize(self._select('call'), 1)
+
+        def side_stats(stats: Dict) -> Dict:
+            return {
+                'sender_average': stats['sender']['average'],
+                'receiver_average': stats['receiver']['average'],
+                'sender_count': stats['sender']['count'],
+                'receiver_count': stats['receiver']['count'],
+                'sender_percentiles': stats['sender']['percentiles'],
+                'receiver_percentiles': stats['receiver']['percentiles']
+            }
+
+        return {
+            'text_length': side_stats(text),
+            'voice_length': side_stats(voice),
+            'call_duration': {'average': call['average'], 'count': call['count'],
+                              'percentiles': call['percentiles']},
+            'monthly_trends': self._monthly_trends()
+        }
+
+    def _monthly_trends(self) -> Dict:
+        """每月的平均文本长度、语音时长和通话时长"""
+        months = sorted(self.counts['month'].unique().tolist())
+        valid = self.counts[self.counts['value'] > 0].assign(
+            total=lambda counts: counts['value'] * counts['count'])
+
+        def monthly_average(counts: pd.DataFrame, digits: Optional[int]) -> list:
+            sums = counts.groupby('month')[['total', 'count']].sum().reindex(months, fill_value=0)
+            averages = (sums['total'] / sums['count'].where(sums['count'] > 0)).fillna(0)
+            return [round(value, digits) if digits else round(value) for value in averages.tolist()]
+
+        def select(kind: str, is_sender: Optional[bool] = None) -> pd.DataFrame:
+            counts = valid[valid['kind'] == kind]
+            return counts if is_sender is None else counts[counts['is_sender'] == int(is_sender)]
+
+        return {
+            'months': months,
+            'text_length': {'sender_average': monthly_average(select('text', True), None),
+                            'receiver_average': monthly_average(select('text', False), None)},
+            'voice_length': {'sender_average': monthly_average(select('voice', True), 1),
+                             'receiver_average': monthly_average(select('voice', False), 1)},
+            'call_duration': {'average': monthly_average(select('call'), 1)}
+        }
+
+
+def analyze_message_length(messages) -> Dict:
+    """分析消息长度（文本长度、语音时长、通话时长的平均值、百分位数和每月趋势）
+    Args:
+        messages: 含 CreateTime/is_sender/type_name/msg 列的消息（MessageTable、DataFrame 或消息列表）
+    """
+    return MessageLengthStats.from_frame(MessageTable.of(messages).frame).render()
@@ -0,0 +1,122 @@
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import threading
+import numpy as np
+import pandas as pd
+
+from utils.analyzers.batch import hash_texts, map_chunks
+
+
+def _score_chunk(texts: List[str]) -> List[float]:
+    """在工作进程中为一批消息打分，无法打分的消息记为 NaN"""
+    from snownlp import SnowNLP
+
+    scores = []
+    for text in texts:
+        try:
+            scores.append(SnowNLP(text).sentiments)
+        except Exception:
+            scores.append(float('nan'))
+    return scores
+
+
+class SentimentProgress:
+    """情感分析进度登记表，供界面轮询"""
+
+    _lock = threading.Lock()
+    _progress: Dict = {}
+
+    @classmethod
+    def update(cls, key, **fields) -> None:
+        with cls._lock:
+            cls._progress.setdefault(key, {}).update(fields)
+
+    @classmethod
+    def get(cls, key) -> Dict:
+        with cls._lock:
+            return dict(cls._progress.get(key, {'status': 'idle', 'done': 0, 'total': 0}))
+
+    @classmethod
+    def remove(cls, key) -> None:
+        """删除登记的进度（如联系人被删除时）"""
+        with cls._lock:
+            cls._progress.pop(key, None)
+
+
+class SentimentEngine:
+    """批量并行情感打分，按消息哈希持久化缓存分数
+
+    只有缓存中不存在的消息才会送入进程池打分，重复生成或重新导入时
+    已打分的消息直接复用。
+    """
+
+    def __init__(self, cache_path: Optional[Path] = None, chunk_size: int = 2000,
+                 max_workers: Optional[int] = None, progress_key=None):
+        """
+        Args:
+            cache_path: 分数缓存文件路径，None 表示不持久化
+            chunk_size: 每个任务包含的消息数
+            max_workers: 进程池大小，None 表示使用 CPU 核数
+            progress_key: 进度登记键，None 表示不登记进度
+        """
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.progress_key = progress_key
+
+    def _load_cache(self) -> pd.Series:
+        if self.cache_path and self.cache_path.exists():
+            with np.load(self.cache_path) as cache:
+                return pd.Series(cache['scores'], index=cache['hashes'])
+        return pd.Series(dtype=np.float64, index=pd.Index([], dtype=np.uint64))
+
+    def _save_cache(self, cache: pd.Series) -> None:
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp.npz')
+        np.savez(tmp_path, hashes=cache.index.to_numpy(dtype=np.uint64),
+                 scores=cache.to_numpy(dtype=np.float64))
+        tmp_path.replace(self.cache_path)
+
+    def _report(self, **fields) -> None:
+        if self.progress_key is not None:
+            SentimentProgress.update(self.progress_key, **fields)
+
+    def score(self, texts: pd.Series,
+              on_progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+        """为每条消息打分，返回与 texts 按位置对齐的分数数组（空消息和无法打分的消息为 NaN）"""
+        present = texts.notna().to_numpy()
+        texts = texts[present].astype(str)
+        hashes = hash_texts(texts)
+        cache = self._load_cache()
+
+        # 只为缓存中不存在的不同内容打分
+        unique_hashes, first_positions = np.unique(hashes, return_index=True)
+        missing = ~np.isin(unique_hashes, cache.index.to_numpy())
+        pending_hashes = unique_hashes[missing]
+        pending_texts = texts.iloc[first_positions[missing]].tolist()
+
+        total = len(pending_texts)
+        self._report(status='running', done=0, total=total)
+
+        def _progress(done: int) -> None:
+            self._report(done=done)
+            if on_progress:
+                on_progress(done, total)
+
+        try:
+            new_scores = map_chunks(_score_chunk, pending_texts, self.chunk_size,
+                                    max_workers=self.max_workers, on_progress=_progress)
+        except Exception as e:
+            self._report(status='error', error=str(e))
+            raise
+
+        if total:
+            cache = pd.concat([cache, pd.Series(new_scores, index=pending_hashes, dtype=np.float64)])
+            self._save_cache(cache)
+        self._report(status='done', done=total)
+
+        scores = np.full(len(present), np.nan)
+        scores[present] = cache.reindex(hashes).to_numpy(dtype=np.float64)
+        return scores
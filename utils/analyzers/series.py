@@ -0,0 +1,202 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional
+import numpy as np
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+@dataclass
+class DailySeries:
+    """已解析的每日统计：日期升序排列，第 0 行为每日消息数，其余各行为各类型的每日消息数"""
+    dates: np.ndarray  # 'YYYY-MM-DD'
+    type_names: List[str]
+    counts: np.ndarray  # 形状为 (类型数 + 1, 日期数)
+
+    @classmethod
+    def from_daily_stats(cls, daily_stats: Dict) -> 'DailySeries':
+        dates = np.array(sorted(daily_stats['daily_counts']), dtype=str)
+        type_names = sorted(daily_stats['daily_types'])
+        counts = np.array([[daily_stats['daily_counts'][date] for date in dates]] +
+                          [[daily_stats['daily_types'][name].get(date, 0) for date in dates] for name in type_names],
+                          dtype=np.int64).reshape(len(type_names) + 1, len(dates))
+        return cls(dates, type_names, counts)
+
+
+@dataclass
+class HeatmapSeries:
+    """已解析的热力图：各项的日期，截取时不再逐项读取"""
+    dates: np.ndarray  # 'YYYY-MM-DD'
+    heatmap: Dict
+
+
+def parse_series(payload: Dict) -> Dict:
+    """将响应中的每日统计和热力图解析为数组，供 SeriesQuery.apply 反复截取（结果只读共享）"""
+    payload = dict(payload)
+    if payload.get('daily_stats'):
+        payload['daily_stats'] = DailySeries.from_daily_stats(payload['daily_stats'])
+    if payload.get('heatmap'):
+        heatmap = payload['heatmap']
+        payload['heatmap'] = HeatmapSeries(np.array([item[0] for item in heatmap['data']], dtype=str), heatmap)
+    return payload
+
+
+@dataclass
+class SeriesConfig:
+    """图表接口的降采样配置"""
+    DEFAULT_MAX_POINTS: int = 400  # 基础分析页面每日统计默认请求的点数，该请求的结果预先压缩保存
+    MAX_POINTS_LIMIT: int = 10_000  # max_points 的上限，超出时按上限处理
+
+
+@dataclass
+class SeriesQuery:
+    """图表接口的时间范围和降采样参数
+
+    start/end 截取日期范围（含两端）；granularity 按周（以周一的日期为键）或月
+    （'YYYY-MM'）聚合，聚合后总数不变；max_points 限制点数，超出时用 LTTB 算法
+    选取保持曲线形状的点。
+    """
+    start: Optional[str] = None  # 'YYYY-MM-DD'
+    end: Optional[str] = None
+    granularity: str = 'day'
+    max_points: Optional[int] = None
+
+    @classmethod
+    def from_args(cls, args: Mapping) -> 'SeriesQuery':
+        """由请求参数构建，参数无效时抛出 ValueError"""
+        max_points = int(args['max_points']) if args.get('max_points') else None
+        query = cls(
+            start=_parse_date(args.get('start')),
+            end=_parse_date(args.get('end')),
+            granularity=args.get('granularity') or 'day',
+            max_points=min(max_points, SeriesConfig.MAX_POINTS_LIMIT) if max_points is not None else None
+        )
+        if query.granularity not in GRANULARITIES:
+            raise ValueError(f"不支持的时间粒度: {query.granularity}")
+        if query.max_points is not None and query.max_points < 3:
+            raise ValueError('max_points 不能小于 3')
+        return query
+
+    @property
+    def is_default(self) -> bool:
+        """是否未指定任何参数（返回完整数据）"""
+        return self == SeriesQuery()
+
+    @property
+    def is_page_default(self) -> bool:
+        """是否为页面首次加载时的默认视图：不截取日期范围，按 SeriesConfig.DEFAULT_MAX_POINTS 降采样"""
+        return self.start is None and self.end is None and self.max_points == SeriesConfig.DEFAULT_MAX_POINTS
+
+    def key(self) -> str:
+        """参数的规范表示，用于区分不同参数的响应"""
+        return f'{self.start}:{self.end}:{self.granularity}:{self.max_points}'
+
+    def apply(self, payload: Dict) -> Dict:
+        """截取并降采样响应中的每日统计（daily_stats）和热力图（heatmap），其余数据不变
+
+        payload 可以是原始响应数据，也可以是 parse_series 解析后的数据。
+        """
+        payload = dict(payload)
+        if payload.get('daily_stats'):
+            payload['daily_stats'] = self.apply_daily_stats(payload['daily_stats'])
+        if payload.get('heatmap'):
+            payload['heatmap'] = self.apply_heatmap(payload['heatmap'])
+        return payload
+
+    def _date_mask(self, dates: np.ndarray) -> np.ndarray:
+        mask = np.ones(len(dates), dtype=bool)
+        if self.start:
+            mask &= dates >= self.start
+        if self.end:
+            mask &= dates <= self.end
+        return mask
+
+    def apply_daily_stats(self, daily_stats: Any) -> Dict:
+        """每日消息数及各类型每日消息数（daily_stats 为原始数据或 DailySeries）"""
+        if not isinstance(daily_stats, DailySeries):
+            daily_stats = DailySeries.from_daily_stats(daily_stats)
+        dates, type_names, counts = daily_stats.dates, daily_stats.type_names, daily_stats.counts
+
+        mask = self._date_mask(dates)
+        dates, counts = dates[mask], counts[:, mask]
+        if self.granularity != 'day' and len(dates):
+            dates, counts = bucket_sum(dates, counts, self.granularity)
+        if self.max_points is not None and len(dates) > self.max_points:
+            # 以各日期（区间起点）的时间戳为横坐标，没有消息的日期不会使曲线形状失真
+            x = dates.astype('datetime64[s]').astype(np.int64)
+            selected = lttb_indices(counts[0], self.max_points, x)
+            dates, counts = dates[selected], counts[:, selected]
+
+        keys = dates.tolist()
+        return {
+            'daily_counts': dict(zip(keys, counts[0].tolist())),
+            'daily_types': {name: dict(zip(keys, row.tolist())) for name, row in zip(type_names, counts[1:])},
+            'granularity': self.granularity
+        }
+
+    def apply_heatmap(self, heatmap: Any) -> Dict:
+        """热力图按日历逐日显示，只截取日期范围；颜色区间和完整日期范围保持不变，便于对比"""
+        if not isinstance(heatmap, HeatmapSeries):
+            heatmap = HeatmapSeries(np.array([item[0] for item in heatmap['data']], dtype=str), heatmap)
+        dates, heatmap = heatmap.dates, heatmap.heatmap
+        mask = self._date_mask(dates)
+        return {**heatmap, 'data': [item for item, keep in zip(heatmap['data'], mask) if keep]}
+
+
+def _parse_date(value: Optional[str]) -> Optional[str]:
+    """校验并规范化 'YYYY-MM-DD' 日期"""
+    if not value:
+        return None
+    try:
+        return str(np.datetime64(value, 'D'))
+    except ValueError:
+        raise ValueError(f"无效的日期: {value}")
+
+
+def bucket_sum(dates: np.ndarray, counts: np.ndarray, granularity: str):
+    """将按日期升序排列的每日计数按周或月求和
+    Args:
+        dates: 'YYYY-MM-DD' 日期数组
+        counts: 形状为 (序列数, 日期数) 的计数
+        granularity: 'week'（键为所在周周一的日期）或 'month'（键为 'YYYY-MM'）
+    Returns:
+        (各区间的键, 各区间的计数)
+    """
+    days = dates.astype('datetime64[D]')
+    if granularity == 'week':
+        # 1970-01-01 是周四，(天数 + 3) % 7 为距周一的天数
+        keys = (days - (days.astype(np.int64) + 3) % 7).astype(str)
+    else:
+        keys = days.astype('datetime64[M]').astype(str)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(counts, starts, axis=1)
+
+
+def lttb_indices(values: np.ndarray, threshold: int, x: Optional[np.ndarray] = None) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets 降采样，返回保留的点的下标（含首末点）
+
+    将中间的点分为 threshold - 2 个桶，每个桶选出与前一个选中点、下一个桶平均点
+    构成的三角形面积最大的点，在减少点数的同时保留峰谷等曲线特征。
+    Args:
+        values: 各点的纵坐标
+        threshold: 保留的点数
+        x: 各点的横坐标（升序，如时间戳），None 表示等间距
+    """
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    y = np.asarray(values, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) -
+                       (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
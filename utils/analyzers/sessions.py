@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+
+
+@dataclass
+class Sessions:
+    """会话划分结果，每个数组的第 i 项对应第 i 个会话"""
+    start: np.ndarray  # 会话首条消息的位置（按时间排序后）
+    end: np.ndarray  # 会话末条消息的位置（包含）
+    start_time: np.ndarray  # 会话开始时间
+    end_time: np.ndarray  # 会话结束时间
+    initiator: np.ndarray  # 首条消息的 is_sender
+    ender: np.ndarray  # 末条消息的 is_sender
+    message_count: np.ndarray  # 会话消息数
+    duration: np.ndarray  # 会话时长（秒）
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+
+def segment_sessions(times: np.ndarray, is_sender: np.ndarray,
+                     idle_gap: Optional[float] = None) -> Sessions:
+    """划分会话
+    Args:
+        times: 消息时间（datetime64）
+        is_sender: 发送方标记
+        idle_gap: 空闲间隔（秒），相邻消息间隔超过该值即开启新会话；
+                  None 表示按自然日划分
+    """
+    times = np.asarray(times, dtype='datetime64[ns]')
+    is_sender = np.asarray(is_sender)
+    if len(times) > 1 and (np.diff(times) < np.timedelta64(0)).any():
+        order = np.argsort(times, kind='stable')
+        times, is_sender = times[order], is_sender[order]
+
+    n = len(times)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return Sessions(empty, empty, times, times, empty, empty, empty, empty.astype(float))
+
+    # 会话边界：与上一条消息不在同一天，或间隔超过空闲阈值
+    boundary = np.empty(n, dtype=bool)
+    boundary[0] = True
+    if idle_gap is None:
+        days = times.astype('datetime64[D]')
+        boundary[1:] = days[1:] != days[:-1]
+    else:
+        boundary[1:] = np.diff(times) > np.timedelta64(int(idle_gap * 1e9), 'ns')
+
+    start = np.flatnonzero(boundary)
+    end = np.append(start[1:] - 1, n - 1)
+
+    return Sessions(
+        start=start,
+        end=end,
+        start_time=times[start],
+        end_time=times[end],
+        initiator=is_sender[start],
+        ender=is_sender[end],
+        message_count=end - start + 1,
+        duration=(times[end] - times[start]).astype(np.int64) / 1e9
+    )
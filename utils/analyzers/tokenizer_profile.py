@@ -0,0 +1,143 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import FrozenSet, Optional
+import hashlib
+import marshal
+import os
+import uuid
+
+TEXT_ANALYSIS_DIR = Path(__file__).parent.parent / 'text_analysis_data'
+# 编译结果的保存目录（与 DataPaths.BASE_DIR 同在工作目录下）
+CACHE_DIR = Path('data') / 'cache'
+
+
+class TokenizerProfile:
+    """分词配置：jieba 默认词典 + 自定义词典 + 停用词
+
+    首次使用时解析词典文件，生成 jieba 的前缀词典（词频表）和词性表，以 marshal 序列化为
+    二进制缓存；缓存文件名包含各输入文件内容的哈希，文件变化后自动重新生成。之后的进程
+    （包括分词的工作进程）直接反序列化缓存，不再逐行解析文本词典。
+    自定义词典按 jieba.load_userdict 的规则加入，分词结果与其一致。停用词表与分词器无关，
+    首次访问 stop_words 时读取。
+    """
+
+    FORMAT_VERSION = 3  # 缓存格式版本，修改编译规则后递增
+
+    def __init__(self, custom_dict: Optional[Path] = TEXT_ANALYSIS_DIR / 'custom_dict.txt',
+                 stop_words: Optional[Path] = TEXT_ANALYSIS_DIR / 'stop_words.txt',
+                 cache_dir: Path = CACHE_DIR):
+        """
+        Args:
+            custom_dict: 自定义词典（每行“词 词频 词性”，词频和词性可省略），None 表示不使用
+            stop_words: 停用词表（每行一个词），None 表示不过滤
+            cache_dir: 二进制缓存目录
+        """
+        self.custom_dict = Path(custom_dict) if custom_dict else None
+        self.stop_words_file = Path(stop_words) if stop_words else None
+        self.cache_dir = Path(cache_dir)
+        self._key: Optional[str] = None
+        self._stop_words: Optional[FrozenSet[str]] = None
+
+    @property
+    def key(self) -> str:
+        """由格式版本、jieba 版本和各词典文件内容计算的哈希，用于区分不同配置的缓存"""
+        if self._key is None:
+            import jieba
+
+            digest = hashlib.sha1(f'{self.FORMAT_VERSION}:{jieba.__version__}'.encode('utf-8'))
+            for path in (self.custom_dict, self.stop_words_file):
+                digest.update(b'\0' + (path.read_bytes() if path else b''))
+            self._key = digest.hexdigest()
+        return self._key
+
+    @property
+    def stop_words(self) -> FrozenSet[str]:
+        """停用词表（首次访问时读取，与分词器是否已由本配置加载词典无关）"""
+        if self._stop_words is None:
+            stop_words = frozenset()
+            if self.stop_words_file:
+                with self.stop_words_file.open('r', encoding='utf-8-sig') as f:
+                    stop_words = frozenset(line.strip() for line in f if line.strip())
+            self._stop_words = stop_words
+        return self._stop_words
+
+    @property
+    def cache_path(self) -> Path:
+        return self.cache_dir / f'tokenizer.{self.key[:16]}.bin'
+
+    def apply(self, tokenizer) -> None:
+        """为 jieba 分词器加载本配置的词典（读取或生成缓存），代替 tokenizer.initialize()"""
+        import jieba.finalseg
+
+        with tokenizer.lock:
+            if tokenizer.initialized:
+                return
+            compiled = self._load_cache()
+            if compiled is None:
+                compiled = self._compile(tokenizer)
+                self._save_cache(compiled)
+            freq, total, word_tags, force_split = compiled
+            tokenizer.FREQ, tokenizer.total = freq, total
+            tokenizer.user_word_tag_tab.update(word_tags)
+            for word in force_split:
+                jieba.finalseg.add_force_split(word)
+            tokenizer.initialized = True
+
+    def _compile(self, tokenizer):
+        """解析默认词典和自定义词典，返回 (词频表, 总词频, 词性表, 强制切分的词)"""
+        import jieba
+
+        freq, total = tokenizer.gen_pfdict(tokenizer.get_dict_file())
+        word_tags, force_split = {}, []
+        if self.custom_dict:
+            # 省略词频的词按 suggest_freq 计算词频，它依赖已加载的词典；在绑定正在生成的词频表的
+            # 临时分词器上计算，避免在持有 tokenizer.lock 时触发完整的 initialize()
+            scratch = jieba.Tokenizer()
+            scratch.FREQ, scratch.initialized = freq, True
+            with self.custom_dict.open('rb') as f:
+                for line in f:
+                    # 与 jieba.load_userdict 相同的逐行解析规则
+                    line = line.strip().decode('utf-8').lstrip('\ufeff')
+                    if not line:
+                        continue
+                    word, word_freq, tag = jieba.re_userdict.match(line).groups()
+                    # 与 add_word 一致：覆盖词频并累加总词频，补齐前缀
+                    if word_freq is not None:
+                        word_freq = int(word_freq.strip())
+                    else:
+                        scratch.total = total
+                        word_freq = scratch.suggest_freq(word, False)
+                    freq[word] = word_freq
+                    total += word_freq
+                    if tag is not None:
+                        word_tags[word] = tag.strip()
+                    for end in range(1, len(word)):
+                        freq.setdefault(word[:end], 0)
+                    if word_freq == 0:
+                        force_split.append(word)
+        return freq, total, word_tags, force_split
+
+    def _load_cache(self):
+        if not self.cache_path.exists():
+            return None
+        try:
+            return marshal.loads(self.cache_path.read_bytes())
+        except (OSError, ValueError, EOFError, TypeError) as e:
+            print(f"警告：读取分词缓存失败，将重新生成: {str(e)}")
+            return None
+
+    def _save_cache(self, compiled) -> None:
+        """原子地写入缓存，并删除其他配置的旧缓存"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = self.cache_path.with_name(f'{self.cache_path.name}.{uuid.uuid4().hex}.tmp')
+        temp_path.write_bytes(marshal.dumps(compiled))
+        os.replace(temp_path, self.cache_path)
+        for path in self.cache_dir.glob('tokenizer.*.bin'):
+            if path != self.cache_path:
+                path.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=None)
+def default_profile() -> TokenizerProfile:
+    """项目自带的分词配置（进程内共用一个实例）"""
+    return TokenizerProfile()
@@ -0,0 +1,191 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.analyzers.batch import hash_texts, map_chunks
+from utils.analyzers.tokenizer_profile import default_profile
+
+# 消息之间插入的分隔词，与原先用空格拼接全部消息后分词的结果保持一致
+SEPARATOR = (' ', 'x')
+# 分词缓存文件中记录分词配置哈希的元数据键
+PROFILE_METADATA_KEY = b'tokenizer_profile'
+
+
+def load_jieba():
+    """导入 jieba 并按默认分词配置（自定义词典、停用词）加载词典
+
+    词典的编译结果缓存在 data/cache，之后的进程（包括分词的工作进程）直接读取，
+    见 TokenizerProfile。jieba 导入和加载较慢，只在需要分词时调用，或由后台预热提前调用。
+    """
+    import jieba
+
+    if not jieba.dt.initialized:
+        default_profile().apply(jieba.dt)
+    return jieba
+
+
+def _segment_chunk(texts: List[str]) -> List[Tuple[List[str], List[str]]]:
+    """在工作进程中对一批消息做带词性的分词，分词时去掉停用词"""
+    load_jieba()
+    import jieba.posseg as pseg
+
+    stop_words = default_profile().stop_words
+    results = []
+    for text in texts:
+        pairs = [(pair.word, pair.flag) for pair in pseg.cut(text) if pair.word not in stop_words]
+        results.append(([w for w, _ in pairs], [f for _, f in pairs]))
+    return results
+
+
+@dataclass
+class Tokens:
+    """按消息顺序展开的分词结果"""
+    words: np.ndarray  # 所有词，消息之间以 SEPARATOR 分隔
+    flags: np.ndarray  # 对应的词性
+
+
+class TokenStore:
+    """按消息哈希持久化的分词缓存
+
+    每条不同的消息只分词一次，关键词、话题等分析共用同一份分词结果。
+    """
+
+    def __init__(self, cache_path: Optional[Path] = None, chunk_size: int = 5000,
+                 max_workers: Optional[int] = None):
+        """
+        Args:
+            cache_path: 分词缓存文件路径，None 表示不持久化
+            chunk_size: 每个任务包含的消息数
+            max_workers: 进程池大小，None 表示使用 CPU 核数
+        """
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+
+    def _load_cache(self) -> pd.DataFrame:
+        """读取分词缓存；由其他分词配置（词典、停用词）生成的缓存视为无效"""
+        if self.cache_path and self.cache_path.exists():
+            table = pq.read_table(self.cache_path)
+            if (table.schema.metadata or {}).get(PROFILE_METADATA_KEY) == default_profile().key.encode():
+                return table.to_pandas().set_index('hash')
+        return pd.DataFrame({'words': [], 'flags': []},
+                            index=pd.Index([], dtype=np.uint64, name='hash'))
+
+    def _save_cache(self, cache: pd.DataFrame) -> None:
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        table = pa.Table.from_pandas(cache.reset_index(), preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               PROFILE_METADATA_KEY: default_profile().key.encode()})
+        pq.write_table(table, tmp_path)
+        tmp_path.replace(self.cache_path)
+
+    def _segment_missing(self, texts: pd.Series) -> Tuple[np.ndarray, pd.DataFrame, int]:
+        """对缓存中没有的消息分词并写入缓存，返回消息哈希、更新后的缓存和新分词的消息数"""
+        hashes = hash_texts(texts)
+        cache = self._load_cache()
+
+        unique_hashes, first_positions = np.unique(hashes, return_index=True)
+        missing = ~np.isin(unique_hashes, cache.index.to_numpy())
+        if missing.any():
+            pending_texts = texts.iloc[first_positions[missing]].tolist()
+            segmented = map_chunks(_segment_chunk, pending_texts, self.chunk_size,
+                                   max_workers=self.max_workers)
+            new_entries = pd.DataFrame(segmented, columns=['words', 'flags'],
+                                       index=pd.Index(unique_hashes[missing], name='hash'))
+            cache = pd.concat([cache, new_entries])
+            self._save_cache(cache)
+        return hashes, cache, int(missing.sum())
+
+    def warm(self, texts: pd.Series) -> int:
+        """预先对消息分词并写入缓存（如导入后），返回新分词的消息数"""
+        return self._segment_missing(texts.dropna().astype(str))[2]
+
+    def tokenize(self, texts: pd.Series) -> Tokens:
+        """对消息分词（优先读取缓存），返回按消息顺序展开的结果"""
+        hashes, cache, _ = self._segment_missing(texts.dropna().astype(str))
+
+        per_message = cache.reindex(hashes)
+        if per_message.empty:
+            return Tokens(np.empty(0, dtype=object), np.empty(0, dtype=object))
+
+        # 各消息的词在展开结果中的位置：前面各消息的词数加上其间的分隔词数
+        lengths = np.fromiter(map(len, per_message['words']), dtype=np.int64, count=len(per_message))
+        message_ids = np.repeat(np.arange(len(lengths)), lengths)
+        word_positions = np.arange(len(message_ids)) + message_ids
+        separator_positions = np.cumsum(lengths)[:-1] + np.arange(len(lengths) - 1)
+
+        def _flatten(column: str, separator: str) -> np.ndarray:
+            flat = np.empty(len(message_ids) + len(separator_positions), dtype=object)
+            flat[word_positions] = np.concatenate(per_message[column].to_numpy(), dtype=object)
+            flat[separator_positions] = separator
+            return flat
+
+        return Tokens(_flatten('words', SEPARATOR[0]), _flatten('flags', SEPARATOR[1]))
+
+
+def extract_tfidf(tokens: Tokens, topK: int) -> List[Tuple[str, float]]:
+    """基于分词结果计算 TF-IDF 关键词
+
+    词长、停用词和 IDF 的计分规则与 jieba.analyse.extract_tags 一致。分词结果来自
+    TokenStore（带词性的 jieba.posseg 分词，已去掉自定义停用词），个别词的切分与
+    extract_tags 使用的 jieba.cut 不同，因此关键词不一定与对原文调用 extract_tags 完全相同。
+    """
+    load_jieba()
+    import jieba.analyse
+
+    tfidf = jieba.analyse.default_tfidf
+    words = pd.Series(tokens.words, dtype=object)
+    if words.empty:
+        return []
+
+    keep = (words.str.strip().str.len() >= 2) & ~words.str.lower().isin(tfidf.stop_words)
+    freq = words[keep].value_counts(sort=False)
+    if freq.empty:
+        return []
+
+    idf = np.array([tfidf.idf_freq.get(word, tfidf.median_idf) for word in freq.index])
+    weights = pd.Series(freq.to_numpy() * idf / freq.sum(), index=freq.index)
+    top = weights.sort_values(ascending=False, kind='stable')[:topK]
+    return list(zip(top.index, top.tolist()))
+
+
+def extract_textrank(tokens: Tokens, topK: int, window: int = 5,
+                     allow_pos: Tuple[str, ...] = ('ns', 'n', 'vn', 'v')) -> List[Tuple[str, float]]:
+    """基于分词结果计算 TextRank 关键词，规则与 jieba.analyse.textrank 一致"""
+    load_jieba()
+    import jieba.analyse
+    from jieba.analyse.textrank import UndirectWeightedGraph
+
+    textrank = jieba.analyse.default_textrank
+    words = pd.Series(tokens.words, dtype=object)
+    if words.empty:
+        return []
+
+    keep = (pd.Series(tokens.flags, dtype=object).isin(allow_pos).to_numpy()
+            & (words.str.strip().str.len() >= 2).to_numpy()
+            & ~words.str.lower().isin(textrank.stop_words).to_numpy())
+    codes, vocabulary = pd.factorize(words)
+
+    # 窗口内两个候选词构成一条边，边权为共现次数
+    pairs = []
+    for offset in range(1, window):
+        both = keep[:-offset] & keep[offset:]
+        positions = np.flatnonzero(both)
+        pairs.append(codes[positions] * len(vocabulary) + codes[positions + offset])
+    pair_keys, pair_counts = np.unique(np.concatenate(pairs), return_counts=True)
+
+    graph = UndirectWeightedGraph()
+    for key, count in zip(pair_keys.tolist(), pair_counts.tolist()):
+        graph.addEdge(vocabulary[key // len(vocabulary)], vocabulary[key % len(vocabulary)], count)
+    if not graph.graph:
+        return []
+
+    ranks = graph.rank()
+    return sorted(ranks.items(), key=lambda item: item[1], reverse=True)[:topK]
@@ -1,23 +1,115 @@
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Iterator, List
+import numpy as np
 import pandas as pd
+import hashlib
 import json
 from dataclasses import dataclass
+from typing import Optional
 import re
 
+from utils.analyzers.batch import map_chunks
+from utils.message_index import MessageIndex
+from utils.message_table import MessageTable
+
+# 分析用到的CSV列及其读取类型
+CSV_DTYPES = {
+    'MsgSvrID': 'Int64',
+    'type_name': 'category',
+    'is_sender': 'UInt8',  # 可空类型：个别导出行的 is_sender 为空，读取后按 0（对方发送）填充
+    'msg': 'string',
+    'CreateTime': 'string',
+}
+
+
+@dataclass
+class IngestConfig:
+    """导入配置"""
+    CHUNK_SIZE: int = 200_000  # 流式导入时每块的消息数，决定导入时的内存上限
+    STREAMING_MIN_BYTES: int = 512 * 1024 * 1024  # CSV 总大小达到该值时使用流式导入
+
+
+class UnorderedExportError(ValueError):
+    """导出文件未按时间先后排列，无法流式导入"""
+
+
+def _csv_columns(file: Path) -> List[str]:
+    """CSV 文件中分析用到的列"""
+    return [column for column in pd.read_csv(file, nrows=0).columns if column in CSV_DTYPES]
+
+
+def _read_csv_file(file: Path) -> pd.DataFrame:
+    """按 CSV_DTYPES 读取一个CSV文件中分析用到的列，并按时间排序"""
+    columns = _csv_columns(file)
+    dtypes = {column: CSV_DTYPES[column] for column in columns if column != 'CreateTime'}
+    try:
+        # pyarrow 引擎多线程解析，并直接把时间列解析为 datetime
+        df = pd.read_csv(file, usecols=columns, dtype=dtypes, engine='pyarrow')
+    except Exception:
+        df = pd.read_csv(file, usecols=columns, dtype=dtypes)
+
+    df['CreateTime'] = pd.to_datetime(df['CreateTime']).astype('datetime64[ns]')
+    _fill_sender(df)
+    if not df['CreateTime'].is_monotonic_increasing:
+        df = df.sort_values('CreateTime', kind='stable')
+    return df
+
+
+def _fill_sender(df: pd.DataFrame) -> None:
+    """将可空的 is_sender 列缺失值填为 0 并转为 uint8（与 MessageIndexWriter.append 一致）"""
+    if 'is_sender' in df.columns:
+        df['is_sender'] = df['is_sender'].fillna(0).astype(np.uint8)
+
+
+def _iter_csv_chunks(file: Path, columns: List[str], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """按块读取一个CSV文件，每块按时间排序；读取出错时打印警告并跳过文件的剩余部分"""
+    dtypes = {column: CSV_DTYPES[column] for column in columns if column != 'CreateTime'}
+    try:
+        with pd.read_csv(file, usecols=columns, dtype=dtypes, chunksize=chunk_size) as reader:
+            for chunk in reader:
+                chunk['CreateTime'] = pd.to_datetime(chunk['CreateTime'])
+                _fill_sender(chunk)
+                if not chunk['CreateTime'].is_monotonic_increasing:
+                    chunk = chunk.sort_values('CreateTime', kind='stable')
+                yield chunk
+    except Exception as e:
+        print(f"警告：读取文件 {file} 时出错: {str(e)}")
+
+
+def _read_csv_files(files: List[Path]) -> List[Optional[pd.DataFrame]]:
+    """在工作进程中读取一批CSV文件，读取失败的文件返回 None"""
+    results = []
+    for file in files:
+        try:
+            results.append(_read_csv_file(file))
+        except Exception as e:
+            print(f"警告：读取文件 {file} 时出错: {str(e)}")
+            results.append(None)
+    return results
+
 
 @dataclass
 class ChatData:
     """聊天数据结构"""
     users: Dict
-    messages: Any  # 可以是 DataFrame 或 list
+    messages: MessageTable
     stats: Dict
+    index: Optional[MessageIndex] = None  # 定长消息索引
 
     def to_dict(self) -> Dict:
-        """转换为可序列化的字典"""
+        """转换为字典，消息仍为类型化的消息表"""
         return {
             'users': self.users,
-            'messages': self.messages.to_dict('records') if isinstance(self.messages, pd.DataFrame) else self.messages,
+            'messages': self.messages,
+            'stats': self.stats,
+            'index': self.index
+        }
+
+    def to_json_dict(self) -> Dict:
+        """转换为可序列化为 JSON 的字典（逐行消息，用于导出）"""
+        return {
+            'users': self.users,
+            'messages': self.messages.to_records(),
             'stats': self.stats
         }
 
@@ -51,40 +143,105 @@ class ChatReader:
         # 按照起始索引排序
         return sorted(csv_files, key=get_start_index)
 
-    def read_chat_data(self) -> ChatData:
-        """读取并处理聊天记录数据"""
-        # 读取用户信息
-        users = self.read_users()
+    @staticmethod
+    def fingerprint(file: Path) -> Dict:
+        """文件指纹：文件名、大小、修改时间和内容哈希，用于判断文件是否已导入"""
+        digest = hashlib.sha1()
+        with file.open('rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        stat = file.stat()
+        return {
+            'name': file.name,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': digest.hexdigest()
+        }
 
-        # 读取所有CSV文件并合并
-        chat_files = self.find_chat_files()
-        dfs = []
-        
+    def read_messages(self, chat_files: List[Path], max_workers: Optional[int] = None) -> MessageTable:
+        """读取指定的聊天记录CSV文件，按消息键去重并按时间排序
+
+        各文件在进程池中并行读取，只读取分析用到的列并指定列类型，每个文件读取后已按时间排序。
+        导出文件之间通常已按时间先后排列，拼接后即有序；否则对拼接结果做稳定排序，
+        由 timsort 识别并归并各文件的有序段。读取结果全部在内存中，超出内存的导出应使用 iter_messages。
+        Args:
+            chat_files: CSV文件列表，按导出顺序排列
+            max_workers: 进程池大小，None 表示使用 CPU 核数
+        """
+        dfs = [df for df in map_chunks(_read_csv_files, chat_files, chunk_size=1, max_workers=max_workers)
+               if df is not None]
+
+        if not dfs:
+            raise Exception("没有成功读取任何聊天记录文件")
+
+        # 合并所有数据框（各文件的类别不同，合并后重新转为类别类型）
+        df = pd.concat(dfs, ignore_index=True)
+        df['type_name'] = df['type_name'].astype('category')
+
+        # 按时间排序：各文件已有序，只在文件之间时间交叠时排序。numpy 对 int64 的稳定排序为
+        # timsort，k 个有序段只需逐段归并（O(n log k)），比在 Python 中显式做 k 路归并快一个数量级以上
+        if not df['CreateTime'].is_monotonic_increasing:
+            times = df['CreateTime'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+            df = df.iloc[np.argsort(times, kind='stable')].reset_index(drop=True)
+
+        # 按消息键去重，保留最先出现的一条
+        return MessageTable.from_frame(df[~pd.Series(message_keys(df)).duplicated().to_numpy()])
+
+    def iter_messages(self, chat_files: List[Path],
+                      chunk_size: int = IngestConfig.CHUNK_SIZE) -> Iterator[MessageTable]:
+        """按固定大小分块依次读取CSV文件，逐块产出去重后的消息
+
+        同一时刻只有一块消息在内存中，另外为跨块去重保存每条消息的8字节消息键。
+        要求导出文件按时间先后排列（PyWxDump 按消息序号分文件导出即是如此），
+        若后一块早于已产出的消息则抛出 UnorderedExportError，调用方可改用 read_messages。
+        与 read_messages 一样，读取出错的文件打印警告后跳过（出错前已产出的块保留）。
+        Args:
+            chat_files: CSV文件列表，按导出顺序排列
+            chunk_size: 每块的消息数
+        """
+        file_columns = {}
         for file in chat_files:
             try:
-                df = pd.read_csv(file)
-                dfs.append(df)
+                file_columns[file] = _csv_columns(file)
             except Exception as e:
                 print(f"警告：读取文件 {file} 时出错: {str(e)}")
-                continue
+        by_id = all('MsgSvrID' in columns for columns in file_columns.values())
+        seen_keys = np.empty(0, dtype=np.uint64)
+        last_time = None
 
-        if not dfs:
-            raise Exception("没有成功读取任何聊天记录文件")
+        for file, columns in file_columns.items():
+            for chunk in _iter_csv_chunks(file, columns, chunk_size):
+                if last_time is not None and chunk['CreateTime'].iloc[0] < last_time:
+                    raise UnorderedExportError(f"聊天记录文件未按时间先后排列，无法流式导入: {file}")
 
-        # 合并所有数据框
-        df = pd.concat(dfs, ignore_index=True)
-        
-        # 去重（以防万一）
-        df = df.drop_duplicates()
-        
-        # 按时间排序
-        df['CreateTime'] = pd.to_datetime(df['CreateTime'])
-        df = df.sort_values('CreateTime')
+                # 按消息键去重：块内重复及与之前各块重复的消息
+                keys = message_keys(chunk, by_id)
+                keep = ~pd.Series(keys).duplicated().to_numpy()
+                if len(seen_keys):
+                    positions = np.minimum(np.searchsorted(seen_keys, keys), len(seen_keys) - 1)
+                    keep &= seen_keys[positions] != keys
+                chunk = chunk[keep]
+                if chunk.empty:
+                    continue
+
+                new_keys = np.sort(keys[keep])
+                seen_keys = np.insert(seen_keys, np.searchsorted(seen_keys, new_keys), new_keys)
+                last_time = chunk['CreateTime'].iloc[-1]
+                yield MessageTable.from_frame(chunk)
+
+    def read_chat_data(self) -> ChatData:
+        """读取并处理聊天记录数据"""
+        # 读取用户信息
+        users = self.read_users()
+
+        # 读取所有CSV文件并合并
+        messages = self.read_messages(self.find_chat_files())
 
         return ChatData(
             users=users,
-            messages=df,
-            stats=self._calculate_stats(df)
+            messages=messages,
+            stats=self._calculate_stats(messages.frame),
+            index=MessageIndex.from_frame(messages.frame)
         )
 
     @staticmethod
@@ -94,20 +251,49 @@ class ChatReader:
             'total_messages': len(df),
             'start_time': df['CreateTime'].min().strftime('%Y-%m-%d %H:%M:%S'),
             'end_time': df['CreateTime'].max().strftime('%Y-%m-%d %H:%M:%S'),
-            'message_types': df['type_name'].value_counts().to_dict()
+            'message_types': df['type_name'].value_counts().loc[lambda counts: counts > 0].to_dict()
         }
 
 
+def has_message_ids(df: pd.DataFrame) -> bool:
+    """消息是否带有服务器消息ID（MsgSvrID）列"""
+    return 'MsgSvrID' in df.columns
+
+
+def message_keys(df: pd.DataFrame, by_id: Optional[bool] = None) -> np.ndarray:
+    """消息键（uint64），用于在多次导入之间识别同一条消息
+    Args:
+        df: 消息数据
+        by_id: 是否使用服务器消息ID（MsgSvrID）作为键，缺少ID的消息仍使用时间、发送方和消息内容；
+               None 表示有该列时使用。比较两批消息时两边应取相同的值
+    """
+    if by_id is None:
+        by_id = has_message_ids(df)
+    missing = df['MsgSvrID'].isna().to_numpy() if by_id else np.ones(len(df), dtype=bool)
+
+    keys = np.empty(len(df), dtype=np.uint64)
+    if by_id:
+        keys[~missing] = pd.util.hash_array(df['MsgSvrID'][~missing].to_numpy(dtype=np.int64))
+    if missing.any():
+        rows = df[missing]
+        keys[missing] = pd.util.hash_pandas_object(pd.DataFrame({
+            'CreateTime': pd.to_datetime(rows['CreateTime']).to_numpy(dtype='datetime64[ns]').astype(np.int64),
+            'is_sender': rows['is_sender'].astype(np.int64).to_numpy(),
+            'msg': rows['msg'].fillna('').astype(str).to_numpy(dtype=object)
+        }), index=False).to_numpy()
+    return keys
+
+
 def read_chat_data(chat_dir: str) -> Dict:
     """读取聊天记录的主函数
     Args:
         chat_dir: 聊天记录目录路径
     Returns:
-        dict: 包含用户信息和聊天记录的数据结构
+        dict: 包含用户信息、消息表（MessageTable）、基础统计和消息索引的数据结构
     """
     try:
         reader = ChatReader(chat_dir)
         chat_data = reader.read_chat_data()
-        return chat_data.to_dict()  # 返回可序列化的字典
+        return chat_data.to_dict()
     except Exception as e:
         raise Exception(f"读取聊天记录失败: {str(e)}")
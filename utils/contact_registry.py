@@ -0,0 +1,228 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import json
+import sqlite3
+
+from utils.sqlite_util import connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,  -- AUTOINCREMENT 保证删除后ID不被复用
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'ready',  -- importing: 首次导入中；ready: 可用
+    created_at TEXT NOT NULL,
+    total_messages INTEGER NOT NULL DEFAULT 0,
+    first_time TEXT,  -- 'YYYY-MM-DD HH:MM:SS'，可直接按字符串比较
+    last_time TEXT,
+    last_analyzed TEXT,
+    avatar_url TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_contacts_status_id ON contacts (status, id);
+CREATE INDEX IF NOT EXISTS idx_contacts_first_time ON contacts (first_time);
+CREATE INDEX IF NOT EXISTS idx_contacts_last_time ON contacts (last_time);
+CREATE TABLE IF NOT EXISTS contact_rollups (
+    contact_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,  -- 见 ROLLUP_KINDS
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (contact_id, kind, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS global_rollups (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+"""
+
+CONTACT_COLUMNS = ('id', 'name', 'path', 'status', 'created_at',
+                   'total_messages', 'first_time', 'last_time', 'last_analyzed', 'avatar_url')
+
+# 预先汇总的计数：type 消息类型，hour 小时（'0'-'23'），day 日期（'YYYY-MM-DD'）
+ROLLUP_KINDS = ('type', 'hour', 'day')
+
+
+class ContactRegistry:
+    """联系人注册表（SQLite）
+
+    保存联系人的名称、聊天记录路径和汇总信息（消息总数、首末消息时间、头像、最近分析时间），
+    每次操作只读写相关的行。另外维护每个联系人和全部联系人的按类型、小时、日期的
+    消息计数：联系人的计数变化时按差值更新全局计数，读取全局计数与联系人数量无关。联系人ID由数据库自增分配，并发创建时也不会重复。
+    每次操作使用独立的连接，可在多线程的 Flask 服务中使用。
+    """
+
+    def __init__(self, db_path: Path, legacy_file: Optional[Path] = None):
+        """
+        Args:
+            db_path: 数据库文件路径
+            legacy_file: 旧版 contacts.json，数据库首次创建时导入其中的联系人
+        """
+        self.db_path = Path(db_path)
+        is_new = not self.db_path.exists()
+        with connect(self.db_path) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            # 旧版数据库没有头像列
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(contacts)')}
+            if 'avatar_url' not in columns:
+                conn.execute('ALTER TABLE contacts ADD COLUMN avatar_url TEXT')
+        if is_new and legacy_file is not None:
+            self.migrate_json(Path(legacy_file))
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def migrate_json(self, legacy_file: Path) -> None:
+        """导入旧版 contacts.json 中的联系人（保留原ID），此后不再读取该文件"""
+        if not legacy_file.exists():
+            return
+        contacts = json.loads(legacy_file.read_text(encoding='utf-8'))
+        now = self._now()
+        with connect(self.db_path) as conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO contacts (id, name, path, created_at) VALUES (?, ?, ?, ?)',
+                [(c['id'], c['name'], c['path'], now) for c in contacts])
+
+    def list_contacts(self, include_pending: bool = False) -> List[Dict]:
+        """按ID顺序列出联系人
+        Args:
+            include_pending: 是否包含首次导入尚未完成的联系人
+        """
+        sql = f'SELECT {", ".join(CONTACT_COLUMNS)} FROM contacts'
+        if not include_pending:
+            sql += " WHERE status = 'ready'"
+        with connect(self.db_path) as conn:
+            return [dict(row) for row in conn.execute(sql + ' ORDER BY id')]
+
+    def recent(self, limit: int) -> List[Dict]:
+        """最近创建的联系人（按ID从旧到新）"""
+        with connect(self.db_path) as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(CONTACT_COLUMNS)} FROM contacts WHERE status = 'ready' "
+                'ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def page(self, offset: int, limit: int) -> Tuple[List[Dict], int]:
+        """按ID顺序分页列出联系人，返回 (本页联系人, 联系人总数)"""
+        with connect(self.db_path) as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(CONTACT_COLUMNS)} FROM contacts WHERE status = 'ready' "
+                'ORDER BY id LIMIT ? OFFSET ?', (limit, offset)).fetchall()
+            total = conn.execute("SELECT COUNT(*) FROM contacts WHERE status = 'ready'").fetchone()[0]
+        return [dict(row) for row in rows], total
+
+    def get(self, contact_id: int) -> Optional[Dict]:
+        """获取联系人，不存在时返回 None"""
+        with connect(self.db_path) as conn:
+            row = conn.execute(f'SELECT {", ".join(CONTACT_COLUMNS)} FROM contacts WHERE id = ?',
+                               (contact_id,)).fetchone()
+        return dict(row) if row else None
+
+    def create(self, name: str, path: str) -> int:
+        """新建联系人（状态为导入中），返回分配的ID"""
+        with connect(self.db_path) as conn:
+            cursor = conn.execute(
+                "INSERT INTO contacts (name, path, status, created_at) VALUES (?, ?, 'importing', ?)",
+                (name, path, self._now()))
+            return cursor.lastrowid
+
+    def mark_ready(self, contact_id: int) -> None:
+        """标记首次导入完成，联系人的计数从此计入全局计数"""
+        with connect(self.db_path) as conn:
+            updated = conn.execute("UPDATE contacts SET status = 'ready' WHERE id = ? AND status != 'ready'",
+                                   (contact_id,)).rowcount
+            if updated:
+                self._add_to_global(conn, self._contact_rollup_rows(conn, contact_id), 1)
+
+    def rename(self, contact_id: int, name: str) -> bool:
+        """修改联系人名称，联系人不存在时返回 False"""
+        with connect(self.db_path) as conn:
+            return conn.execute('UPDATE contacts SET name = ? WHERE id = ?', (name, contact_id)).rowcount > 0
+
+    def delete(self, contact_id: int) -> None:
+        """删除联系人及其计数"""
+        with connect(self.db_path) as conn:
+            if self._is_ready(conn, contact_id):
+                self._add_to_global(conn, self._contact_rollup_rows(conn, contact_id), -1)
+            conn.execute('DELETE FROM contact_rollups WHERE contact_id = ?', (contact_id,))
+            conn.execute('DELETE FROM contacts WHERE id = ?', (contact_id,))
+
+    def update_summary(self, contact_id: int, total_messages: int, first_time: Optional[str],
+                       last_time: Optional[str], avatar_url: str = '', analyzed_at: Optional[str] = None) -> None:
+        """更新联系人的消息总数、首末消息时间和头像，并记录分析时间（默认为当前时间）"""
+        with connect(self.db_path) as conn:
+            conn.execute(
+                'UPDATE contacts SET total_messages = ?, first_time = ?, last_time = ?, avatar_url = ?, '
+                'last_analyzed = ? WHERE id = ?',
+                (total_messages, first_time, last_time, avatar_url, analyzed_at or self._now(), contact_id))
+
+    def totals(self) -> Dict:
+        """全部联系人的数量、消息总数和首末消息时间"""
+        with connect(self.db_path) as conn:
+            row = conn.execute(
+                'SELECT COUNT(*) AS contact_count, COALESCE(SUM(total_messages), 0) AS total_messages, '
+                "MIN(first_time) AS first_time, MAX(last_time) AS last_time FROM contacts WHERE status = 'ready'"
+            ).fetchone()
+        return dict(row)
+
+    @staticmethod
+    def _is_ready(conn: sqlite3.Connection, contact_id: int) -> bool:
+        row = conn.execute('SELECT status FROM contacts WHERE id = ?', (contact_id,)).fetchone()
+        return row is not None and row['status'] == 'ready'
+
+    @staticmethod
+    def _contact_rollup_rows(conn: sqlite3.Connection, contact_id: int) -> List[Tuple[str, str, int]]:
+        return [tuple(row) for row in conn.execute(
+            'SELECT kind, key, count FROM contact_rollups WHERE contact_id = ?', (contact_id,))]
+
+    @staticmethod
+    def _add_to_global(conn: sqlite3.Connection, rows: List[Tuple[str, str, int]], sign: int) -> None:
+        """将 (kind, key, count) 按 sign 加到全局计数上，并删除减为0的键"""
+        conn.executemany(
+            'INSERT INTO global_rollups (kind, key, count) VALUES (?, ?, ?) '
+            'ON CONFLICT (kind, key) DO UPDATE SET count = count + excluded.count',
+            [(kind, key, sign * count) for kind, key, count in rows])
+        conn.execute('DELETE FROM global_rollups WHERE count = 0')
+
+    def replace_rollups(self, contact_id: int, rollups: Dict[str, Dict[str, int]]) -> None:
+        """替换联系人的计数，已完成导入的联系人同时按差值更新全局计数
+        Args:
+            contact_id: 联系人ID
+            rollups: {kind: {key: count}}，kind 见 ROLLUP_KINDS
+        """
+        rows = [(kind, str(key), int(count))
+                for kind in ROLLUP_KINDS for key, count in rollups.get(kind, {}).items() if count]
+        with connect(self.db_path) as conn:
+            if self._is_ready(conn, contact_id):
+                delta: Dict[Tuple[str, str], int] = {}
+                for kind, key, count in self._contact_rollup_rows(conn, contact_id):
+                    delta[kind, key] = -count
+                for kind, key, count in rows:
+                    delta[kind, key] = delta.get((kind, key), 0) + count
+                self._add_to_global(conn, [(kind, key, count) for (kind, key), count in delta.items() if count], 1)
+            conn.execute('DELETE FROM contact_rollups WHERE contact_id = ?', (contact_id,))
+            conn.executemany('INSERT INTO contact_rollups (contact_id, kind, key, count) VALUES (?, ?, ?, ?)',
+                             [(contact_id, kind, key, count) for kind, key, count in rows])
+
+    def rollups(self, contact_id: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """联系人（None 表示全部联系人）的计数 {kind: {key: count}}，键按升序排列"""
+        with connect(self.db_path) as conn:
+            if contact_id is None:
+                rows = conn.execute('SELECT kind, key, count FROM global_rollups ORDER BY kind, key')
+            else:
+                rows = conn.execute('SELECT kind, key, count FROM contact_rollups WHERE contact_id = ? '
+                                    'ORDER BY kind, key', (contact_id,))
+            result: Dict[str, Dict[str, int]] = {kind: {} for kind in ROLLUP_KINDS}
+            for kind, key, count in rows:
+                result[kind][key] = count
+        return result
+
+    def contacts_without_rollups(self) -> List[int]:
+        """尚无计数的联系人ID（如升级前导入的联系人）"""
+        with connect(self.db_path) as conn:
+            return [row['id'] for row in conn.execute(
+                'SELECT id FROM contacts WHERE NOT EXISTS '
+                '(SELECT 1 FROM contact_rollups WHERE contact_id = contacts.id) ORDER BY id')]
@@ -1,18 +1,38 @@
 from pathlib import Path
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, List
 import json
 from datetime import datetime, date
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from dataclasses import dataclass
 
+from utils.analyzers.aggregates import ChatAggregates
+from utils.analyzers.message_length import MessageLengthStats
+from utils.contact_registry import ContactRegistry
+from utils.file_cache import CacheConfig, FileCache, estimate_size
+from utils.image_cache import ImageCache
+from utils.message_index import MessageIndex, MessageIndexWriter
+from utils.message_table import MESSAGE_SCHEMA, MessageTable
+
 
 @dataclass
 class DataPaths:
     """数据路径配置"""
     BASE_DIR: Path = Path('data')
     CONTACTS_DIR: Path = BASE_DIR / 'contacts'
-    CONTACTS_FILE: Path = BASE_DIR / 'contacts.json'
+    CONTACTS_FILE: Path = BASE_DIR / 'contacts.json'  # 旧版联系人列表，迁移到 CONTACTS_DB 后不再使用
+    CONTACTS_DB: Path = BASE_DIR / 'contacts.db'  # 联系人注册表
+    JOBS_DB: Path = BASE_DIR / 'jobs.db'  # 后台任务表
+    MESSAGES_FILE: str = 'messages.parquet'  # 列式消息存储
+    RAW_META_FILE: str = 'raw_meta.json'  # 用户信息和基础统计
+    LEGACY_RAW_FILE: str = 'raw_data.json'  # 旧版原始数据文件
+    INGEST_MANIFEST_FILE: str = 'ingest_manifest.json'  # 已导入的CSV文件清单
+    AGGREGATES_FILE: str = 'aggregates.npz'  # 基础分析和交互分析的可合并中间结果
+    RESPONSES_DIR: str = 'responses'  # 预先生成并压缩的 API 响应
+    MESSAGE_LENGTH_FILE: str = 'basic/message_length.npz'  # 消息长度的可合并中间结果
+    IMAGE_CACHE_DIR: Path = BASE_DIR / 'images'  # 图片代理的磁盘缓存
 
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -30,12 +50,94 @@ class DateTimeEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+# 进程内共享的文件缓存，所有 DataManager 实例共用
+file_cache = FileCache()
+
+
+def _avatar_url(users: Dict) -> str:
+    """取用户信息中第一个用户（聊天对象）的头像URL，统一使用 https"""
+    if not users:
+        return ''
+    avatar_url = next(iter(users.values())).get('headImgUrl', '') or ''
+    if avatar_url.startswith('http://'):
+        avatar_url = avatar_url.replace('http://', 'https://')
+    return avatar_url
+
+
+def _moments_background_url(users: Dict) -> str:
+    """取第一个用户的朋友圈背景图片URL，与分析页面一致，将 shmmsns.qpic.cn 的地址转为 https"""
+    if not users:
+        return ''
+    url = (next(iter(users.values())).get('ExtraBuf') or {}).get('朋友圈背景', '') or ''
+    if url.startswith('http://shmmsns.qpic.cn'):
+        url = url.replace('http://', 'https://')
+    return url
+
+
+class MessageStoreWriter:
+    """分块写入联系人的消息存储
+
+    每块消息写为 Parquet 的一个行组，同时追加到消息索引，内存占用只与块大小有关。
+    消息先写入临时文件，关闭时替换正式文件；出错时丢弃临时文件，原有消息和索引不受影响。
+    """
+
+    def __init__(self, contact_dir: Path, paths: DataPaths):
+        self.path = contact_dir / paths.MESSAGES_FILE
+        self.tmp_path = self.path.with_suffix('.tmp')
+        self._writer = None  # 首块写入时按其表结构（含 pandas 元数据）创建，读回时列类型与一次写入一致
+        self._index = MessageIndexWriter(contact_dir)
+
+    def append(self, messages: MessageTable) -> MessageTable:
+        """写入一块按时间排序的消息，返回补齐各列后的消息表"""
+        messages = MessageTable.from_frame(messages.frame.reindex(columns=MESSAGE_SCHEMA.names))
+        table = messages.to_arrow()
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.tmp_path, table.schema)
+        self._writer.write_table(table)
+        self._index.append(messages.frame)
+        return messages
+
+    def close(self) -> None:
+        if self._writer is None:
+            raise ValueError('没有写入任何消息')
+        self._writer.close()
+        self._index.close()
+        self.tmp_path.replace(self.path)
+        file_cache.invalidate(self.path)
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._index.abort()
+        self.tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> 'MessageStoreWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
 class DataManager:
     def __init__(self):
         """初始化数据管理器"""
         self.paths = DataPaths()
+        self.cache = file_cache
         self.paths.BASE_DIR.mkdir(exist_ok=True)
         self.paths.CONTACTS_DIR.mkdir(exist_ok=True)
+        self.contacts = ContactRegistry(self.paths.CONTACTS_DB, legacy_file=self.paths.CONTACTS_FILE)
+        self.images = ImageCache(self.paths.IMAGE_CACHE_DIR)
+
+    def run_startup_maintenance(self) -> None:
+        """启动时的一次性数据维护：迁移旧版数据并补充联系人汇总信息
+
+        只应在应用启动时由主进程调用一次（见 app.create_app），不在构造函数中执行。
+        """
+        self.migrate_raw_data()
+        self.backfill_contact_summaries()
 
     def _get_contact_dir(self, contact_id: int) -> Path:
         """获取联系人数据目录"""
@@ -51,18 +153,192 @@ class DataManager:
         """保存JSON数据"""
         with path.open('w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2, cls=DateTimeEncoder)
+        self.cache.invalidate(path)
 
-    def _load_json(self, path: Path) -> Optional[Dict]:
-        """加载JSON数据"""
+    @staticmethod
+    def _read_json(path: Path) -> Optional[Dict]:
+        """读取JSON数据（不经过缓存）"""
         if path.exists():
             with path.open('r', encoding='utf-8') as f:
                 return json.load(f)
         return None
 
+    def _load_json(self, path: Path) -> Optional[Dict]:
+        """加载JSON数据（经过进程内缓存，返回的对象只读）"""
+        def load():
+            data = self._read_json(path)
+            return data, estimate_size(data)
+        return self.cache.get(path, load)
+
     def save_raw_data(self, contact_id: int, chat_data: Dict) -> None:
-        """保存原始聊天记录"""
-        path = self._get_contact_dir(contact_id) / 'raw_data.json'
-        self._save_json(path, chat_data)
+        """保存原始聊天记录
+
+        消息以列式 Parquet 文件保存，用户信息和基础统计保存在单独的 JSON 文件中。
+        消息存储写入临时文件后替换，替换完成后才更新消息索引，中途出错时原有消息和索引保持一致。
+        """
+        contact_dir = self._get_contact_dir(contact_id)
+        messages = MessageTable.of(chat_data['messages'])
+        messages.write_parquet(contact_dir / self.paths.MESSAGES_FILE)
+        # 替换完成后再使缓存失效，避免并发读取在替换前重新缓存旧文件
+        self.cache.invalidate(contact_dir / self.paths.MESSAGES_FILE)
+        self.save_raw_meta(contact_id, chat_data.get('users', {}), chat_data.get('stats', {}))
+
+        index = chat_data.get('index') or MessageIndex.from_frame(messages.frame)
+        index.save(contact_dir)
+
+    def save_raw_meta(self, contact_id: int, users: Dict, stats: Dict) -> None:
+        """保存用户信息和基础统计"""
+        self._save_json(self._get_contact_dir(contact_id) / self.paths.RAW_META_FILE, {
+            'users': users,
+            'stats': stats
+        })
+
+    def open_message_writer(self, contact_id: int) -> MessageStoreWriter:
+        """打开分块写入消息存储的写入器（用于流式导入），应配合 with 使用"""
+        return MessageStoreWriter(self._get_contact_dir(contact_id), self.paths)
+
+    def load_messages(self, contact_id: int,
+                      columns: Optional[List[str]] = None) -> Optional[MessageTable]:
+        """按列加载消息表（经过进程内缓存，返回的消息表只读）
+        Args:
+            contact_id: 联系人ID
+            columns: 需要读取的列，None 表示读取全部列
+        """
+        def load():
+            table = pq.read_table(path, columns=columns)
+            # 字符串列转换为 DataFrame 后每个值是一个 Python 对象，另计其开销
+            string_columns = sum(pa.types.is_string(field.type) for field in table.schema)
+            size = table.nbytes + CacheConfig.STRING_OBJECT_OVERHEAD * table.num_rows * string_columns
+            return MessageTable.from_arrow(table), size
+
+        path = self._get_contact_dir(contact_id) / self.paths.MESSAGES_FILE
+        return self.cache.get(path, load, variant=tuple(columns) if columns else None)
+
+    def get_cache_path(self, contact_id: int, file_name: str) -> Path:
+        """获取联系人缓存文件路径（如情感分数缓存）"""
+        cache_dir = self._get_contact_dir(contact_id) / 'cache'
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        return cache_dir / file_name
+
+    def get_response_dir(self, contact_id: int) -> Path:
+        """获取联系人预先生成的 API 响应目录"""
+        return self._get_contact_dir(contact_id) / self.paths.RESPONSES_DIR
+
+    def analysis_sources(self, contact_id: int, analysis_type: str, data_types: List[str]) -> List[Path]:
+        """分析数据所依赖的文件（中间结果及各数据类型的 JSON 文件），用于判断由其生成的响应是否过期"""
+        contact_dir = self._get_contact_dir(contact_id)
+        sources = [contact_dir / self.paths.AGGREGATES_FILE]
+        for data_type in data_types:
+            if (analysis_type, data_type) == ('basic', 'message_length'):
+                sources.append(contact_dir / self.paths.MESSAGE_LENGTH_FILE)
+            else:
+                sources.append(contact_dir / analysis_type / f'{data_type}.json')
+        return sources
+
+    def load_message_index(self, contact_id: int) -> Optional[MessageIndex]:
+        """以内存映射方式打开消息索引"""
+        return MessageIndex.open(self._get_contact_dir(contact_id))
+
+    def load_raw_meta(self, contact_id: int) -> Optional[Dict]:
+        """加载用户信息和基础统计"""
+        return self._load_json(self._get_contact_dir(contact_id) / self.paths.RAW_META_FILE)
+
+    def contact_image_urls(self, contact_id: int) -> List[str]:
+        """联系人页面通过图片代理显示的图片（头像、朋友圈背景）的URL"""
+        users = (self.load_raw_meta(contact_id) or {}).get('users', {})
+        return [url for url in (_avatar_url(users), _moments_background_url(users)) if url]
+
+    def update_contact_summary(self, contact_id: int, analyzed_at: Optional[str] = None) -> None:
+        """按已保存的用户信息、基础统计和分析数据更新注册表中联系人的消息总数、
+        首末消息时间、头像和按类型、小时、日期的消息计数
+        """
+        meta = self.load_raw_meta(contact_id)
+        stats = meta.get('stats', {}) if meta else {}
+        self.contacts.update_summary(contact_id, stats.get('total_messages', 0),
+                                     stats.get('start_time'), stats.get('end_time'),
+                                     _avatar_url(meta.get('users', {}) if meta else {}), analyzed_at)
+        self.contacts.replace_rollups(contact_id, self.compute_rollups(contact_id))
+
+    def compute_rollups(self, contact_id: int) -> Dict[str, Dict[str, int]]:
+        """由基础分析数据取出联系人按类型、小时、日期的消息计数"""
+        message_stats = self.load_analysis_data(contact_id, 'basic', 'message_stats') or {}
+        time_stats = self.load_analysis_data(contact_id, 'basic', 'time_stats') or {}
+        daily_stats = self.load_analysis_data(contact_id, 'basic', 'daily_stats') or {}
+        return {
+            'type': message_stats.get('type_counts', {}),
+            'hour': time_stats.get('hourly_counts', {}),
+            'day': daily_stats.get('daily_counts', {})
+        }
+
+    def backfill_contact_summaries(self) -> None:
+        """为尚无汇总信息或头像的联系人（如从 contacts.json 迁移而来）补充汇总信息（一次性）"""
+        for contact in self.contacts.list_contacts():
+            if contact['last_analyzed'] is not None and contact['avatar_url'] is not None:
+                continue
+            meta_file = self._get_contact_dir(contact['id']) / self.paths.RAW_META_FILE
+            if meta_file.exists():
+                analyzed_at = (contact['last_analyzed'] or
+                               datetime.fromtimestamp(meta_file.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S'))
+                self.update_contact_summary(contact['id'], analyzed_at)
+
+        # 升级前导入的联系人没有预先汇总的计数
+        for contact_id in self.contacts.contacts_without_rollups():
+            self.contacts.replace_rollups(contact_id, self.compute_rollups(contact_id))
+
+    def load_ingest_manifest(self, contact_id: int) -> List[Dict]:
+        """加载已导入的CSV文件清单（文件名、大小、修改时间、内容哈希）"""
+        manifest = self._load_json(self._get_contact_dir(contact_id) / self.paths.INGEST_MANIFEST_FILE)
+        return manifest['files'] if manifest else []
+
+    def save_ingest_manifest(self, contact_id: int, files: List[Dict]) -> None:
+        """保存已导入的CSV文件清单"""
+        self._save_json(self._get_contact_dir(contact_id) / self.paths.INGEST_MANIFEST_FILE, {'files': files})
+
+    def load_aggregates(self, contact_id: int) -> Optional[ChatAggregates]:
+        """加载基础分析和交互分析的可合并中间结果（经过进程内缓存）"""
+        def load():
+            aggregates = ChatAggregates.load(path)
+            return aggregates, estimate_size(aggregates)
+
+        path = self._get_contact_dir(contact_id) / self.paths.AGGREGATES_FILE
+        return self.cache.get(path, load)
+
+    def save_aggregates(self, contact_id: int, aggregates: ChatAggregates) -> None:
+        """保存基础分析和交互分析的可合并中间结果
+
+        基础分析和交互分析数据在读取时由中间结果生成，不再单独保存为 JSON 文件，
+        旧版遗留的 JSON 文件在此一并删除。
+        """
+        contact_dir = self._get_contact_dir(contact_id)
+        aggregates.save(contact_dir / self.paths.AGGREGATES_FILE)
+        self.cache.invalidate(contact_dir / self.paths.AGGREGATES_FILE)
+        for analysis_type, data_types in ChatAggregates.RESULT_TYPES.items():
+            for data_type in data_types:
+                (contact_dir / analysis_type / f'{data_type}.json').unlink(missing_ok=True)
+
+    def load_message_length(self, contact_id: int) -> Optional[MessageLengthStats]:
+        """加载消息长度的可合并中间结果（经过进程内缓存）"""
+        def load():
+            stats = MessageLengthStats.load(path)
+            return stats, estimate_size(stats)
+
+        path = self._get_contact_dir(contact_id) / self.paths.MESSAGE_LENGTH_FILE
+        return self.cache.get(path, load)
+
+    def save_message_length(self, contact_id: int, stats: MessageLengthStats) -> None:
+        """保存消息长度的可合并中间结果，旧版遗留的 JSON 文件一并删除"""
+        contact_dir = self._get_contact_dir(contact_id)
+        stats.save(contact_dir / self.paths.MESSAGE_LENGTH_FILE)
+        self.cache.invalidate(contact_dir / self.paths.MESSAGE_LENGTH_FILE)
+        (contact_dir / 'basic' / 'message_length.json').unlink(missing_ok=True)
+
+    def backfill_message_length(self, contact_id: int) -> None:
+        """为升级前导入、尚无消息长度中间结果的联系人由消息存储计算（一次性）"""
+        if (self._get_contact_dir(contact_id) / self.paths.MESSAGE_LENGTH_FILE).exists():
+            return
+        messages = self.load_messages(contact_id, columns=['CreateTime', 'is_sender', 'type_name', 'msg'])
+        if messages is not None:
+            self.save_message_length(contact_id, MessageLengthStats.from_frame(messages.frame))
 
     def save_analysis_data(self, contact_id: int, analysis_type: str,
                            data_type: str, data: Dict) -> None:
@@ -72,14 +348,76 @@ class DataManager:
 
     def load_analysis_data(self, contact_id: int, analysis_type: str,
                            data_type: str) -> Optional[Dict]:
-        """加载分析数据"""
+        """加载分析数据
+
+        基础分析和交互分析数据由中间结果生成（生成结果与中间结果一同缓存）；
+        没有中间结果的旧数据读取 JSON 文件。返回的对象只读。
+        """
+        if (analysis_type, data_type) == ('basic', 'message_length'):
+            def render_length():
+                stats = self.load_message_length(contact_id)
+                data = stats.render() if stats is not None else None
+                return data, estimate_size(data)
+
+            length_path = self._get_contact_dir(contact_id) / self.paths.MESSAGE_LENGTH_FILE
+            return self.cache.get(length_path, render_length, variant='rendered')
+        if data_type in ChatAggregates.RESULT_TYPES.get(analysis_type, ()):
+            def render():
+                aggregates = self.load_aggregates(contact_id)
+                data = aggregates.render(analysis_type, data_type) if aggregates is not None else None
+                return data, estimate_size(data)
+
+            aggregates_path = self._get_contact_dir(contact_id) / self.paths.AGGREGATES_FILE
+            data = self.cache.get(aggregates_path, render, variant=(analysis_type, data_type))
+            if data is not None:
+                return data
         path = self._get_contact_dir(contact_id) / analysis_type / f'{data_type}.json'
         return self._load_json(path)
 
     def load_raw_data(self, contact_id: int) -> Optional[Dict]:
-        """加载原始聊天记录数据"""
-        path = self._get_contact_dir(contact_id) / 'raw_data.json'
-        return self._load_json(path)
+        """加载原始聊天记录数据（用户信息、消息表和基础统计）"""
+        meta = self.load_raw_meta(contact_id)
+        messages = self.load_messages(contact_id)
+        if meta is None or messages is None:
+            return None
+        return {
+            'users': meta.get('users', {}),
+            'messages': messages,
+            'stats': meta.get('stats', {})
+        }
+
+    def export_raw_data(self, contact_id: int, path: Path) -> bool:
+        """将原始聊天记录导出为旧版 raw_data.json 格式（逐行消息），联系人无数据时返回 False"""
+        raw_data = self.load_raw_data(contact_id)
+        if raw_data is None:
+            return False
+        raw_data['messages'] = raw_data['messages'].to_records()
+        self._save_json(Path(path), raw_data)
+        return True
+
+    def migrate_raw_data(self) -> None:
+        """将旧版 raw_data.json 迁移为列式存储并补建消息索引（一次性）"""
+        for legacy_file in self.paths.CONTACTS_DIR.glob(f'*/{self.paths.LEGACY_RAW_FILE}'):
+            contact_dir = legacy_file.parent
+            if (contact_dir / self.paths.MESSAGES_FILE).exists():
+                continue
+            try:
+                chat_data = self._read_json(legacy_file)
+                self.save_raw_data(int(contact_dir.name), chat_data)
+                legacy_file.unlink()
+            except Exception as e:
+                print(f"警告：迁移 {legacy_file} 时出错: {str(e)}")
+
+        # 为已有的列式存储补建消息索引
+        for messages_file in self.paths.CONTACTS_DIR.glob(f'*/{self.paths.MESSAGES_FILE}'):
+            contact_dir = messages_file.parent
+            if MessageIndex.open(contact_dir) is not None:
+                continue
+            try:
+                messages = MessageTable.read_parquet(messages_file, columns=['CreateTime', 'is_sender', 'type_name'])
+                MessageIndex.from_frame(messages.frame).save(contact_dir)
+            except Exception as e:
+                print(f"警告：为 {contact_dir} 建立索引时出错: {str(e)}")
 
     def get_contact_data(self, contact_id: int) -> Dict:
         """获取联系人的所有分析数据"""
@@ -89,13 +427,16 @@ class DataManager:
             'semantic': {}
         }
 
+        aggregates = self.load_aggregates(contact_id)
+        if aggregates is not None:
+            result.update(aggregates.to_results())
+
         for analysis_type in result.keys():
             dir_path = self._get_contact_dir(contact_id) / analysis_type
             if dir_path.exists():
                 for file_name in dir_path.iterdir():
                     if file_name.is_file() and file_name.suffix == '.json':
                         data_type = file_name.stem  # 使用文件名作为数据类型
-                        result[analysis_type][data_type] = self.load_analysis_data(
-                            contact_id, analysis_type, data_type)
+                        result[analysis_type][data_type] = self._load_json(file_name)
 
         return result
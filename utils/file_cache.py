@@ -0,0 +1,142 @@
+from collections import OrderedDict
+from dataclasses import dataclass, fields, is_dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+import sys
+import threading
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class CacheConfig:
+    """内存缓存配置"""
+    MAX_BYTES: int = 512 * 1024 * 1024  # 缓存容量（字节），超出后按最近最少使用淘汰
+    STRING_OBJECT_OVERHEAD: int = 57  # 每个 Python 字符串对象及其指针的额外开销（字节）
+
+
+def estimate_size(obj: Any) -> int:
+    """估算对象占用的内存（字节）
+
+    数组按缓冲区大小计算，字典、列表和数据类递归累加，其余对象使用 sys.getsizeof。
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(index=False)))
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(estimate_size(item) for item in obj)
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return sys.getsizeof(obj) + sum(estimate_size(getattr(obj, f.name)) for f in fields(obj))
+    return sys.getsizeof(obj)
+
+
+class FileCache:
+    """按字节数限制容量的进程内 LRU 缓存，缓存从文件加载的对象
+
+    每项以 (文件路径, 变体) 为键，保存加载时文件的修改时间和大小；读取时先 stat
+    文件，二者任一变化即视为失效并重新加载。同一文件可以缓存多个变体（如按不同列
+    读取的消息表、同一中间结果生成的不同分析数据）。缓存的对象由各请求共享，只读使用。
+    可在多线程的 Flask 服务中并发使用。
+    """
+
+    def __init__(self, max_bytes: int = CacheConfig.MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Tuple[str, Hashable], Tuple[Tuple[int, int], Any, int]]' = OrderedDict()
+        self._keys_by_path: Dict[str, Set[Tuple[str, Hashable]]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path: Path, loader: Callable[[], Tuple[Any, int]], variant: Hashable = None) -> Any:
+        """读取缓存，未命中或已失效时调用 loader 加载
+        Args:
+            path: 数据所在的文件，用于校验缓存是否有效
+            loader: 加载函数，返回 (对象, 估算的字节数)
+            variant: 同一文件的不同缓存项
+        Returns:
+            缓存或新加载的对象；文件不存在时返回 None
+        """
+        path = Path(path)
+        key = (str(path), variant)
+        signature = self._signature(path)
+        if signature is None:
+            self.invalidate(path)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # 在锁外加载，不阻塞其他请求
+        value, size = loader()
+        # 加载期间文件被改写时不缓存，下次读取重新加载
+        if self._signature(path) == signature:
+            self._put(key, signature, value, size)
+        return value
+
+    def _put(self, key: Tuple[str, Hashable], signature: Tuple[int, int], value: Any, size: int) -> None:
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (signature, value, size)
+            self._keys_by_path.setdefault(key[0], set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: Tuple[str, Hashable]) -> None:
+        """删除一项（调用方持有锁）"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[2]
+        keys = self._keys_by_path.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_path[key[0]]
+
+    def invalidate(self, path: Path) -> None:
+        """删除某个文件的全部缓存项（写入文件后调用，不依赖修改时间的精度）"""
+        with self._lock:
+            for key in list(self._keys_by_path.get(str(Path(path)), ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_path.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """命中、未命中、淘汰次数及当前占用"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,238 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from utils.sqlite_util import connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    content_type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_urls_content_hash ON urls (content_hash);
+CREATE TABLE IF NOT EXISTS blobs (
+    content_hash TEXT PRIMARY KEY,  -- 图片内容的 SHA-256，同一图片的不同URL共用一份文件
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blobs_last_access ON blobs (last_access);
+"""
+
+
+@dataclass
+class ImageCacheConfig:
+    """图片代理缓存配置"""
+    MAX_BYTES: int = 256 * 1024 * 1024  # 磁盘缓存容量（字节），超出后按最近最少使用淘汰
+    MAX_IMAGE_BYTES: int = 10 * 1024 * 1024  # 单张图片的大小上限
+    CONNECT_TIMEOUT: float = 3.0  # 秒
+    READ_TIMEOUT: float = 10.0  # 秒
+    POOL_SIZE: int = 16  # 连接池中每个主机保持的连接数
+    RETRIES: int = 2  # 连接失败或上游 5xx 时的重试次数
+    PREFETCH_WORKERS: int = 2  # 后台预取图片的线程数
+    MAX_AGE: int = 7 * 24 * 3600  # 浏览器缓存时间（秒）
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Referer': 'https://wx.qq.com/'
+    }
+
+
+class ImageFetchError(Exception):
+    """获取图片失败"""
+
+
+@dataclass
+class CachedImage:
+    """缓存的图片"""
+    path: Path
+    content_hash: str  # 用作 ETag
+    content_type: str
+
+
+class ImageCache:
+    """图片代理的磁盘缓存
+
+    图片按内容的 SHA-256 保存为文件，URL 与内容的对应关系和访问时间记录在 SQLite
+    索引中，总大小超过容量时淘汰最久未访问的图片。下载使用共享的连接池并设置
+    超时；同一 URL 的并发请求只下载一次，其余请求等待其结果。
+    响应图片时应使用 open 返回的已打开文件：其他请求可能随时淘汰该图片的文件。
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = ImageCacheConfig.MAX_BYTES):
+        self.cache_dir = Path(cache_dir).resolve()  # send_file 按应用目录解析相对路径
+        self.blob_dir = self.cache_dir / 'blobs'
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / 'index.db'
+        self.max_bytes = max_bytes
+        with connect(self.db_path) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+        self._session = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=ImageCacheConfig.PREFETCH_WORKERS,
+                                                     thread_name_prefix='image-prefetch')
+
+    def _get_session(self):
+        """首次下载时创建共享连接池的会话（requests 导入较慢，不在启动时导入）"""
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(total=ImageCacheConfig.RETRIES, backoff_factor=0.3,
+                              status_forcelist=(502, 503, 504), allowed_methods=('GET',))
+                adapter = HTTPAdapter(pool_connections=ImageCacheConfig.POOL_SIZE,
+                                      pool_maxsize=ImageCacheConfig.POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update(ImageCacheConfig.HEADERS)
+                self._session = session
+            return self._session
+
+    def _blob_path(self, content_hash: str) -> Path:
+        return self.blob_dir / content_hash[:2] / content_hash
+
+    def lookup(self, url: str) -> Optional[CachedImage]:
+        """查找已缓存的图片并记录访问时间，未缓存时返回 None"""
+        with connect(self.db_path) as conn:
+            row = conn.execute('SELECT content_hash, content_type FROM urls WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+            content_hash, content_type = row
+            path = self._blob_path(content_hash)
+            if not path.exists():
+                conn.execute('DELETE FROM urls WHERE content_hash = ?', (content_hash,))
+                conn.execute('DELETE FROM blobs WHERE content_hash = ?', (content_hash,))
+                return None
+            conn.execute('UPDATE blobs SET last_access = ? WHERE content_hash = ?', (time.time(), content_hash))
+        return CachedImage(path, content_hash, content_type)
+
+    def get(self, url: str) -> CachedImage:
+        """获取图片，未缓存时下载；同一 URL 的并发请求共用一次下载
+        Raises:
+            ValueError: 不是 http/https 地址
+            ImageFetchError: 下载失败
+        """
+        if urlparse(url).scheme not in ('http', 'https'):
+            raise ValueError(f'不支持的图片地址: {url}')
+        cached = self.lookup(url)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._pending.get(url)
+            owner = future is None
+            if owner:
+                future = self._pending[url] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            image = self._download(url)
+            future.set_result(image)
+            return image
+        except Exception as e:
+            error = e if isinstance(e, ImageFetchError) else ImageFetchError(str(e))
+            future.set_exception(error)
+            raise error
+        finally:
+            with self._lock:
+                self._pending.pop(url, None)
+
+    def open(self, url: str) -> Tuple[CachedImage, BinaryIO]:
+        """获取图片并打开其文件，调用方负责关闭
+
+        查找或下载到打开文件之间图片可能被其他请求淘汰，此时按未缓存处理重新获取。
+        Raises:
+            ValueError: 不是 http/https 地址
+            ImageFetchError: 下载失败
+        """
+        for _ in range(2):
+            image = self.get(url)
+            try:
+                return image, image.path.open('rb')
+            except FileNotFoundError:
+                self.lookup(url)  # 清除失效的索引记录
+        raise ImageFetchError('图片在读取前被淘汰')
+
+    def _download(self, url: str) -> CachedImage:
+        with self._get_session().get(url, stream=True, timeout=(ImageCacheConfig.CONNECT_TIMEOUT,
+                                                                ImageCacheConfig.READ_TIMEOUT)) as response:
+            if response.status_code != 200:
+                raise ImageFetchError(f'上游返回 {response.status_code}')
+            content_type = response.headers.get('content-type', 'image/jpeg')
+            chunks, size = [], 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > ImageCacheConfig.MAX_IMAGE_BYTES:
+                    raise ImageFetchError('图片过大')
+                chunks.append(chunk)
+        return self._store(url, b''.join(chunks), content_type)
+
+    def _store(self, url: str, content: bytes, content_type: str) -> CachedImage:
+        """保存图片内容（内容相同的图片只保存一份），必要时淘汰旧图片"""
+        content_hash = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(content_hash)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+            temp_path.write_bytes(content)
+            os.replace(temp_path, path)
+
+        with connect(self.db_path) as conn:
+            conn.execute('INSERT INTO blobs (content_hash, size, last_access) VALUES (?, ?, ?) '
+                         'ON CONFLICT (content_hash) DO UPDATE SET last_access = excluded.last_access',
+                         (content_hash, len(content), time.time()))
+            conn.execute('INSERT OR REPLACE INTO urls (url, content_hash, content_type) VALUES (?, ?, ?)',
+                         (url, content_hash, content_type))
+        self._evict(keep=content_hash)
+        return CachedImage(path, content_hash, content_type)
+
+    def _evict(self, keep: str) -> None:
+        """总大小超过容量时，按最近访问时间从旧到新删除图片（不删除刚写入的图片）"""
+        with connect(self.db_path) as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evicted = []
+            for content_hash, size in conn.execute(
+                    'SELECT content_hash, size FROM blobs WHERE content_hash != ? ORDER BY last_access', (keep,)):
+                if total <= self.max_bytes:
+                    break
+                evicted.append(content_hash)
+                total -= size
+            conn.executemany('DELETE FROM urls WHERE content_hash = ?', [(h,) for h in evicted])
+            conn.executemany('DELETE FROM blobs WHERE content_hash = ?', [(h,) for h in evicted])
+        for content_hash in evicted:
+            try:
+                self._blob_path(content_hash).unlink(missing_ok=True)
+            except OSError as e:  # Windows 上正在被响应读取的文件无法删除；文件按内容命名，再次缓存同一图片时直接复用
+                print(f"警告：删除缓存图片 {content_hash} 失败: {str(e)}")
+
+    def prefetch(self, urls: Iterable[str]) -> None:
+        """在后台下载尚未缓存的图片（失败时忽略）"""
+        for url in dict.fromkeys(url for url in urls if url):
+            self._prefetch_executor.submit(self._prefetch_one, url)
+
+    def _prefetch_one(self, url: str) -> None:
+        try:
+            self.get(url)
+        except (ValueError, ImageFetchError) as e:
+            print(f"警告：预取图片 {url} 失败: {str(e)}")
+
+    def stats(self) -> Tuple[int, int]:
+        """缓存的图片数和总大小（字节）"""
+        with connect(self.db_path) as conn:
+            return tuple(conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone())
@@ -0,0 +1,245 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import json
+import sqlite3
+import threading
+import traceback
+
+from utils.sqlite_util import connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,  -- create: 新建联系人；update: 更新联系人数据
+    contact_id INTEGER,
+    status TEXT NOT NULL,  -- queued / running / succeeded / failed / cancelled
+    stage TEXT,  -- 当前阶段，见 JOB_STAGES
+    stages_done INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    cancellable INTEGER NOT NULL DEFAULT 1,
+    result TEXT,  -- 成功时的结果（JSON）
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS idx_jobs_contact_status ON jobs (contact_id, status);
+"""
+
+# 导入任务的阶段及界面显示名称，按执行顺序排列
+JOB_STAGES = {
+    'read': '读取聊天记录',
+    'save': '保存消息',
+    'analyze': '基础与交互分析',
+    'semantic': '语义预处理',
+}
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+@dataclass
+class JobConfig:
+    """后台任务配置"""
+    MAX_CONCURRENT_JOBS: int = 1  # 同时执行的任务数，导入本身已使用进程池并行
+    PRESEGMENT_TEXT: bool = True  # 导入后预先分词，语义分析页面直接读取分词缓存
+
+
+class JobCancelled(Exception):
+    """任务被取消"""
+
+
+class JobContext:
+    """传给任务函数的上下文，用于登记阶段进度和检查取消请求"""
+
+    def __init__(self, queue: 'JobQueue', job_id: int):
+        self.queue = queue
+        self.job_id = job_id
+
+    def stage(self, name: str) -> None:
+        """进入新阶段；可取消时若已请求取消则抛出 JobCancelled"""
+        self.check_cancelled()
+        self.queue.store.update(self.job_id, stage=name, stages_done=list(JOB_STAGES).index(name))
+
+    def check_cancelled(self) -> None:
+        """可取消时若已请求取消则抛出 JobCancelled"""
+        job = self.queue.get(self.job_id)
+        if job['cancellable'] and job['cancel_requested']:
+            raise JobCancelled()
+
+    def commit(self) -> None:
+        """进入写入数据的阶段：此后不再响应取消请求，保证已保存的数据完整一致"""
+        self.check_cancelled()
+        self.queue.store.update(self.job_id, cancellable=0)
+
+
+class NullJobContext(JobContext):
+    """不经任务队列直接执行时使用的上下文，不登记进度，也不会被取消"""
+
+    def __init__(self):
+        super().__init__(None, 0)
+
+    def stage(self, name: str) -> None:
+        pass
+
+    def check_cancelled(self) -> None:
+        pass
+
+    def commit(self) -> None:
+        pass
+
+
+class JobStore:
+    """任务表（SQLite），记录任务状态和阶段，服务重启后仍可查询"""
+
+    COLUMNS = ('id', 'kind', 'contact_id', 'status', 'stage', 'stages_done', 'cancel_requested',
+               'cancellable', 'result', 'error', 'created_at', 'started_at', 'finished_at')
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        with connect(self.db_path) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        job['cancellable'] = bool(job['cancellable'])
+        job['stage_name'] = JOB_STAGES.get(job['stage'], '')
+        job['stages_total'] = len(JOB_STAGES)
+        return job
+
+    def create(self, kind: str, contact_id: Optional[int]) -> int:
+        with connect(self.db_path) as conn:
+            return conn.execute(
+                "INSERT INTO jobs (kind, contact_id, status, created_at) VALUES (?, ?, 'queued', ?)",
+                (kind, contact_id, _now())).lastrowid
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with connect(self.db_path) as conn:
+            row = conn.execute(f'SELECT {", ".join(self.COLUMNS)} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, contact_id: Optional[int] = None, statuses: Optional[List[str]] = None,
+             limit: int = 50) -> List[Dict]:
+        """按创建时间倒序列出任务"""
+        sql, params = f'SELECT {", ".join(self.COLUMNS)} FROM jobs WHERE 1 = 1', []
+        if contact_id is not None:
+            sql += ' AND contact_id = ?'
+            params.append(contact_id)
+        if statuses:
+            sql += f' AND status IN ({", ".join("?" * len(statuses))})'
+            params.extend(statuses)
+        with connect(self.db_path) as conn:
+            rows = conn.execute(sql + ' ORDER BY id DESC LIMIT ?', (*params, limit)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def update(self, job_id: int, **fields) -> None:
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False)
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with connect(self.db_path) as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def fail_interrupted(self) -> List[Dict]:
+        """将上次运行时未完成的任务标记为失败，返回这些任务"""
+        interrupted = self.list(statuses=list(ACTIVE_STATUSES), limit=-1)
+        with connect(self.db_path) as conn:
+            conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                         "WHERE status IN ('queued', 'running')", ('服务重启，任务中断', _now()))
+        return interrupted
+
+
+class JobQueue:
+    """本地后台任务队列
+
+    任务登记在持久化的任务表中，由线程池按提交顺序执行，同时执行的任务数
+    不超过 max_workers。同一联系人同时只有一个未完成的任务，重复提交时返回已有的任务。
+    """
+
+    def __init__(self, db_path: Path, max_workers: int = JobConfig.MAX_CONCURRENT_JOBS):
+        self.store = JobStore(db_path)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+
+    def fail_interrupted(self) -> List[Dict]:
+        """将上次运行时未完成的任务标记为失败，返回这些任务；只应在服务启动时调用一次"""
+        return self.store.fail_interrupted()
+
+    def submit(self, kind: str, contact_id: Optional[int], fn: Callable[[JobContext], Optional[Dict]],
+               on_cancel: Optional[Callable[[], None]] = None) -> Dict:
+        """提交任务
+        Args:
+            kind: 任务类型
+            contact_id: 任务所属的联系人
+            fn: 任务函数，接收 JobContext，返回结果字典
+            on_cancel: 任务被取消（包括排队中取消）后的清理函数
+        Returns:
+            任务信息
+        """
+        with self._lock:
+            active = self.active_job(contact_id) if contact_id is not None else None
+            if active is not None:
+                return active
+            job_id = self.store.create(kind, contact_id)
+            self._executor.submit(self._run, job_id, fn, on_cancel)
+        return self.store.get(job_id)
+
+    def _run(self, job_id: int, fn: Callable[[JobContext], Optional[Dict]],
+             on_cancel: Optional[Callable[[], None]]) -> None:
+        if self.store.get(job_id)['cancel_requested']:
+            self._finish_cancelled(job_id, on_cancel)
+            return
+
+        self.store.update(job_id, status='running', started_at=_now())
+        try:
+            result = fn(JobContext(self, job_id))
+        except JobCancelled:
+            self._finish_cancelled(job_id, on_cancel)
+        except Exception as e:
+            traceback.print_exc()
+            self.store.update(job_id, status='failed', error=str(e), finished_at=_now())
+        else:
+            self.store.update(job_id, status='succeeded', stage=None, stages_done=len(JOB_STAGES),
+                              result=result or {}, finished_at=_now())
+
+    def _finish_cancelled(self, job_id: int, on_cancel: Optional[Callable[[], None]]) -> None:
+        if on_cancel is not None:
+            on_cancel()
+        self.store.update(job_id, status='cancelled', finished_at=_now())
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        """获取任务信息"""
+        return self.store.get(job_id)
+
+    def list(self, contact_id: Optional[int] = None, active_only: bool = False) -> List[Dict]:
+        """列出最近的任务"""
+        return self.store.list(contact_id, list(ACTIVE_STATUSES) if active_only else None)
+
+    def active_job(self, contact_id: int) -> Optional[Dict]:
+        """联系人未完成的任务，没有时返回 None"""
+        active = self.store.list(contact_id=contact_id, statuses=list(ACTIVE_STATUSES), limit=1)
+        return active[0] if active else None
+
+    def cancel(self, job_id: int) -> Optional[Dict]:
+        """请求取消任务：排队中的任务不再执行；执行中的任务在进入下一阶段时停止，
+        开始写入数据后不再响应取消。任务不存在时返回 None
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job['status'] in ACTIVE_STATUSES and job['cancellable']:
+            self.store.update(job_id, cancel_requested=1)
+        return self.store.get(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+def _now() -> str:
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
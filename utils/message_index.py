@@ -0,0 +1,221 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+import json
+import os
+import numpy as np
+import pandas as pd
+
+EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass
+class IndexPaths:
+    """消息索引文件配置"""
+    DIR_NAME: str = 'index'
+    HEADER_FILE: str = 'header.json'
+    TIMESTAMPS_FILE: str = 'timestamps.i64'
+    SENDER_FILE: str = 'is_sender.u8'
+    TYPES_FILE: str = 'type_codes.u8'
+
+
+@dataclass
+class MessageIndex:
+    """定长二进制消息索引
+
+    每条消息只保存时间戳(int64 秒)、发送方标记(uint8)和类型编码(uint8)，
+    汇总信息写入 header，查询总数、首末时间和收发比例时无需读取消息正文。
+    """
+    timestamps: np.ndarray
+    is_sender: np.ndarray
+    type_codes: np.ndarray
+    type_names: List[str]
+    header: Dict = field(default_factory=dict)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'MessageIndex':
+        """从按时间排序的消息 DataFrame 构建索引"""
+        times = pd.to_datetime(df['CreateTime'])
+        timestamps = times.to_numpy(dtype='datetime64[s]').astype(np.int64)
+        is_sender = df['is_sender'].fillna(0).astype(np.uint8).to_numpy()
+        codes, names = pd.factorize(df['type_name'].astype(str), sort=True)
+        type_codes = codes.astype(np.uint8)
+
+        sender_count = int(is_sender.astype(bool).sum())
+        header = {
+            'total_messages': len(timestamps),
+            'first_time': int(timestamps.min()) if len(timestamps) else None,
+            'last_time': int(timestamps.max()) if len(timestamps) else None,
+            'sender_count': sender_count,
+            'receiver_count': len(timestamps) - sender_count,
+            'type_names': list(names),
+            'type_counts': np.bincount(type_codes, minlength=len(names)).tolist()
+        }
+        return cls(timestamps, is_sender, type_codes, list(names), header)
+
+    def save(self, contact_dir: Path) -> None:
+        """写入联系人目录下的索引文件"""
+        paths = IndexPaths()
+        index_dir = Path(contact_dir) / paths.DIR_NAME
+        index_dir.mkdir(parents=True, exist_ok=True)
+
+        arrays = {
+            paths.TIMESTAMPS_FILE: np.ascontiguousarray(self.timestamps, dtype=np.int64),
+            paths.SENDER_FILE: np.ascontiguousarray(self.is_sender, dtype=np.uint8),
+            paths.TYPES_FILE: np.ascontiguousarray(self.type_codes, dtype=np.uint8),
+        }
+        # 各数组先写入临时文件；先删除旧 header，替换各数组后再写入新 header，
+        # 读取方不会以旧 header 打开写了一半的数组
+        for name, array in arrays.items():
+            array.tofile(index_dir / f'{name}.tmp')
+        (index_dir / paths.HEADER_FILE).unlink(missing_ok=True)
+        for name in arrays:
+            os.replace(index_dir / f'{name}.tmp', index_dir / name)
+        (index_dir / paths.HEADER_FILE).write_text(
+            json.dumps(self.header, ensure_ascii=False), encoding='utf-8')
+
+    @classmethod
+    def open(cls, contact_dir: Path) -> Optional['MessageIndex']:
+        """以内存映射方式打开索引，不存在时返回 None"""
+        paths = IndexPaths()
+        index_dir = Path(contact_dir) / paths.DIR_NAME
+        header_file = index_dir / paths.HEADER_FILE
+        if not header_file.exists():
+            return None
+
+        header = json.loads(header_file.read_text(encoding='utf-8'))
+        count = header['total_messages']
+
+        def _map(file_name: str, dtype) -> np.ndarray:
+            if count == 0:
+                return np.empty(0, dtype=dtype)
+            return np.memmap(index_dir / file_name, dtype=dtype, mode='r', shape=(count,))
+
+        return cls(
+            timestamps=_map(paths.TIMESTAMPS_FILE, np.int64),
+            is_sender=_map(paths.SENDER_FILE, np.uint8),
+            type_codes=_map(paths.TYPES_FILE, np.uint8),
+            type_names=header['type_names'],
+            header=header
+        )
+
+    @property
+    def total_messages(self) -> int:
+        return self.header['total_messages']
+
+    @property
+    def sender_count(self) -> int:
+        return self.header['sender_count']
+
+    @property
+    def receiver_count(self) -> int:
+        return self.header['receiver_count']
+
+    @property
+    def first_time(self) -> Optional[datetime]:
+        ts = self.header['first_time']
+        return EPOCH + timedelta(seconds=ts) if ts is not None else None
+
+    @property
+    def last_time(self) -> Optional[datetime]:
+        ts = self.header['last_time']
+        return EPOCH + timedelta(seconds=ts) if ts is not None else None
+
+    @property
+    def type_counts(self) -> Dict[str, int]:
+        return dict(zip(self.type_names, self.header['type_counts']))
+
+
+class MessageIndexWriter:
+    """按块追加写入消息索引，内存占用只与块大小有关
+
+    类型编码先按出现顺序分配，关闭时再按类型名排序重新编码，
+    结果与 MessageIndex.from_frame 一致。各数组先写入临时文件，关闭时才替换原有索引；
+    中途放弃（abort）时删除临时文件，原有索引不受影响。
+    """
+
+    def __init__(self, contact_dir: Path):
+        self.paths = IndexPaths()
+        self.index_dir = Path(contact_dir) / self.paths.DIR_NAME
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+        self._names = (self.paths.TIMESTAMPS_FILE, self.paths.SENDER_FILE, self.paths.TYPES_FILE)
+        self._files = {name: self._tmp_path(name).open('wb') for name in self._names}
+        self._type_names: List[str] = []
+        self._type_counts: List[int] = []
+        self._count = 0
+        self._sender_count = 0
+        self._first_time: Optional[int] = None
+        self._last_time: Optional[int] = None
+
+    def append(self, df: pd.DataFrame) -> None:
+        """追加一块按时间排序的消息"""
+        if df.empty:
+            return
+        timestamps = pd.to_datetime(df['CreateTime']).to_numpy(dtype='datetime64[s]').astype(np.int64)
+        is_sender = df['is_sender'].fillna(0).astype(np.uint8).to_numpy()
+
+        codes, names = pd.factorize(df['type_name'].astype(str))
+        for name in names:
+            if name not in self._type_names:
+                self._type_names.append(name)
+                self._type_counts.append(0)
+        mapping = np.array([self._type_names.index(name) for name in names], dtype=np.uint8)
+        type_codes = mapping[codes]
+        for code, count in enumerate(np.bincount(type_codes, minlength=len(self._type_names)).tolist()):
+            self._type_counts[code] += count
+
+        timestamps.tofile(self._files[self.paths.TIMESTAMPS_FILE])
+        is_sender.tofile(self._files[self.paths.SENDER_FILE])
+        type_codes.tofile(self._files[self.paths.TYPES_FILE])
+
+        self._count += len(timestamps)
+        self._sender_count += int(is_sender.astype(bool).sum())
+        first, last = int(timestamps.min()), int(timestamps.max())
+        self._first_time = first if self._first_time is None else min(self._first_time, first)
+        self._last_time = last if self._last_time is None else max(self._last_time, last)
+
+    def _tmp_path(self, name: str) -> Path:
+        return self.index_dir / f'{name}.tmp'
+
+    def close(self) -> Dict:
+        """按类型名排序重新编码，替换原有索引并写入 header，返回 header"""
+        for f in self._files.values():
+            f.close()
+
+        order = np.argsort(self._type_names, kind='stable')
+        type_names = [self._type_names[i] for i in order]
+        if self._count and not (order == np.arange(len(order))).all():
+            # 旧编码 -> 新编码，分块就地改写
+            remap = np.empty(len(order), dtype=np.uint8)
+            remap[order] = np.arange(len(order), dtype=np.uint8)
+            type_codes = np.memmap(self._tmp_path(self.paths.TYPES_FILE), dtype=np.uint8, mode='r+',
+                                   shape=(self._count,))
+            for start in range(0, self._count, 1 << 24):
+                type_codes[start:start + (1 << 24)] = remap[type_codes[start:start + (1 << 24)]]
+            type_codes.flush()
+            del type_codes
+
+        header = {
+            'total_messages': self._count,
+            'first_time': self._first_time,
+            'last_time': self._last_time,
+            'sender_count': self._sender_count,
+            'receiver_count': self._count - self._sender_count,
+            'type_names': type_names,
+            'type_counts': [self._type_counts[i] for i in order]
+        }
+        # 先删除旧 header，替换各数组后再写入新 header，作为索引完整的标志
+        (self.index_dir / self.paths.HEADER_FILE).unlink(missing_ok=True)
+        for name in self._names:
+            os.replace(self._tmp_path(name), self.index_dir / name)
+        (self.index_dir / self.paths.HEADER_FILE).write_text(
+            json.dumps(header, ensure_ascii=False), encoding='utf-8')
+        return header
+
+    def abort(self) -> None:
+        """关闭并删除临时文件，保留原有索引"""
+        for name, f in self._files.items():
+            f.close()
+            self._tmp_path(name).unlink(missing_ok=True)
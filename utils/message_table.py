@@ -0,0 +1,141 @@
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 消息列的类型（时间列单独处理为 datetime64[ns]）
+MESSAGE_DTYPES = {
+    'MsgSvrID': 'Int64',
+    'is_sender': 'uint8',
+    'type_name': 'category',
+    'msg': 'string',
+}
+
+# 消息的 Arrow 表结构，Parquet 存储和分块写入都使用该结构，保证各行组一致
+MESSAGE_SCHEMA = pa.schema([
+    ('MsgSvrID', pa.int64()),
+    ('type_name', pa.dictionary(pa.int32(), pa.string())),
+    ('is_sender', pa.uint8()),
+    ('msg', pa.string()),
+    ('CreateTime', pa.timestamp('ns')),
+])
+
+
+class MessageTable:
+    """类型化的消息表
+
+    读取、存储和分析之间传递消息时使用的进程内数据结构。各列以列式缓冲区保存
+    （时间为 datetime64[ns]、发送方为 uint8、类型为类别、正文为字符串），
+    在各环节之间传递时不再转换为逐行字典，也不再重复解析时间字符串。
+    JSON 只作为可选的导出格式，见 to_records / to_json。
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        """
+        Args:
+            frame: 已按 MESSAGE_DTYPES 类型化的消息，通常应使用 from_frame 等构造方法
+        """
+        self._frame = frame
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'MessageTable':
+        """由 DataFrame 构建，只转换类型不一致的列，其余列共享原有缓冲区"""
+        df = df.copy(deep=False)
+        if 'CreateTime' in df.columns and df['CreateTime'].dtype != 'datetime64[ns]':
+            df['CreateTime'] = pd.to_datetime(df['CreateTime']).astype('datetime64[ns]')
+        for column, dtype in MESSAGE_DTYPES.items():
+            if column in df.columns and df[column].dtype != dtype:
+                df[column] = df[column].astype(dtype)
+        df.index = pd.RangeIndex(len(df))
+        return cls(df)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'MessageTable':
+        """由逐行字典构建（如旧版 raw_data.json 中的消息）"""
+        return cls.from_frame(pd.DataFrame(list(records)))
+
+    @classmethod
+    def from_arrow(cls, table: pa.Table) -> 'MessageTable':
+        """由 Arrow 表构建，数值和时间列不经 Python 对象直接转换"""
+        return cls.from_frame(table.to_pandas())
+
+    @classmethod
+    def of(cls, messages: Union['MessageTable', pd.DataFrame, pa.Table, Sequence[Dict]]) -> 'MessageTable':
+        """将 MessageTable、DataFrame、Arrow 表或逐行字典统一转换为 MessageTable"""
+        if isinstance(messages, MessageTable):
+            return messages
+        if isinstance(messages, pd.DataFrame):
+            return cls.from_frame(messages)
+        if isinstance(messages, pa.Table):
+            return cls.from_arrow(messages)
+        return cls.from_records(messages)
+
+    @classmethod
+    def concat(cls, tables: List['MessageTable']) -> 'MessageTable':
+        """按顺序拼接多个消息表"""
+        return cls.from_frame(pd.concat([table.frame for table in tables], ignore_index=True))
+
+    @classmethod
+    def read_parquet(cls, path: Path, columns: Optional[List[str]] = None) -> 'MessageTable':
+        """按列读取 Parquet 消息存储"""
+        return cls.from_arrow(pq.read_table(path, columns=columns))
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """底层的 DataFrame，调用方不应原地修改"""
+        return self._frame
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._frame.columns)
+
+    def __len__(self) -> int:
+        return len(self._frame)
+
+    def to_frame(self) -> pd.DataFrame:
+        """共享列缓冲区的 DataFrame，可自由增加派生列而不影响本表"""
+        return self._frame.copy(deep=False)
+
+    def select(self, columns: List[str]) -> 'MessageTable':
+        """只保留指定的列"""
+        return MessageTable(self._frame[columns])
+
+    def slice(self, start: int, stop: int) -> 'MessageTable':
+        """按行切片（不复制数据）"""
+        df = self._frame.iloc[start:stop]
+        df.index = pd.RangeIndex(len(df))
+        return MessageTable(df)
+
+    def to_arrow(self) -> pa.Table:
+        """转换为 Arrow 表，列类型与 MESSAGE_SCHEMA 一致"""
+        table = pa.Table.from_pandas(self._frame, preserve_index=False)
+        schema = pa.schema([MESSAGE_SCHEMA.field(field.name) if field.name in MESSAGE_SCHEMA.names else field
+                            for field in table.schema], metadata=table.schema.metadata)
+        return table.cast(schema)
+
+    def write_parquet(self, path: Path) -> None:
+        """写入 Parquet 消息存储：先写入临时文件再替换，写入中途出错时原有文件不受影响"""
+        path = Path(path)
+        tmp_path = path.with_suffix('.tmp')
+        try:
+            pq.write_table(self.to_arrow(), tmp_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_path, path)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """导出为逐行字典，时间为 ISO 格式字符串，缺失值为 None"""
+        df = self._frame.copy(deep=False)
+        if 'CreateTime' in df.columns:
+            df['CreateTime'] = df['CreateTime'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+        return df.astype(object).where(df.notna(), None).to_dict('records')
+
+    def to_json(self, path: Path) -> None:
+        """导出为 JSON 数组（逐行字典）"""
+        df = self._frame.copy(deep=False)
+        if 'CreateTime' in df.columns:
+            df['CreateTime'] = df['CreateTime'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+        df.to_json(path, orient='records', force_ascii=False, indent=2)
@@ -0,0 +1,141 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+import gzip
+import hashlib
+import json
+import os
+import uuid
+
+from utils.data_manager import DateTimeEncoder, file_cache
+from utils.file_cache import estimate_size
+
+try:
+    import brotli  # 可选依赖，未安装时只提供 gzip 压缩
+except ImportError:
+    brotli = None
+
+
+@dataclass
+class ResponseConfig:
+    """预先生成的 API 响应配置"""
+    FORMAT_VERSION: int = 1  # 响应格式版本，修改序列化方式后递增，使旧的 ETag 全部失效
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 5
+    MIN_COMPRESS_BYTES: int = 1024  # 小于此大小的响应不压缩
+
+
+# 内容编码 -> 文件后缀，按优先顺序排列
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz', 'identity': ''}
+
+
+def source_version(name: str, sources: Iterable[Path]) -> str:
+    """由响应名称和所依赖文件的修改时间、大小计算版本号（用作强 ETag）"""
+    digest = hashlib.sha1(f'{ResponseConfig.FORMAT_VERSION}:{name}'.encode('utf-8'))
+    for source in sources:
+        try:
+            stat = Path(source).stat()
+            signature = f'{source}:{stat.st_mtime_ns}:{stat.st_size}'
+        except FileNotFoundError:
+            signature = f'{source}:-'
+        digest.update(signature.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def serialize(data: Any) -> bytes:
+    """序列化为紧凑的 JSON（UTF-8，键排序）"""
+    return json.dumps(data, cls=DateTimeEncoder, ensure_ascii=False, separators=(',', ':'),
+                      sort_keys=True).encode('utf-8')
+
+
+def compress(body: bytes, accepts: Callable[[str], bool]) -> Tuple[bytes, str]:
+    """按客户端接受的编码压缩一次性的响应体，返回 (响应体, 内容编码)"""
+    if len(body) >= ResponseConfig.MIN_COMPRESS_BYTES:
+        if brotli is not None and accepts('br'):
+            return brotli.compress(body, quality=ResponseConfig.BROTLI_QUALITY), 'br'
+        if accepts('gzip'):
+            return gzip.compress(body, compresslevel=ResponseConfig.GZIP_LEVEL, mtime=0), 'gzip'
+    return body, 'identity'
+
+
+class ResponseCache:
+    """预先生成并压缩的 JSON 响应体，保存在分析数据旁
+
+    每个响应按所依赖文件的版本保存为 {name}.{version}.json 及其 .gz/.br 压缩版本；
+    依赖文件变化后版本号随之变化，首次请求时重新生成并删除旧版本。
+    重复请求只需 stat 依赖文件和读取对应编码的文件，不再生成和序列化数据。
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+
+    def _path(self, name: str, version: str, encoding: str) -> Path:
+        return self.cache_dir / f'{name}.{version}.json{ENCODING_SUFFIXES[encoding]}'
+
+    def get(self, name: str, version: str, accepts: Callable[[str], bool],
+            build: Callable[[], Optional[Any]]) -> Optional[Tuple[bytes, str]]:
+        """读取响应体，尚未保存时调用 build 生成数据并保存全部编码
+        Args:
+            name: 响应名称
+            version: 依赖文件的版本，见 source_version
+            accepts: 客户端是否接受某种内容编码
+            build: 生成响应数据的函数，返回 None 表示数据不存在（不保存）
+        Returns:
+            (响应体, 内容编码)，优先使用客户端接受的压缩编码；数据不存在时返回 None
+        """
+        if not self._ensure_saved(name, version, build):
+            return None
+        for encoding in ENCODING_SUFFIXES:
+            path = self._path(name, version, encoding)
+            if (encoding == 'identity' or accepts(encoding)) and path.exists():
+                return path.read_bytes(), encoding
+
+    def load(self, name: str, version: str, build: Callable[[], Optional[Any]],
+             parse: Callable[[Any], Any] = lambda data: data) -> Optional[Any]:
+        """读取已保存的响应数据（尚未保存时生成并保存），用于派生按参数截取的响应
+
+        解析结果按响应体文件缓存在进程内的文件缓存中，同一版本的后续请求不再解码完整响应体。
+        Args:
+            parse: 将解码后的数据转换为便于截取的形式，结果由各请求只读共享
+        """
+        if not self._ensure_saved(name, version, build):
+            return None
+        path = self._path(name, version, 'identity')
+
+        def load():
+            data = parse(json.loads(path.read_bytes()))
+            return data, estimate_size(data)
+
+        return file_cache.get(path, load, variant=('parsed', parse))
+
+    def _ensure_saved(self, name: str, version: str, build: Callable[[], Optional[Any]]) -> bool:
+        if self._path(name, version, 'identity').exists():
+            return True
+        data = build()
+        if data is None:
+            return False
+        self._save(name, version, self._encode(serialize(data)))
+        return True
+
+    @staticmethod
+    def _encode(body: bytes) -> Dict[str, bytes]:
+        """生成各编码的响应体，较小的响应不压缩"""
+        bodies = {}
+        if len(body) >= ResponseConfig.MIN_COMPRESS_BYTES:
+            if brotli is not None:
+                bodies['br'] = brotli.compress(body, quality=ResponseConfig.BROTLI_QUALITY)
+            bodies['gzip'] = gzip.compress(body, compresslevel=ResponseConfig.GZIP_LEVEL, mtime=0)
+        bodies['identity'] = body
+        return bodies
+
+    def _save(self, name: str, version: str, bodies: Dict[str, bytes]) -> None:
+        """原子地写入新版本的各编码文件（未压缩的文件最后写入，其存在表示已保存完整），并删除旧版本"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for encoding, body in bodies.items():
+            path = self._path(name, version, encoding)
+            temp_path = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+            temp_path.write_bytes(body)
+            os.replace(temp_path, path)
+        for path in self.cache_dir.glob(f'{name}.*.json*'):
+            if path.suffix != '.tmp' and path.name.split('.')[1] != version:
+                path.unlink(missing_ok=True)
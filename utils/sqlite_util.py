@@ -0,0 +1,20 @@
+"""
+SQLite 连接辅助
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+import sqlite3
+
+
+@contextmanager
+def connect(db_path: Path) -> Iterator[sqlite3.Connection]:
+    """打开连接（行可按列名访问），正常退出时提交，出错时回滚"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
@@ -0,0 +1,79 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import threading
+import time
+
+
+def _warm_jieba() -> None:
+    """加载 jieba 前缀词典（读取或生成持久化缓存）及词性标注、关键词提取模块"""
+    from utils.analyzers.tokens import load_jieba
+
+    load_jieba()
+    import jieba.posseg  # noqa: F401
+    import jieba.analyse  # noqa: F401  导入时加载 IDF 词典
+
+
+def _warm_snownlp() -> None:
+    """导入 SnowNLP（导入时加载分词和情感模型）"""
+    from snownlp import SnowNLP
+
+    SnowNLP('预热').sentiments
+
+
+def _warm_tag_dictionaries() -> None:
+    """加载话题标签词典并构建匹配器"""
+    from utils.analyzers.keyword_matcher import get_tag_matcher
+
+    get_tag_matcher()
+
+
+# 预热步骤，按页面上通常被用到的先后排列
+WARMUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ('jieba', _warm_jieba),
+    ('tag_dictionaries', _warm_tag_dictionaries),
+    ('snownlp', _warm_snownlp),
+]
+
+
+class Warmup:
+    """在后台线程中预先加载分析依赖
+
+    jieba、SnowNLP 等只在分析时才导入，首次导入和加载词典需要数秒。界面显示后
+    在后台依次加载，之后的分析请求无需等待；预热未完成时请求会在导入锁上等待
+    同一次加载，不会重复加载。
+    """
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], None]]] = WARMUP_STEPS):
+        self.steps = steps
+        self.timings: Dict[str, float] = {}  # 步骤 -> 耗时（秒）
+        self.errors: Dict[str, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """启动预热线程（只启动一次）"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='warmup', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                self.errors[name] = str(e)
+                print(f"警告：预热 {name} 失败: {str(e)}")
+            self.timings[name] = time.perf_counter() - start
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待预热完成，返回是否已完成"""
+        if self._thread is None:
+            return False
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+
+# 进程内共享的预热任务
+warmup = Warmup()